@@ -1,27 +1,58 @@
 from huggingface_hub import InferenceClient
 
+from worket_agent.context import estimate_tokens
+from worket_agent.patching import PatchError, apply_edits, parse_edits
+from worket_agent.prompt_rules import PATCH_PROMPT
+
 # Initialize the inference client
 client = InferenceClient(timeout=60*5)
 
+INSTRUCTIONS = "O ClarifierAgent além de resolver lacunas deve montar um roadmap para a resolucao do problema, abordando possiveis tecnologias para a resolucao do problemas. Montar uma seria de itens a serem resolvidos e considerados"
+
 # Read the file content
-file_path = "./worker_agent/agent.py"
+file_path = "./worket_agent/agent.py"
 try:
     with open(file_path, "r") as file:
         file_contents = file.read()
 
-    # Prepare the messages for the model
-    messages = [{"role": "user", "content": f"Retorne o arquivo inteiro alterado. O ClarifierAgent além de resolver lacunas deve montar um roadmap para a resolucao do problema, abordando possiveis tecnologias para a resolucao do problemas. Montar uma seria de itens a serem resolvidos e considerados  :\n{file_contents}"}]
-
-    # Generate a response using the model
+    # Ask for search/replace edits first, they take far fewer output tokens than the whole file
+    messages = [
+        {"role": "system", "content": PATCH_PROMPT},
+        {"role": "user", "content": f"{INSTRUCTIONS}\n```python\n# {file_path}\n{file_contents}\n```"},
+    ]
     response = client.chat.completions.create(
         model="Qwen/Qwen2.5-Coder-32B-Instruct",
         messages=messages,
-        max_tokens=20000,
+        max_tokens=4096,
         stream=False,
     )
+    patch = response.choices[0].message.content
+
+    try:
+        edits = parse_edits(patch)
+        if not edits:
+            raise PatchError("No edits found in the response.")
+        refactored_content = apply_edits([{"path": file_path, "content": file_contents}], edits).get(file_path, file_contents)
+        print(
+            f"Applied {len(edits)} edit(s) with ~{estimate_tokens(patch)} output tokens "
+            f"instead of ~{estimate_tokens(refactored_content)}."
+        )
+    except PatchError as e:
+        print(f"The edits did not apply, asking for the whole file instead:\n{e}")
+
+        # Prepare the messages for the model
+        messages = [{"role": "user", "content": f"Retorne o arquivo inteiro alterado. {INSTRUCTIONS}  :\n{file_contents}"}]
+
+        # Generate a response using the model
+        response = client.chat.completions.create(
+            model="Qwen/Qwen2.5-Coder-32B-Instruct",
+            messages=messages,
+            max_tokens=20000,
+            stream=False,
+        )
 
-    # Extract the refactored content from the response
-    refactored_content = response.choices[0].message.content
+        # Extract the refactored content from the response
+        refactored_content = response.choices[0].message.content
 
     # Write the refactored content back to the file
     with open(file_path, "w") as file:
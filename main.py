@@ -1,20 +1,23 @@
 import os
 import shutil
 from worket_agent.agent import CodeGenerator
+from worket_agent.checkpoint import has_unfinished_run
+from worket_agent.environments import EnvironmentPool
 
 WORKSPACE_DIR = "workspace"
 MAX_ITERATIONS = 15
 
 
-# Clean up existing workspace directory if it exists
-if os.path.exists(WORKSPACE_DIR):
+# Clean up existing workspace directory if it exists, unless it holds an interrupted run to resume
+RESUME = os.path.exists(WORKSPACE_DIR) and has_unfinished_run(WORKSPACE_DIR)
+if os.path.exists(WORKSPACE_DIR) and not RESUME:
     shutil.rmtree(WORKSPACE_DIR)
 
 # Create workspace directory
 os.makedirs(WORKSPACE_DIR, exist_ok=True)
 
 def main():
-    code_generator = CodeGenerator(WORKSPACE_DIR, MAX_ITERATIONS, generate_tests=False)
+    code_generator = CodeGenerator(WORKSPACE_DIR, MAX_ITERATIONS, generate_tests=False, env_pool=EnvironmentPool())
 
     user_prompt = "Open YouTube Music in Chrome and play a funk playlist."
 
@@ -27,7 +30,10 @@ def main():
         # For this example, return a fixed response
         return ""
 
-    code_generator.run(user_prompt, clarification_handler=my_clarification_handler)
+    if RESUME:
+        code_generator.resume(clarification_handler=my_clarification_handler)
+    else:
+        code_generator.run(user_prompt, clarification_handler=my_clarification_handler)
 
 
 if __name__ == "__main__":
@@ -8,9 +8,12 @@ setup(
         "huggingface_hub",
         "stdlib_list"
     ],
+    extras_require={
+        "local": ["llama-cpp-python"],
+    },
     entry_points={
         "console_scripts": [
-            "worker-agent=worker_agent.main:main",
+            "worker-agent=worket_agent.main:main",
         ],
     },
     description="A package for generating Python code using AI.",
@@ -0,0 +1,113 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from worket_agent.backends import LLMBackend, ResilientBackend, _stream_from_thread
+
+
+class ScriptedBackend(LLMBackend):
+    """
+    Answers with the model name after `delays[model]` seconds, raising the queued errors first.
+    """
+
+    def __init__(self, delays, errors=None):
+        super().__init__(model="main", max_concurrency=8, cache=None)
+        self.delays = delays
+        self.errors = errors or {}
+        self.calls = []
+
+    async def _complete(self, messages, temperature, max_tokens, model, stop=None):
+        self.calls.append(model)
+        errors = self.errors.get(model)
+        if errors:
+            raise errors.pop(0)
+        delay = self.delays[model]
+        await asyncio.sleep(delay() if callable(delay) else delay)
+        return model
+
+
+def resilient(backend, **kwargs):
+    options = dict(fallback_models=["small"], base_delay=0.0, hedge=False, min_samples=3)
+    options.update(kwargs)
+    return ResilientBackend(backend, **options)
+
+
+def chat(backend, max_tokens=None):
+    return asyncio.run(backend.chat([{"role": "user", "content": "hi"}], max_tokens=max_tokens, use_cache=False))
+
+
+def test_retryable_errors_are_retried_on_the_same_model():
+    backend = ScriptedBackend({"main": 0.0}, errors={"main": [ConnectionError("reset"), TimeoutError()]})
+    wrapper = resilient(backend)
+    assert chat(wrapper) == "main"
+    assert backend.calls == ["main", "main", "main"]
+    assert wrapper.stats["retries"] == 2
+    assert wrapper.stats["fallbacks"] == 0
+
+
+def test_non_retryable_errors_fall_back_at_once(capsys):
+    backend = ScriptedBackend({"main": 0.0, "small": 0.0}, errors={"main": [ValueError("bad request")]})
+    wrapper = resilient(backend)
+    assert chat(wrapper) == "small"
+    assert backend.calls == ["main", "small"]
+    assert wrapper.stats["fallbacks"] == 1
+    assert "Warning" in capsys.readouterr().out
+
+
+def test_every_model_failing_raises_the_last_error():
+    backend = ScriptedBackend({}, errors={"main": [ValueError("main")], "small": [ValueError("small")]})
+    with pytest.raises(ValueError, match="small"):
+        chat(resilient(backend))
+
+
+def test_timeouts_are_bucketed_by_max_tokens():
+    backend = ScriptedBackend({"main": 0.01})
+    wrapper = resilient(backend, min_timeout=0.0)
+    for _ in range(3):
+        chat(wrapper, max_tokens=500)
+    assert wrapper.timeout_for("main", 500) < 1
+    assert wrapper.timeout_for("main", 20000) == wrapper.max_timeout
+
+
+def test_timeout_doubles_on_each_timed_out_retry():
+    durations = iter([0.01, 0.01, 0.01, 0.3, 0.3, 0.3, 0.3, 0.3, 0.3])
+    backend = ScriptedBackend({"main": lambda: next(durations), "small": 0.0})
+    wrapper = resilient(backend, min_timeout=0.0, max_retries=4)
+    for _ in range(3):
+        chat(wrapper)
+    first_timeout = wrapper.timeout_for("main")
+    assert first_timeout < 0.3
+
+    assert chat(wrapper) == "main"
+    assert wrapper.stats["timeouts"] >= 1
+    assert wrapper.stats["fallbacks"] == 0
+    # Timed-out attempts were kept as lower-bound samples
+    assert wrapper.timeout_for("main") > first_timeout
+
+
+def test_stream_from_thread_stops_the_producer_when_the_consumer_leaves():
+    produced = []
+    closed = threading.Event()
+
+    def produce_chunks():
+        try:
+            for index in range(1000):
+                produced.append(index)
+                time.sleep(0.001)
+                yield str(index)
+        finally:
+            closed.set()
+
+    async def consume():
+        chunks = _stream_from_thread(executor, produce_chunks)
+        received = [await chunks.__anext__() for _ in range(2)]
+        await chunks.aclose()
+        return received
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        assert asyncio.run(consume()) == ["0", "1"]
+        assert closed.wait(1)
+    assert len(produced) < 1000
@@ -0,0 +1,34 @@
+import json
+
+from worket_agent.backends import LocalBackend
+from worket_agent.batch import BatchRunner, finished_job_ids, load_jobs, make_clarification_handler
+
+
+def test_jobs_without_id_are_numbered_by_line(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text('{"prompt": "a"}\n\n{"prompt": "b", "id": 7}\n')
+    assert [job["id"] for job in load_jobs(str(path))] == ["1", "7"]
+
+
+def test_only_final_results_count_as_finished(tmp_path):
+    path = tmp_path / "results.jsonl"
+    records = [{"id": "1", "status": "succeeded"}, {"id": "2", "status": "error"}, {"id": "3", "status": "failed"}]
+    path.write_text("".join(json.dumps(record) + "\n" for record in records) + '{"id": "4", "sta')
+    assert finished_job_ids(str(path)) == {"1", "3"}
+
+
+def test_clarification_handler_answers_by_question_or_in_order():
+    by_question = make_clarification_handler({"Which OS?": "Linux"})
+    assert by_question("Which OS?") == "Linux"
+    assert by_question("Other?") == ""
+    in_order = make_clarification_handler(["first", "second"])
+    assert [in_order("q"), in_order("q"), in_order("q")] == ["first", "second", ""]
+
+
+def test_workspaces_of_distinct_ids_never_collide(tmp_path):
+    runner = BatchRunner(str(tmp_path), backend=LocalBackend(), env_pool=object())
+    ids = ["a/b", "a_b", "a b", "..", ".", ""]
+    workspaces = [runner._workspace_dir(job_id) for job_id in ids]
+    assert len(set(workspaces)) == len(ids)
+    assert runner._workspace_dir("job-1") == str(tmp_path / "job-1")
+    assert all(workspace.startswith(str(tmp_path / "")) for workspace in workspaces)
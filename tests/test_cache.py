@@ -0,0 +1,79 @@
+from worket_agent import cache as cache_module
+from worket_agent.cache import ResponseCache, cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+def make_cache(monkeypatch, **options):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return ResponseCache(":memory:", **options), clock
+
+
+def test_key_depends_on_every_request_field():
+    messages = [{"role": "user", "content": "hi"}]
+    key = cache_key("model", messages, 0.1, 100)
+    assert key == cache_key("model", [dict(m) for m in messages], 0.1, 100)
+    assert key != cache_key("other", messages, 0.1, 100)
+    assert key != cache_key("model", messages, 0.2, 100)
+    assert key != cache_key("model", messages, 0.1, 100, stop=["```"])
+    assert key == cache_key("model", messages, 0.1, 100, stop=[])
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    cache, _ = make_cache(monkeypatch, max_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_are_evicted_over_the_byte_limit(monkeypatch):
+    cache, _ = make_cache(monkeypatch, max_bytes=10)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    assert cache.stats()["bytes"] == 6
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    cache, clock = make_cache(monkeypatch, ttl=60)
+    cache.set("a", "A")
+    assert cache.get("a") == "A"
+    clock.now += 60
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_hits_record_savings(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.set("a", "answer", latency=2.5)
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+    assert stats["saved_seconds"] == 2.5
+    assert stats["saved_completion_chars"] == len("answer")
+
+
+def test_bypass_neither_reads_nor_writes(monkeypatch):
+    cache, _ = make_cache(monkeypatch, bypass=True)
+    cache.set("a", "A")
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,38 @@
+import asyncio
+import os
+
+from worket_agent.agent import CodeGenerator, relative_to_workspace
+from worket_agent.backends import LocalBackend
+from worket_agent.routing import ModelRouter
+
+
+class NoEnvironmentPool:
+    def acquire(self, env_dir, requirements=None):
+        return env_dir
+
+
+def test_relative_to_workspace(tmp_path):
+    workspace = str(tmp_path / "workspace")
+    feedback = f'File "{os.path.join(workspace, "main.py")}", line 3\nin {workspace}'
+    assert relative_to_workspace(feedback, workspace) == 'File "main.py", line 3\nin .'
+    assert relative_to_workspace(None, workspace) is None
+
+
+def test_kept_feedback_has_no_candidate_paths(tmp_path, monkeypatch):
+    async def run_iteration(self, files, error_feedback, test_prompt, verbose_handler):
+        path = os.path.join(self.workspace_dir, "main.py")
+        verbose_handler(f"Running {path}")
+        return f'Traceback:\n  File "{path}", line 1\nNameError: name "x" is not defined', "scripts"
+
+    monkeypatch.setattr(CodeGenerator, "run_iteration", run_iteration)
+    generator = CodeGenerator(
+        str(tmp_path), backend=LocalBackend(lambda request: ""), env_pool=NoEnvironmentPool(), checkpoint=False,
+        router=ModelRouter(), candidates=2,
+    )
+    messages = []
+    feedback, stage = asyncio.run(generator.run_candidates([], None, "Write tests.", messages.append))
+
+    assert stage == "scripts"
+    assert feedback == 'Traceback:\n  File "main.py", line 1\nNameError: name "x" is not defined'
+    assert "[candidate 0] Running main.py" in messages
+    assert not any("candidate-" in message for message in messages)
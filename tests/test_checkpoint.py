@@ -0,0 +1,89 @@
+import asyncio
+
+from worket_agent.agent import CodeGenerator
+from worket_agent.backends import LocalBackend
+from worket_agent.checkpoint import RunJournal, has_unfinished_run, journal_path
+from worket_agent.routing import ModelRouter
+
+
+class NoEnvironmentPool:
+    def acquire(self, env_dir, requirements=None):
+        return env_dir
+
+
+def journal_with_one_iteration(workspace_dir):
+    journal = RunJournal(journal_path(workspace_dir))
+    journal.start("Write a greeter")
+    journal.append("clarification", question="Which name?", answer="World")
+    journal.append("roadmap", roadmap="Print a greeting.", prompt="Write main.py", test_prompt="Test main.py")
+    files = [
+        {"path": "main.py", "type": "code", "content": "# main.py\nprint('Hello')\n"},
+        {"path": "test_main.py", "type": "test", "content": "# test_main.py\nimport main\n"},
+    ]
+    journal.record_iteration(1, "tests", files, "test_main.py failed", "Write main.py", "Test main.py")
+    return journal, files
+
+
+def test_load_rebuilds_the_state(tmp_path):
+    journal, files = journal_with_one_iteration(str(tmp_path))
+    files[0]["content"] = "# main.py\nprint('Hello, World')\n"
+    journal.record_iteration(2, "scripts", files, "main.py failed", "Fix", "Fix tests")
+
+    state = RunJournal(journal.path).load()
+    assert state["user_prompt"] == "Write a greeter"
+    assert state["clarifications"] == [{"question": "Which name?", "answer": "World"}]
+    assert state["roadmap"] == "Print a greeting."
+    assert (state["iteration"], state["stage"], state["error_feedback"]) == (2, "scripts", "main.py failed")
+    assert state["files"] == files
+    assert state["outcome"] is None
+    assert has_unfinished_run(str(tmp_path))
+
+
+def test_iterations_only_journal_changed_files(tmp_path):
+    journal, files = journal_with_one_iteration(str(tmp_path))
+    journal.record_iteration(2, "tests", files, "still failing", "Fix", "Fix tests")
+
+    with open(journal.path, encoding="utf-8") as f:
+        last = f.readlines()[-1]
+    assert '"contents": {}' in last
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    journal, _ = journal_with_one_iteration(str(tmp_path))
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"step": "iteration", "number": 2, "sta')
+
+    assert RunJournal(journal.path).load()["iteration"] == 1
+
+
+def test_no_journal(tmp_path):
+    assert RunJournal(journal_path(str(tmp_path))).load() is None
+    assert not has_unfinished_run(str(tmp_path))
+
+
+def test_resume_continues_after_the_last_iteration(tmp_path, monkeypatch):
+    journal_with_one_iteration(str(tmp_path))
+    calls = []
+
+    async def run_iteration(self, files, error_feedback, test_prompt, verbose_handler):
+        with open(tmp_path / "main.py", encoding="utf-8") as f:
+            calls.append((self.prompt, error_feedback, [file["path"] for file in files], f.read()))
+        return "", "passed"
+
+    monkeypatch.setattr(CodeGenerator, "run_iteration", run_iteration)
+    backend = LocalBackend(lambda request: "unexpected")
+    generator = CodeGenerator(
+        str(tmp_path), backend=backend, env_pool=NoEnvironmentPool(), router=ModelRouter(), max_iterations=3,
+    )
+    outcome = asyncio.run(generator.aresume(verbose_handler=lambda message: None))
+
+    assert outcome == {"success": True, "iterations": 2, "files": ["main.py", "test_main.py"]}
+    assert calls == [(
+        "Resolve the errors and problems based on the feedback.", "test_main.py failed",
+        ["main.py", "test_main.py"], "# main.py\nprint('Hello')\n",
+    )]
+    assert backend.calls == []
+    assert not has_unfinished_run(str(tmp_path))
+    # A finished run is not run again
+    assert asyncio.run(generator.aresume()) == outcome
+    assert len(calls) == 1
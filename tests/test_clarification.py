@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from worket_agent.agent import (
+    ClarifierAgent, CodeGenerator, clarifications_are_immaterial, match_answers, parse_questions,
+)
+from worket_agent.backends import LocalBackend
+from worket_agent.prompt_rules import BATCH_CLARIFY_PROMPT
+from worket_agent.routing import ModelRouter
+
+
+class NoEnvironmentPool:
+    def acquire(self, env_dir, requirements=None):
+        return env_dir
+
+
+def respond(request):
+    system = request["messages"][0]["content"]
+    if system == BATCH_CLARIFY_PROMPT:
+        return json.dumps(["Which OS?", "Any dependencies?"])
+    answers = request["messages"][-1]["content"]
+    return f"roadmap for {answers}"
+
+
+def generator(tmp_path):
+    backend = LocalBackend(respond)
+    router = ModelRouter()
+    return CodeGenerator(
+        str(tmp_path), backend=backend, env_pool=NoEnvironmentPool(), checkpoint=False, router=router,
+        clarifier_agent=ClarifierAgent(backend=backend, router=router), speculative_clarification=True,
+    )
+
+
+def test_handler_is_called_once_with_every_question(tmp_path):
+    calls = []
+
+    def handler(questions):
+        calls.append(questions)
+        return ["Linux", "none"]
+
+    interview = []
+    roadmap = asyncio.run(generator(tmp_path)._clarify_speculatively("Write a tool", interview, False, 10, handler))
+    assert calls == [["Which OS?", "Any dependencies?"]]
+    assert interview == [
+        {"question": "Which OS?", "answer": "Linux"},
+        {"question": "Any dependencies?", "answer": "none"},
+    ]
+    assert "A: none" in roadmap
+
+
+def test_empty_answers_keep_the_draft_roadmap(tmp_path):
+    interview = []
+    roadmap = asyncio.run(
+        generator(tmp_path)._clarify_speculatively("Write a tool", interview, False, 1, lambda questions: [""])
+    )
+    assert [qa["question"] for qa in interview] == ["Which OS?"]
+    assert roadmap == "roadmap for Prompt: Write a tool"
+
+
+def test_only_empty_answers_are_immaterial():
+    assert clarifications_are_immaterial([{"question": "q", "answer": "  "}])
+    assert not clarifications_are_immaterial([{"question": "No dependencies?", "answer": "none"}])
+
+
+def test_match_answers_accepts_lists_dicts_and_text():
+    questions = ["a?", "b?"]
+    assert match_answers(["1"], questions) == ["1", ""]
+    assert match_answers({"b?": "2"}, questions) == ["", "2"]
+    assert match_answers("1\n2\n3", questions) == ["1", "2"]
+    assert match_answers("only", ["a?"]) == ["only"]
+
+
+def test_parse_questions_falls_back_to_question_lines():
+    assert parse_questions('["a?", " ", "b?"]') == ["a?", "b?"]
+    assert parse_questions("1. Which OS?\n- Python version?\nThanks") == ["Which OS?", "Python version?"]
+    assert parse_questions("Nothing to clarify") == []
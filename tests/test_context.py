@@ -0,0 +1,54 @@
+from worket_agent.context import ContextBuilder, estimate_tokens, prompt_budget, truncate_tokens
+
+
+def module(path, lines, value=0):
+    body = "".join(f"def helper_{index}(x):\n    return x + {index + value}\n\n" for index in range(lines))
+    return {"path": path, "type": "code", "content": body}
+
+
+def test_files_within_budget_are_sent_in_full():
+    files = [module("a.py", 2), module("b.py", 2)]
+    text = ContextBuilder().build(files, role="programmer")
+    assert all(f["content"] in text for f in files)
+
+
+def test_changed_file_is_diffed_against_the_prior_prompt_of_the_same_role():
+    builder = ContextBuilder(token_budget=2500)
+    files = [module("main.py", 5), module("big.py", 150), module("other.py", 100)]
+    budget = estimate_tokens(files[0]["content"]) + estimate_tokens(files[1]["content"]) + 200
+    builder.build(files, prompt="Fix big.py", role="programmer", token_budget=budget)
+    assert builder.sent["programmer"] == {"big.py": files[1]["content"], "main.py": files[0]["content"]}
+
+    changed = [module("main.py", 5, value=1), files[1], files[2]]
+    text = builder.build(changed, prompt="Fix big.py", role="programmer", token_budget=budget)
+    assert "```diff\n--- a/main.py\n+++ b/main.py" in text
+    # The diff base was not shown in full this time, the next prompt sends the file in full again
+    assert "main.py" not in builder.sent["programmer"]
+
+    # The tester never saw main.py in full, so it gets no diff
+    text = builder.build(changed, prompt="Fix big.py", role="tester", token_budget=budget)
+    assert "```diff" not in text
+
+
+def test_mentioned_files_match_whole_names_only():
+    builder = ContextBuilder()
+    files = [
+        {"path": "./a.py", "type": "code", "content": "import b\n"},
+        {"path": "./data.py", "type": "code", "content": "x = 1\n"},
+        {"path": "./b.py", "type": "code", "content": "y = 2\n"},
+    ]
+    assert builder.implicated_paths(files, ["Error in data.py line 3"]) == {"./data.py"}
+    assert builder.implicated_paths(files, ['File "/tmp/w/a.py", line 1.']) == {"./a.py", "./b.py"}
+
+
+def test_prompt_budget_keeps_room_for_the_completion():
+    assert prompt_budget(16384, 20000) < 16384 // 2
+    assert prompt_budget(16384, 512) > 16384 // 2
+
+
+def test_truncate_tokens_keeps_the_end():
+    text = "first line\n" + "x" * 1000 + "\nValueError: boom"
+    truncated = truncate_tokens(text, 20)
+    assert truncated.endswith("ValueError: boom")
+    assert estimate_tokens(truncated) <= 20
+    assert truncate_tokens("short", 20) == "short"
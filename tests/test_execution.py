@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from worket_agent.execution import ExecutionEngine
+
+posix_only = pytest.mark.skipif(os.name != "posix", reason="rlimits and process groups are POSIX only")
+
+
+def write_script(tmp_path, name, source):
+    path = tmp_path / name
+    path.write_text(source)
+    return str(path)
+
+
+def test_scripts_run_concurrently_in_order(tmp_path):
+    paths = [write_script(tmp_path, f"s{index}.py", f"print({index})") for index in range(3)]
+    results = asyncio.run(ExecutionEngine().run_scripts(sys.executable, paths))
+    assert [result["stdout"].strip() for result in results] == ["0", "1", "2"]
+    assert all(result["success"] for result in results)
+
+
+def test_timeout_kills_the_script_and_keeps_its_output(tmp_path):
+    path = write_script(tmp_path, "slow.py", "import time\nprint('started', flush=True)\ntime.sleep(30)\n")
+    result = asyncio.run(ExecutionEngine(timeout=0.5).run_script(sys.executable, path))
+    assert result["timed_out"]
+    assert not result["success"]
+    assert result["stdout"].strip() == "started"
+    assert result["duration"] < 5
+
+
+@posix_only
+def test_cancelled_run_kills_and_reaps_the_process(tmp_path):
+    pid_file = tmp_path / "pid"
+    path = write_script(
+        tmp_path, "slow.py", f"import os, time\nopen({str(pid_file)!r}, 'w').write(str(os.getpid()))\ntime.sleep(30)\n"
+    )
+
+    async def run_and_cancel():
+        task = asyncio.ensure_future(ExecutionEngine().run_script(sys.executable, path))
+        while not pid_file.exists() or not pid_file.read_text():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run_and_cancel())
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+@posix_only
+def test_cpu_limit_applies_and_address_space_is_unlimited_by_default(tmp_path):
+    path = write_script(
+        tmp_path, "limits.py",
+        "import resource\nprint(resource.getrlimit(resource.RLIMIT_CPU)[0], resource.getrlimit(resource.RLIMIT_AS)[0])",
+    )
+    result = asyncio.run(ExecutionEngine(cpu_seconds=7).run_script(sys.executable, path))
+    import resource
+
+    cpu, address_space = result["stdout"].split()
+    assert cpu == "7"
+    assert int(address_space) == resource.getrlimit(resource.RLIMIT_AS)[0]
@@ -0,0 +1,60 @@
+from worket_agent.impact import ImpactAnalyzer, imported_modules, module_name
+
+
+def file(path, content, file_type="code"):
+    return {"path": path, "type": file_type, "content": content}
+
+
+def workspace():
+    return [
+        file("pkg/__init__.py", ""),
+        file("pkg/util.py", "VALUE = 1\n"),
+        file("main.py", "from pkg.util import VALUE\nprint(VALUE)\n"),
+        file("other.py", "print(2)\n"),
+        file("test_main.py", "import main\n", "test"),
+        file("requirements.txt", "requests\n", "requirements"),
+    ]
+
+
+def test_module_names():
+    assert module_name("pkg/mod.py") == "pkg.mod"
+    assert module_name("pkg/__init__.py") == "pkg"
+    assert module_name("__init__.py") == ""
+
+
+def test_relative_imports_are_resolved():
+    assert imported_modules("from . import a\nfrom ..b import c\n", "pkg/sub/mod.py") == {
+        "pkg.sub", "pkg.sub.a", "pkg.b", "pkg.b.c",
+    }
+
+
+def test_import_graph_includes_packages():
+    graph = ImpactAnalyzer().import_graph(workspace())
+    assert graph["main.py"] == {"pkg/__init__.py", "pkg/util.py"}
+    assert graph["test_main.py"] == {"main.py"}
+    assert graph["other.py"] == set()
+
+
+def test_only_affected_files_run_again():
+    analyzer = ImpactAnalyzer()
+    files = workspace()
+    paths = ["main.py", "other.py", "test_main.py"]
+    analyzer.record(files, {path: True for path in paths})
+
+    files[1]["content"] = "VALUE = 2\n"
+    assert analyzer.plan(files, paths) == (["main.py", "test_main.py"], ["other.py"])
+
+
+def test_requirements_change_affects_every_file():
+    analyzer = ImpactAnalyzer()
+    files = workspace()
+    analyzer.record(files, {"other.py": True})
+    files[-1]["content"] = "requests\nflask\n"
+    assert analyzer.plan(files, ["other.py"]) == (["other.py"], [])
+
+
+def test_failed_files_run_first():
+    analyzer = ImpactAnalyzer()
+    files = workspace()
+    analyzer.record(files, {"main.py": True, "other.py": False})
+    assert analyzer.plan(files, ["test_main.py", "main.py", "other.py"]) == (["other.py", "test_main.py"], ["main.py"])
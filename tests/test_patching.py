@@ -0,0 +1,91 @@
+import asyncio
+
+from worket_agent.agent import CodeGenerator
+from worket_agent.backends import LocalBackend
+from worket_agent.patching import apply_edits, file_type, parse_edits
+from worket_agent.routing import ModelRouter
+from worket_agent.validation import validate_files
+
+
+class NoEnvironmentPool:
+    def acquire(self, env_dir, requirements=None):
+        return env_dir
+
+
+def test_two_file_git_diff():
+    files = [
+        {"path": "./a.py", "content": "def a():\n    return 1\n"},
+        {"path": "./b.py", "content": "import a\n\n\ndef b():\n    return a.a()\n"},
+    ]
+    response = """Here is the fix:
+
+```diff
+diff --git a/a.py b/a.py
+index 1111111..2222222 100644
+--- a/a.py
++++ b/a.py
+@@ -1,2 +1,2 @@
+ def a():
+-    return 1
++    return 2
+
+diff --git a/b.py b/b.py
+index 3333333..4444444 100644
+--- a/b.py
++++ b/b.py
+@@ -3,3 +3,3 @@
+ 
+ def b():
+-    return a.a()
++    return a.a() + 1
+```
+
+This makes both functions return the new values.
+"""
+    edits = parse_edits(response)
+    assert [edit["path"] for edit in edits] == ["a.py", "b.py"]
+    assert edits[0]["search"] == ["def a():", "    return 1"]
+    assert edits[1]["search"] == ["", "def b():", "    return a.a()"]
+
+    changed = apply_edits(files, edits)
+    assert changed == {
+        "./a.py": "def a():\n    return 2\n",
+        "./b.py": "import a\n\n\ndef b():\n    return a.a() + 1\n",
+    }
+
+
+def test_file_type_of_untracked_paths():
+    assert file_type("pkg/tool.py") == "code"
+    assert file_type("tests/test_tool.py") == "test"
+    assert file_type("requirements.txt") == "requirements"
+    assert file_type("README.md") == "other"
+
+
+def test_new_requirements_file_is_not_validated_as_python(tmp_path):
+    response = """requirements.txt
+<<<<<<< SEARCH
+=======
+requests>=2
+>>>>>>> REPLACE
+
+util.py
+<<<<<<< SEARCH
+=======
+VALUE = 1
+>>>>>>> REPLACE
+"""
+    generator = CodeGenerator(
+        str(tmp_path), backend=LocalBackend(lambda request: response), env_pool=NoEnvironmentPool(),
+        checkpoint=False, router=ModelRouter(),
+    )
+    generator.prompt = "Add a helper module and the requirements."
+    files = [{"path": "main.py", "type": "code", "content": "# main.py\nprint(1)\n"}]
+    code_blocks = []
+    applied = asyncio.run(generator._apply_patch(files, "error", code_blocks.append, lambda message: None))
+
+    assert applied
+    assert code_blocks == ["# util.py\nVALUE = 1\n"]
+    assert {"path": "requirements.txt", "type": "requirements", "content": "requests>=2\n"} in files
+    assert (tmp_path / "requirements.txt").read_text() == "# requirements.txt\nrequests>=2\n"
+    files.append({"path": "notes.txt", "type": "code", "content": "not python"})
+    assert validate_files(files) == []
@@ -0,0 +1,47 @@
+from worket_agent.backends import SMALL_MODEL
+from worket_agent.routing import DEFAULT_ROUTES, ModelRouter
+
+
+def test_routes_by_role():
+    router = ModelRouter()
+    assert router.route("clarify") == {"model": SMALL_MODEL, "max_tokens": 256, "stop": ["\n\n"], "use_cache": True}
+    assert router.route("tester")["use_cache"] is False
+    assert router.route("unknown") == router.route("programmer")
+
+
+def test_overrides_merge_with_defaults():
+    router = ModelRouter(routes={"tester": {"model": "big"}, "review": {"max_tokens": 100}})
+    assert router.route("tester")["model"] == "big"
+    assert router.route("tester")["max_tokens"] == DEFAULT_ROUTES["tester"]["max_tokens"]
+    assert router.route("review")["max_tokens"] == 100
+    assert DEFAULT_ROUTES["tester"]["model"] is None
+
+
+def test_budget_adapts_after_enough_samples():
+    router = ModelRouter(min_samples=3, headroom=2.0)
+    completion = "x" * 4 * 1000
+    for _ in range(2):
+        router.observe("tester", completion, router.budget("tester"))
+    assert router.budget("tester") == DEFAULT_ROUTES["tester"]["max_tokens"]
+
+    router.observe("tester", completion, router.budget("tester"))
+    assert router.budget("tester") == 2000
+    # Never below the route's minimum
+    for _ in range(50):
+        router.observe("tester", "x", 2000)
+    assert router.budget("tester") == DEFAULT_ROUTES["tester"]["min_tokens"]
+
+
+def test_non_adaptive_routes_keep_their_budget():
+    router = ModelRouter(min_samples=1)
+    router.observe("programmer", "x", DEFAULT_ROUTES["programmer"]["max_tokens"])
+    assert router.budget("programmer") == DEFAULT_ROUTES["programmer"]["max_tokens"]
+    assert ModelRouter(adaptive=False, min_samples=1).budget("tester") == DEFAULT_ROUTES["tester"]["max_tokens"]
+
+
+def test_completion_near_a_shrunk_budget_may_be_truncated():
+    router = ModelRouter()
+    assert router.observe("tester", "x" * 4 * 600, 1000)
+    assert not router.observe("tester", "x" * 4 * 400, 1000)
+    # The full budget is the real limit, nothing to retry with
+    assert not router.observe("tester", "x" * 4 * 6000, router.full_budget("tester"))
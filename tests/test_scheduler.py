@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from worket_agent.scheduler import TaskGraph
+
+
+def test_tasks_start_after_their_dependencies():
+    events = []
+
+    def task(name, delay, value):
+        async def run(results):
+            events.append(("start", name, dict(results)))
+            await asyncio.sleep(delay)
+            events.append(("end", name))
+            return value
+
+        return run
+
+    graph = TaskGraph()
+    graph.add("code", task("code", 0.02, "code"))
+    graph.add("tests", task("tests", 0.01, "tests"))
+    graph.add("requirements", task("requirements", 0, "reqs"), depends_on=["code", "tests"])
+    results = asyncio.run(graph.run())
+
+    assert list(results) == ["code", "tests", "requirements"]
+    assert results["requirements"] == "reqs"
+    # Independent tasks overlap, the dependent one only sees finished results
+    assert events[:2] == [("start", "code", {}), ("start", "tests", {})]
+    assert events[-2:] == [("start", "requirements", {"code": "code", "tests": "tests"}), ("end", "requirements")]
+
+
+def test_failure_cancels_the_other_tasks():
+    cancelled = []
+
+    async def fail(results):
+        raise RuntimeError("boom")
+
+    async def slow(results):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def dependent(results):
+        cancelled.append("dependent ran")
+
+    graph = TaskGraph()
+    graph.add("fail", fail)
+    graph.add("slow", slow)
+    graph.add("dependent", dependent, depends_on=["fail"])
+
+    async def run():
+        with pytest.raises(RuntimeError, match="boom"):
+            await graph.run()
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled == ["slow"]
+
+
+def test_invalid_registrations():
+    async def noop(results):
+        return None
+
+    graph = TaskGraph()
+    graph.add("a", noop)
+    with pytest.raises(ValueError):
+        graph.add("a", noop)
+    with pytest.raises(ValueError):
+        graph.add("b", noop, depends_on=["missing"])
+    assert len(graph) == 1
@@ -0,0 +1,72 @@
+import asyncio
+import sys
+import threading
+import time
+
+import pytest
+
+from worket_agent.agent import CodeGenerator
+from worket_agent.backends import LocalBackend
+from worket_agent.client import AgentClient, server_available
+from worket_agent.server import AgentServer
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses a Unix socket")
+
+
+class NoEnvironmentPool:
+    def acquire(self, env_dir, requirements=None):
+        return env_dir
+
+    def warm(self, requirements=None):
+        pass
+
+
+async def arun(self, user_prompt, max_clarifications=10, clarification_handler=None, verbose_handler=None):
+    verbose_handler(f"Working on: {user_prompt}")
+    loop = asyncio.get_running_loop()
+    name = await loop.run_in_executor(None, clarification_handler, "Which name?")
+    answers = await loop.run_in_executor(None, clarification_handler, ["Which OS?", "Which shell?"])
+    return {"success": True, "iterations": self.max_iterations, "files": [name] + list(answers)}
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(CodeGenerator, "arun", arun)
+    address = str(tmp_path / "s.sock")
+    server = AgentServer(address=address, backend=LocalBackend(lambda request: ""), env_pool=NoEnvironmentPool())
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server_available(address):
+        assert time.monotonic() < deadline, "the server did not start"
+        time.sleep(0.05)
+    yield AgentClient(address)
+    AgentClient(address).shutdown()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+def test_ping(server):
+    assert server.ping()["jobs"] == 0
+
+
+def test_run_streams_progress_and_questions(server, tmp_path):
+    progress = []
+    questions = []
+
+    def handler(question):
+        questions.append(question)
+        return "World" if question == "Which name?" else ["Linux", "bash"]
+
+    outcome = server.run(
+        "Write a greeter", str(tmp_path / "workspace"), clarification_handler=handler,
+        verbose_handler=progress.append, max_iterations=2, env_dir="/elsewhere",
+    )
+    assert outcome == {"success": True, "iterations": 2, "files": ["World", "Linux", "bash"]}
+    assert progress == ["Working on: Write a greeter"]
+    assert questions == ["Which name?", ["Which OS?", "Which shell?"]]
+
+
+def test_job_errors_are_raised_by_the_client(server, tmp_path):
+    with pytest.raises(RuntimeError, match="KeyError"):
+        server._request({"op": "run", "workspace": str(tmp_path / "workspace")})
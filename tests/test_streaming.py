@@ -0,0 +1,54 @@
+import random
+import time
+
+from worket_agent.streaming import CODE_BLOCK_PATTERN, CodeBlockParser
+
+
+def extract_code(text):
+    blocks = [block for block in CODE_BLOCK_PATTERN.findall(text) if block.strip()]
+    return blocks or [text]
+
+
+def feed_in_chunks(text, sizes):
+    parser = CodeBlockParser()
+    blocks = []
+    position = 0
+    for size in sizes:
+        blocks.extend(parser.feed(text[position:position + size]))
+        position += size
+    blocks.extend(parser.feed(text[position:]))
+    blocks.extend(parser.finish())
+    return blocks
+
+
+RESPONSE = (
+    "Here you go:\n```python\n# app.py\nprint('a')\n```\n"
+    "and\n````\n# util.py\nx = '``'\n```\n```\n\n```\n```pyth\n```python\n# last.py\ny = 1\n```trailing"
+)
+
+
+def test_blocks_match_extract_code_for_every_split():
+    expected = extract_code(RESPONSE)
+    for split in range(len(RESPONSE) + 1):
+        assert feed_in_chunks(RESPONSE, [split]) == expected
+
+
+def test_blocks_match_extract_code_for_random_chunks():
+    rng = random.Random(0)
+    expected = extract_code(RESPONSE)
+    for _ in range(200):
+        sizes = [rng.randint(1, 5) for _ in range(len(RESPONSE))]
+        assert feed_in_chunks(RESPONSE, sizes) == expected
+
+
+def test_text_without_blocks_falls_back_to_whole_text():
+    assert feed_in_chunks("no code here ``` at all", [1] * 30) == ["no code here ``` at all"]
+
+
+def test_large_block_in_small_chunks_is_linear():
+    body = "# big.py\n" + "value = 'x' * 10  # padding\n" * 4000
+    text = f"```python\n{body}```"
+    start = time.process_time()
+    blocks = feed_in_chunks(text, [4] * (len(text) // 4))
+    assert blocks == [body]
+    assert time.process_time() - start < 2
@@ -0,0 +1,62 @@
+import asyncio
+import sys
+
+import pytest
+
+from worket_agent import testing
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="rlimits are POSIX only")
+
+
+def run_tests(runner, tmp_path, source):
+    (tmp_path / "test_limits.py").write_text(source)
+
+    async def run():
+        try:
+            return await runner.run(sys.executable, ["test_limits.py"], str(tmp_path))
+        finally:
+            await runner.close()
+
+    return {result["id"]: result for result in asyncio.run(run())}
+
+
+def test_workers_get_the_memory_limit(tmp_path):
+    limit = 4 * 1024 ** 3
+    results = run_tests(testing.TestRunner(workers=1, memory_bytes=limit), tmp_path, f"""
+import resource
+
+
+def test_limit():
+    assert resource.getrlimit(resource.RLIMIT_AS)[0] == {limit}
+""")
+    assert results["test_limits.py::test_limit"]["outcome"] == "passed"
+
+
+def test_cpu_limit_applies_to_each_test(tmp_path):
+    results = run_tests(testing.TestRunner(workers=1, timeout=20, fail_fast=False, cpu_seconds=1), tmp_path, """
+import time
+
+
+def burn(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+def test_a_first():
+    burn(0.7)
+
+
+def test_b_second():
+    burn(0.7)
+
+
+def test_c_spin():
+    while True:
+        pass
+""")
+    assert results["test_limits.py::test_a_first"]["outcome"] == "passed"
+    assert results["test_limits.py::test_b_second"]["outcome"] == "passed"
+    spin = results["test_limits.py::test_c_spin"]
+    assert spin["outcome"] == "error"
+    assert "CPU time limit" in spin["message"]
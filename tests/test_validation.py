@@ -0,0 +1,53 @@
+from worket_agent.validation import format_issues, validate_files
+
+
+def code(path, content):
+    return {"path": path, "type": "code", "content": content}
+
+
+def messages(files, headerless_blocks=0):
+    return [(issue["path"], issue["message"]) for issue in validate_files(files, headerless_blocks)]
+
+
+def test_valid_workspace_has_no_issues():
+    files = [
+        code("util.py", "import os\n\nVALUE = 1\n\n\ndef helper(x):\n    return os.path.join(x, str(VALUE))\n"),
+        code("main.py", "from util import VALUE, helper\n\nprint(helper('a'), VALUE)\n"),
+    ]
+    assert messages(files) == []
+
+
+def test_syntax_error_is_reported_with_its_location():
+    issues = validate_files([code("main.py", "def broken(:\n    pass\n")])
+    assert len(issues) == 1
+    assert issues[0]["message"].startswith("SyntaxError")
+    assert issues[0]["line"] == 1
+    assert format_issues(issues).startswith("main.py:1:")
+
+
+def test_missing_name_in_workspace_module():
+    files = [code("util.py", "VALUE = 1\n"), code("main.py", "from util import VALUE, missing\n")]
+    assert messages(files) == [
+        ("main.py", "cannot import name 'missing' from workspace module 'util' (util.py)"),
+    ]
+
+
+def test_relative_import_is_rejected():
+    files = [code("util.py", "VALUE = 1\n"), code("main.py", "from .util import VALUE\n")]
+    assert messages(files)[0][1].startswith("Relative import fails")
+
+
+def test_undefined_name_is_reported_once():
+    assert messages([code("main.py", "print(total)\nprint(total)\n")]) == [("main.py", "undefined name 'total'")]
+
+
+def test_class_body_names_are_only_defined_in_the_class_body():
+    content = "class A:\n    name = __qualname__\n\n    def method(self):\n        return __qualname__\n"
+    assert messages([code("main.py", content)]) == [("main.py", "undefined name '__qualname__'")]
+
+
+def test_headerless_blocks_and_non_python_files():
+    files = [{"path": "requirements.txt", "type": "requirements", "content": "requests\n"}]
+    assert messages(files, headerless_blocks=1) == [
+        ("<unnamed block>", "Code block does not start with a '# path' comment, so it could not be saved."),
+    ]
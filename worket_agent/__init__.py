@@ -1,4 +1,39 @@
-from .agent import ClarifierAgent
-from .agent import CodeGenerator
+import importlib
 
-__all__ = ["ClarifierAgent", "CodeGenerator"]
\ No newline at end of file
+# Submodules are imported on first access, so light entry points such as the CLI client start fast
+_EXPORTS = {
+    "AgentClient": "client",
+    "AgentServer": "server",
+    "ClarifierAgent": "agent",
+    "CodeBlockParser": "streaming",
+    "CodeGenerator": "agent",
+    "EnvironmentPool": "environments",
+    "ExecutionEngine": "execution",
+    "HuggingFaceBackend": "backends",
+    "LLMBackend": "backends",
+    "LlamaCppBackend": "backends",
+    "LocalBackend": "backends",
+    "MetricsRegistry": "tracing",
+    "ModelRouter": "routing",
+    "RequirementsInstaller": "installer",
+    "ResilientBackend": "backends",
+    "ResponseCache": "cache",
+    "TestRunner": "testing",
+    "Tracer": "tracing",
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+__all__ = ["AgentClient", "AgentServer", "ClarifierAgent", "CodeBlockParser", "CodeGenerator", "EnvironmentPool", "ExecutionEngine", "HuggingFaceBackend", "LLMBackend", "LlamaCppBackend", "LocalBackend", "MetricsRegistry", "ModelRouter", "RequirementsInstaller", "ResilientBackend", "ResponseCache", "TestRunner", "Tracer"]
\ No newline at end of file
@@ -1,26 +1,199 @@
+import asyncio
+import contextvars
+import copy
+import json
 import os
 import re
-import subprocess
-import sys
-
-from huggingface_hub import InferenceClient
-from stdlib_list import stdlib_list
+import shutil
+import tempfile
+
+from worket_agent.backends import get_default_backend, run_sync
+from worket_agent.checkpoint import RunJournal, journal_path
+from worket_agent.context import ContextBuilder, estimate_tokens, format_file, prompt_budget, truncate_tokens
+from worket_agent.dependencies import resolve_requirements, stdlib_modules
+from worket_agent.execution import ExecutionEngine
+from worket_agent.impact import ImpactAnalyzer, content_hash
+from worket_agent.installer import RequirementsInstaller
+from worket_agent.patching import PatchError, apply_edits, file_type, parse_edits
+from worket_agent.prompt_rules import (
+    AGENT_PROMPT, BATCH_CLARIFY_PROMPT, PATCH_PROMPT, PROGRAMMER_PROMPT, REQUIREMENTS_PROMPT, ROADMAP_PROMPT,
+    TESTER_PROMPT,
+)
+from worket_agent.routing import get_default_router
+from worket_agent.scheduler import TaskGraph
+from worket_agent.streaming import CodeBlockParser
+from worket_agent.testing import FAILED_OUTCOMES, format_test_failures
+from worket_agent.tracing import get_tracer
+from worket_agent.validation import format_issues, validate_files
+
+
+async def async_fast_chat_programmer(messages, temperature=0.2, backend=None, use_cache=True, model=None,
+                                     max_tokens=None, stop=None):
+    backend = backend if backend else get_default_backend()
+    return await backend.chat(
+        messages, temperature=temperature, use_cache=use_cache, model=model, max_tokens=max_tokens, stop=stop
+    )
 
-from worket_agent.prompt_rules import AGENT_PROMPT, PROGRAMMER_PROMPT, REQUIREMENTS_PROMPT, ROADMAP_PROMPT, TESTER_PROMPT
 
-client = InferenceClient(timeout=60 * 5)
+def _set_token_counts(span, messages, response):
+    # Counting is skipped entirely when tracing is disabled
+    if get_tracer().enabled:
+        span.set(
+            prompt_tokens=sum(estimate_tokens(message["content"]) for message in messages),
+            completion_tokens=estimate_tokens(response),
+        )
 
 
-def fast_chat_programmer(messages, temperature=0.2):
-    response = client.chat.completions.create(
-        model="Qwen/Qwen2.5-Coder-32B-Instruct",
-        messages=messages,
-        temperature=temperature,
-        max_tokens=20000,
-        stream=False,
+def fast_chat_programmer(messages, temperature=0.2, backend=None, use_cache=True, model=None, max_tokens=None,
+                         stop=None):
+    return run_sync(
+        async_fast_chat_programmer(
+            messages, temperature=temperature, backend=backend, use_cache=use_cache, model=model,
+            max_tokens=max_tokens, stop=stop,
+        )
     )
 
-    return response.choices[0].message.content
+
+async def routed_chat(router, role, messages, temperature=0.2, backend=None):
+    """
+    Sends a chat request with the model, token budget, stop sequences and caching the router picks for the role.
+
+    Args:
+        router (ModelRouter): The router.
+        role (str): The role of the call.
+        messages (list of dict): The chat messages.
+        temperature (float): The sampling temperature.
+        backend (LLMBackend, optional): The backend, the default backend if omitted.
+
+    Returns:
+        str: The content of the completion.
+    """
+    route = router.route(role)
+    with get_tracer().span(
+        f"llm.{role}", temperature=temperature, model=route["model"], max_tokens=route["max_tokens"]
+    ) as span:
+        response = await async_fast_chat_programmer(messages, temperature=temperature, backend=backend, **route)
+        if router.observe(role, response, route["max_tokens"]):
+            # The adapted budget may have cut the completion short, ask again with the full one
+            span.set(full_budget_retry=True)
+            route["max_tokens"] = router.full_budget(role)
+            route["use_cache"] = False
+            response = await async_fast_chat_programmer(messages, temperature=temperature, backend=backend, **route)
+            router.observe(role, response, route["max_tokens"])
+        _set_token_counts(span, messages, response)
+    return response
+
+
+def parse_questions(text):
+    """
+    Parses the questions of a batch clarification response.
+
+    Args:
+        text (str): The response, ideally a JSON array of strings.
+
+    Returns:
+        list of str: The questions, empty if nothing needs to be clarified.
+    """
+    start, end = text.find("["), text.rfind("]")
+    if start != -1 and end > start:
+        try:
+            questions = json.loads(text[start:end + 1])
+        except ValueError:
+            questions = None
+        if isinstance(questions, list):
+            return [str(question).strip() for question in questions if str(question).strip()]
+    if "Nothing to clarify" in text:
+        return []
+    # Fall back to one question per line, without list markers
+    lines = [re.sub(r"^\s*(?:[-*]|\d+[.)])\s*", "", line).strip() for line in text.splitlines()]
+    return [line for line in lines if line.endswith("?")]
+
+
+def clarifications_are_immaterial(clarification_interview):
+    """
+    Tells whether clarification answers leave the prompt unchanged.
+
+    Any non-empty answer counts, even a short one such as 'none' may settle a question.
+
+    Args:
+        clarification_interview (list of dict): The questions and answers.
+
+    Returns:
+        bool: True if every answer is empty.
+    """
+    return all(not str(qa["answer"]).strip() for qa in clarification_interview)
+
+
+def match_answers(answers, questions):
+    """
+    Pairs the result of a batch clarification handler with its questions.
+
+    Args:
+        answers (list, dict or str): Answers in question order, answers keyed by question, or a text
+            with one answer per line.
+        questions (list of str): The questions asked.
+
+    Returns:
+        list of str: One answer per question, empty where none was given.
+    """
+    if isinstance(answers, dict):
+        return [str(answers.get(question, "")) for question in questions]
+    if isinstance(answers, str):
+        answers = [answers] if len(questions) == 1 else answers.splitlines()
+    answers = [str(answer) for answer in answers or []]
+    return (answers + [""] * len(questions))[:len(questions)]
+
+
+def ask_on_terminal(questions):
+    """
+    Shows every question at once, then reads the answers one per question.
+
+    Args:
+        questions (list of str): The questions.
+
+    Returns:
+        list of str: The answers.
+    """
+    print("Please answer the clarification questions:")
+    for number, question in enumerate(questions, start=1):
+        print(f"{number}. {question}")
+    return [input(f"{number}. ") for number in range(1, len(questions) + 1)]
+
+
+def roadmap_prompt(user_prompt, clarification_interview):
+    """
+    Builds the roadmap request from the prompt and the clarification answers.
+
+    Args:
+        user_prompt (str): The instructions provided by the user.
+        clarification_interview (list of dict): The questions and answers.
+
+    Returns:
+        str: The problem description for `ClarifierAgent.generate_roadmap`.
+    """
+    if clarification_interview:
+        clarifications_text = "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in clarification_interview])
+        return f"Prompt: {user_prompt}\nClarifications:\n{clarifications_text}"
+    return f"Prompt: {user_prompt}"
+
+
+def relative_to_workspace(text, workspace_dir):
+    """
+    Rewrites the paths inside a workspace that appear in a text relative to it.
+
+    Args:
+        text (str or None): The text, e.g. error feedback with tracebacks.
+        workspace_dir (str): The workspace directory.
+
+    Returns:
+        str or None: The text without the workspace directory in its paths.
+    """
+    if not text:
+        return text
+    # Longest first, the real path may contain the given one, e.g. /private/tmp on macOS
+    for directory in sorted({os.path.abspath(workspace_dir), os.path.realpath(workspace_dir)}, key=len, reverse=True):
+        text = text.replace(directory + os.sep, "").replace(directory, ".")
+    return text
 
 
 # Disable tokenizers parallelism to avoid potential issues
@@ -31,7 +204,17 @@ class ClarifierAgent:
     Agent responsible for clarifying the initial prompt and providing a roadmap for problem resolution.
     """
 
+    def __init__(self, backend=None, router=None):
+        self.backend = backend
+        self.router = router if router else get_default_router()
+
     def clarify(self, instructions, previous_clarifications=None):
+        """
+        Blocking variant of `aclarify`.
+        """
+        return run_sync(self.aclarify(instructions, previous_clarifications))
+
+    async def aclarify(self, instructions, previous_clarifications=None):
         """
         Determines if the instructions need additional clarifications.
 
@@ -51,10 +234,39 @@ class ClarifierAgent:
                 messages.append({"role": "assistant", "content": qa['question']})
                 messages.append({"role": "user", "content": qa['answer']})
 
-        response = fast_chat_programmer(messages, temperature=0.1)
+        response = await routed_chat(self.router, "clarify", messages, temperature=0.1, backend=self.backend)
         return response.strip()
 
+    def clarify_batch(self, instructions):
+        """
+        Blocking variant of `aclarify_batch`.
+        """
+        return run_sync(self.aclarify_batch(instructions))
+
+    async def aclarify_batch(self, instructions):
+        """
+        Lists every open question about the instructions in a single call.
+
+        Args:
+            instructions (str): The instructions provided by the user.
+
+        Returns:
+            list of str: The clarification questions, empty if nothing needs to be clarified.
+        """
+        messages = [
+            {"role": "system", "content": BATCH_CLARIFY_PROMPT},
+            {"role": "user", "content": instructions},
+        ]
+        response = await routed_chat(self.router, "clarify_batch", messages, temperature=0.1, backend=self.backend)
+        return parse_questions(response)
+
     def generate_roadmap(self, problem_description):
+        """
+        Blocking variant of `agenerate_roadmap`.
+        """
+        return run_sync(self.agenerate_roadmap(problem_description))
+
+    async def agenerate_roadmap(self, problem_description):
         """
         Generates a roadmap to resolve the described problem.
 
@@ -69,29 +281,57 @@ class ClarifierAgent:
             {"role": "user", "content": problem_description},
         ]
 
-        response = fast_chat_programmer(messages, temperature=0.2)
+        response = await routed_chat(self.router, "roadmap", messages, temperature=0.2, backend=self.backend)
         return response.strip()
 
 class CodeGenerator:
-    def __init__(self, workspace_dir, max_iterations=5, clarifier_agent=None, generate_tests=True):
+    def __init__(self, workspace_dir, max_iterations=5, clarifier_agent=None, generate_tests=True, backend=None,
+                 streaming=False, env_pool=None, installer=None, executor=None, context_builder=None,
+                 static_checks=True, candidates=1, candidate_temperatures=None, checkpoint=True, router=None,
+                 test_runner=None, speculative_clarification=False, incremental=True, edit_mode="full"):
         self.workspace_dir = workspace_dir
         self.env_dir = os.path.join(self.workspace_dir, "env")
         self.max_iterations = max_iterations
         self.prompt = None
         self.generate_tests = generate_tests
+        self.backend = backend
+        self.streaming = streaming
+        self.env_pool = env_pool
+        self.installer = installer if installer else RequirementsInstaller()
+        self.executor = executor if executor else ExecutionEngine()
+        self.context_builder = context_builder if context_builder else ContextBuilder()
+        self.static_checks = static_checks
+        self.temperature = 0.1
+        self.candidates = len(candidate_temperatures) if candidate_temperatures else candidates
+        self.candidate_temperatures = candidate_temperatures
+        self.journal = RunJournal(journal_path(workspace_dir)) if checkpoint else None
+        self.router = router if router else get_default_router()
+        self.test_runner = test_runner
+        self.speculative_clarification = speculative_clarification
+        self.impact = ImpactAnalyzer() if incremental else None
+        self._written = {}
+        self.edit_mode = edit_mode
+        self.edit_history = []
 
         self.create_virtualenv(self.env_dir)
-        self.clarifier = clarifier_agent if clarifier_agent else ClarifierAgent()
+        self.clarifier = clarifier_agent if clarifier_agent else ClarifierAgent(backend=backend, router=self.router)
 
     def create_virtualenv(self, env_dir):
         """
         Creates a virtual environment in the specified directory.
+
+        With an environment pool, the environment is cloned from a pre-built base instead.
         """
-        import venv
+        with get_tracer().span("create_env", pooled=self.env_pool is not None):
+            if self.env_pool is not None:
+                self.env_pool.acquire(env_dir)
+                return
+
+            import venv
 
-        builder = venv.EnvBuilder(with_pip=True)
-        builder.create(env_dir)
-        print(f"Virtual environment created at {env_dir}")
+            builder = venv.EnvBuilder(with_pip=True)
+            builder.create(env_dir)
+            print(f"Virtual environment created at {env_dir}")
 
     def get_env_python(self):
         """
@@ -143,19 +383,27 @@ class CodeGenerator:
 
     def generate_code(self, prompt, role="programmer", files=None, error_feedback=None):
         """
-        Generates code based on the provided prompt using the fast_chat_programmer function.
+        Blocking variant of `agenerate_code`.
+        """
+        return run_sync(self.agenerate_code(prompt, role=role, files=files, error_feedback=error_feedback))
+
+    def build_messages(self, prompt, role="programmer", files=None, error_feedback=None):
+        """
+        Builds the chat messages for a generation call.
 
         Args:
             prompt (str): The prompt to generate code for.
-            role (str): The role of the agent ('programmer', 'tester', 'requirements').
+            role (str): The role of the agent ('programmer', 'patch', 'tester', 'requirements').
             files (list of dict, optional): A list of dictionaries containing 'path', 'type', and 'content' of each file.
             error_feedback (str, optional): The error feedback.
 
         Returns:
-            str: The generated code.
+            list of dict: The chat messages.
         """
         if role == "programmer":
             system_prompt = PROGRAMMER_PROMPT
+        elif role == "patch":
+            system_prompt = PATCH_PROMPT
         elif role == "tester":
             system_prompt = TESTER_PROMPT
         elif role == "requirements":
@@ -163,20 +411,79 @@ class CodeGenerator:
         else:
             system_prompt = PROGRAMMER_PROMPT
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt},
-        ]
+        # With a bounded context window, the error feedback may take half of what the system prompt
+        # and the prompt leave, and the files what remains, so the completion still fits
+        file_budget = None
+        backend = self.backend if self.backend else get_default_backend()
+        if backend.context_window:
+            available = prompt_budget(backend.context_window, self.router.full_budget(role))
+            available -= estimate_tokens(system_prompt) + estimate_tokens(prompt)
+            if error_feedback:
+                error_feedback = truncate_tokens(error_feedback, max(available // 2, 0))
+                available -= estimate_tokens(error_feedback)
+            file_budget = max(available, 0)
+
+        # The files go before the prompt, so calls on the same workspace share the longest prefix
+        # and backends with a prefix cache only process what follows it
+        messages = [{"role": "system", "content": system_prompt}]
         if files:
-            files_formatted = "\n\n".join(
-                [f"```python\n{file['content']}\n```" for file in files]
+            files_formatted = self.context_builder.build(
+                files, prompt=prompt, error_feedback=error_feedback, token_budget=file_budget, role=role
             )
             messages.append({"role": "user", "content": files_formatted})
+        messages.append({"role": "user", "content": prompt})
         if error_feedback:
             messages.append({"role": "user", "content": f"Error:\n{error_feedback}"})
+        self.context_builder.record(role, messages)
+        return messages
+
+    async def agenerate_code(self, prompt, role="programmer", files=None, error_feedback=None):
+        """
+        Generates code based on the provided prompt using the configured backend.
+
+        Args:
+            prompt (str): The prompt to generate code for.
+            role (str): The role of the agent ('programmer', 'patch', 'tester', 'requirements').
+            files (list of dict, optional): A list of dictionaries containing 'path', 'type', and 'content' of each file.
+            error_feedback (str, optional): The error feedback.
+
+        Returns:
+            str: The generated code.
+        """
+        messages = self.build_messages(prompt, role=role, files=files, error_feedback=error_feedback)
+        return await routed_chat(self.router, role, messages, temperature=self.temperature, backend=self.backend)
 
-        response = fast_chat_programmer(messages, temperature=0.1)
-        return response
+    async def astream_code(self, prompt, on_block, role="programmer", files=None, error_feedback=None):
+        """
+        Streams a generation and hands over each code block as soon as it is complete.
+
+        Args:
+            prompt (str): The prompt to generate code for.
+            on_block (callable): Called with each code block, in order, as its closing fence arrives.
+            role (str): The role of the agent ('programmer', 'patch', 'tester', 'requirements').
+            files (list of dict, optional): A list of dictionaries containing 'path', 'type', and 'content' of each file.
+            error_feedback (str, optional): The error feedback.
+
+        Returns:
+            str: The full generated text.
+        """
+        messages = self.build_messages(prompt, role=role, files=files, error_feedback=error_feedback)
+        backend = self.backend if self.backend else get_default_backend()
+        parser = CodeBlockParser()
+        route = self.router.route(role)
+        with get_tracer().span(
+            f"llm.{role}", temperature=self.temperature, streaming=True, model=route["model"],
+            max_tokens=route["max_tokens"],
+        ) as span:
+            async for chunk in backend.stream(messages, temperature=self.temperature, **route):
+                for block in parser.feed(chunk):
+                    on_block(block)
+            for block in parser.finish():
+                on_block(block)
+            # Blocks were already handed out, a cut completion is fixed by the next iteration instead
+            self.router.observe(role, parser.text, route["max_tokens"])
+            _set_token_counts(span, messages, parser.text)
+        return parser.text
 
     def write_to_file(self, filepath, content):
         """
@@ -194,10 +501,19 @@ class CodeGenerator:
         content = f"# {filepath}\n" + content
 
         full_path = os.path.join(self.workspace_dir, filepath)
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with open(full_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        digest = content_hash(content)
+        if full_path not in self._written and os.path.exists(full_path):
+            with open(full_path, encoding="utf-8", errors="replace") as f:
+                self._written[full_path] = content_hash(f.read())
+        if self._written.get(full_path) == digest:
+            print(f"File unchanged: {full_path}")
+            return
+        with get_tracer().span("write_file", path=filepath, bytes=len(content)):
+            # Ensure the directory exists
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(content)
+        self._written[full_path] = digest
         print(f"File saved at: {full_path}")
 
     def filter_requirements(self, requirements_content):
@@ -210,43 +526,37 @@ class CodeGenerator:
         Returns:
             str: Filtered non-standard packages.
         """
-        python_version = f"{sys.version_info.major}.{sys.version_info.minor}"
-        standard_lib_modules = set(stdlib_list(python_version))
-        standard_lib_modules.update({"unittest", "mock"})
         packages = requirements_content.splitlines()
+        stdlib = stdlib_modules()
         non_standard_packages = [
-            pkg.split("==")[0] for pkg in packages if pkg.split("==")[0] not in standard_lib_modules
+            pkg.split("==")[0] for pkg in packages if pkg.split("==")[0] not in stdlib
         ]
 
         return "\n".join(non_standard_packages)
 
     def install_requirements(self):
         """
-        Installs the packages listed in the requirements.txt file.
+        Installs the packages listed in the requirements.txt file that are not installed yet.
         """
         requirements_file = os.path.join(self.workspace_dir, "requirements.txt")
         if os.path.exists(requirements_file):
-            print("Installing requirements from requirements.txt...")
-            python_executable = self.get_env_python()
+            with open(requirements_file, encoding="utf-8") as f:
+                requirements_content = f.read()
             try:
-                result = subprocess.run(
-                    [
-                        python_executable,
-                        "-m",
-                        "pip",
-                        "install",
-                        "-r",
-                        requirements_file,
-                    ],
-                    capture_output=True,
-                    text=True,
-                )
-                print(result.stdout)
-                if result.stderr:
-                    print(result.stderr)
+                with get_tracer().span("install") as span:
+                    record = self.installer.install(self.get_env_python(), self.env_dir, requirements_content)
+                    span.set(missing=len(record["missing"]), source=record["source"], success=record["success"])
             except Exception as e:
                 print(f"Error installing requirements: {e}")
                 return
+            if not record["missing"]:
+                print("Requirements already satisfied, skipping pip.")
+                return
+            print(
+                f"Installed {', '.join(record['missing'])} from {record['source']} in {record['duration']:.2f}s"
+            )
+            if not record["success"]:
+                print(record["output"])
         else:
             print("No requirements.txt file found.")
 
@@ -260,23 +570,272 @@ class CodeGenerator:
         Returns:
             tuple: A tuple containing a boolean indicating success and any error output.
         """
-        python_executable = self.get_env_python()
-        full_path = os.path.join(self.workspace_dir, filepath)
+        result = run_sync(self.aexecute_scripts([filepath]))[0]
+        return result["success"], self.format_execution_errors(result)
+
+    async def aexecute_scripts(self, filepaths):
+        """
+        Executes several scripts concurrently through the execution engine.
+
+        Args:
+            filepaths (list of str): The workspace-relative paths of the scripts.
+
+        Returns:
+            list of dict: One execution result per script, see `ExecutionEngine.run_script`.
+        """
+        python_executable = os.path.abspath(self.get_env_python())
+        full_paths = [os.path.abspath(os.path.join(self.workspace_dir, filepath)) for filepath in filepaths]
         try:
-            result = subprocess.run(
-                [python_executable, full_path], capture_output=True, text=True
+            results = await self.executor.run_scripts(python_executable, full_paths, cwd=self.workspace_dir)
+        except Exception as e:
+            print(f"Error executing {', '.join(filepaths)}: {e}")
+            return [
+                {"path": filepath, "exit_code": None, "success": False, "stdout": "", "stderr": str(e),
+                 "duration": 0.0, "timed_out": False, "stdout_truncated": False, "stderr_truncated": False}
+                for filepath in filepaths
+            ]
+
+        tracer = get_tracer()
+        for filepath, result in zip(filepaths, results):
+            result["path"] = filepath
+            tracer.record(
+                "execute",
+                result["duration"],
+                path=filepath,
+                exit_code=result["exit_code"],
+                timed_out=result["timed_out"],
             )
-            print(f"Execution output of {os.path.basename(filepath)}:\n{result.stdout}")
-            if result.stderr:
+            print(f"Execution output of {os.path.basename(filepath)}:\n{result['stdout']}")
+            if not result["success"]:
                 print(
-                    f"Errors during execution of {os.path.basename(filepath)}:\n{result.stderr}"
+                    f"Errors during execution of {os.path.basename(filepath)}:\n{self.format_execution_errors(result)}"
                 )
-            return len(result.stderr) == 0, result.stderr
-        except Exception as e:
-            print(f"Error executing {os.path.basename(filepath)}: {e}")
-            return False, str(e)
+        return results
+
+    async def arun_tests(self, test_paths, files=None):
+        """
+        Runs the test cases of the given files through the test runner.
+
+        Args:
+            test_paths (list of str): The workspace-relative paths of the test files.
+            files (list of dict, optional): The tracked files, to record which test files passed.
+
+        Returns:
+            str: Compact feedback listing each failed test, or an empty string if all passed.
+        """
+        results = await self.test_runner.run(os.path.abspath(self.get_env_python()), test_paths, self.workspace_dir)
+        if files is not None and self.impact is not None:
+            outcomes = {}
+            for result in results:
+                path = result["id"].split("::")[0]
+                if result["outcome"] == "not_run":
+                    # Unknown, run it again next time
+                    outcomes[path] = None
+                elif outcomes.get(path, True) is not None:
+                    outcomes[path] = outcomes.get(path, True) and result["outcome"] not in FAILED_OUTCOMES
+            self.impact.record(files, {path: passed for path, passed in outcomes.items() if passed is not None})
+        failures = format_test_failures(results)
+        return f"Test failures:\n{failures}\n" if failures else ""
+
+    def format_execution_errors(self, result):
+        """
+        Formats the error output of a failed execution for the feedback prompt.
+
+        Args:
+            result (dict): The execution result.
+
+        Returns:
+            str: The error output, or an empty string for a successful execution.
+        """
+        if result["success"]:
+            return ""
+        errors = result["stderr"]
+        if result["stderr_truncated"]:
+            errors += "\n[stderr truncated]"
+        if result["timed_out"]:
+            errors += f"\nTimed out after {self.executor.timeout}s and was killed."
+        elif not errors.strip():
+            errors += f"Exited with code {result['exit_code']}."
+        return errors
+
+    def _affected(self, files, paths, verbose_handler):
+        """
+        Narrows test files or scripts down to the ones affected by the changes since their last run.
+
+        Args:
+            files (list of dict): The tracked files.
+            paths (list of str): The test files or scripts.
+            verbose_handler (callable): Receives progress messages.
+
+        Returns:
+            list of str: The paths to run, previously failing ones first.
+        """
+        if self.impact is None:
+            return paths
+        to_run, reused = self.impact.plan(files, paths)
+        if reused:
+            verbose_handler(f"Unchanged since they passed, not run again: {', '.join(reused)}")
+        return to_run
+
+    def _record_executions(self, files, results):
+        if self.impact is not None:
+            self.impact.record(files, {result["path"]: result["success"] for result in results})
+
+    def _update_file(self, files, path, file_type, content):
+        """
+        Updates the content of a tracked file, adding it if it is not tracked yet.
+
+        Args:
+            files (list of dict): The tracked files.
+            path (str): The path of the file.
+            file_type (str): The file type ('code', 'test', 'requirements', 'other').
+            content (str): The new content.
+        """
+        existing_file = next((f for f in files if f["path"] == path), None)
+        if existing_file:
+            existing_file["content"] = content
+        else:
+            files.append({"path": path, "type": file_type, "content": content})
+
+    async def _apply_patch(self, files, error_feedback, on_code_block, verbose_handler):
+        """
+        Asks the programmer for search/replace edits instead of whole files and applies them.
+
+        The edits are applied to the tracked contents all at once, or not at all.
+
+        Args:
+            files (list of dict): The tracked files, updated in place.
+            error_feedback (str): The feedback from the previous round.
+            on_code_block (callable): Receives the full content of each edited code file.
+            verbose_handler (callable): Receives progress messages.
+
+        Returns:
+            bool: True if the edits were applied, False if whole files must be generated instead.
+        """
+        with get_tracer().span("patch") as span:
+            response = await self.agenerate_code(self.prompt, role="patch", files=files, error_feedback=error_feedback)
+            output_tokens = estimate_tokens(response)
+            try:
+                edits = parse_edits(response)
+                if not edits:
+                    raise PatchError("No edits found in the response.")
+                changed = apply_edits(files, edits)
+            except PatchError as e:
+                span.set(applied=False, output_tokens=output_tokens)
+                self.edit_history.append(
+                    {"mode": "fallback", "files": 0, "output_tokens": output_tokens, "full_tokens": None,
+                     "saved_tokens": 0}
+                )
+                verbose_handler(f"The edits did not apply, generating whole files instead:\n{e}")
+                return False
+
+            # Whole-file mode would have returned every code file in full, plus the other changed files
+            full_tokens = estimate_tokens("\n\n".join(
+                format_file({"path": f["path"], "content": changed.get(f["path"], f["content"])})
+                for f in files if f["type"] == "code" or f["path"] in changed
+            ))
+            saved_tokens = max(full_tokens - output_tokens, 0)
+            span.set(applied=True, edits=len(edits), files=len(changed), output_tokens=output_tokens,
+                     full_tokens=full_tokens, saved_tokens=saved_tokens)
+            self.edit_history.append(
+                {"mode": "patch", "files": len(changed), "output_tokens": output_tokens, "full_tokens": full_tokens,
+                 "saved_tokens": saved_tokens}
+            )
+
+        file_types = {f["path"]: f["type"] for f in files}
+        for path, content in changed.items():
+            # A new file, e.g. requirements.txt, is only Python code if its path says so
+            kind = file_types.get(path) or file_type(path)
+            if kind == "code":
+                if self.extract_path(content) != path:
+                    content = f"# {path}\n" + content
+                on_code_block(content)
+            else:
+                self.write_to_file(path, content)
+                self._update_file(files, path, kind, content)
+        message = f"Applied {len(edits)} edit(s) to {len(changed)} file(s) with ~{output_tokens} output tokens"
+        if saved_tokens:
+            message += f" instead of ~{full_tokens} ({saved_tokens} saved)"
+        print(message + ".")
+        return True
+
+    def _static_check_feedback(self, files, headerless_blocks, verbose_handler):
+        """
+        Runs the static checks and formats every issue found into one feedback message.
+
+        Args:
+            files (list of dict): The files to check.
+            headerless_blocks (int): Number of generated blocks without a '# path' header.
+            verbose_handler (callable): Receives progress messages.
+
+        Returns:
+            str: The feedback, or an empty string if the files passed.
+        """
+        issues = validate_files(files, headerless_blocks=headerless_blocks)
+        if not issues:
+            return ""
+        verbose_handler(
+            f"Static checks found {len(issues)} problem(s). The model will try to adjust the code based on the feedback."
+        )
+        error_feedback = f"Static check errors:\n{format_issues(issues)}\n"
+        print(error_feedback)
+        return error_feedback
+
+    def _tester_task(self, test_prompt, path, files):
+        async def task(_):
+            test_code = await self.agenerate_code(
+                f"{test_prompt}\nWrite the tests for {path}.",
+                role="tester",
+                files=files,
+            )
+            return self.extract_code(test_code)
+
+        return task
+
+    def _requirements_task(self, files):
+        async def task(tester_results):
+            analysed_files = list(files)
+            for test_contents in tester_results.values():
+                if test_contents:
+                    test_path = self.extract_path(test_contents[0])
+                    analysed_files.append({"path": test_path, "type": "test", "content": test_contents[0]})
+
+            try:
+                distributions, unresolved = resolve_requirements(analysed_files)
+            except SyntaxError:
+                requirements = await self.agenerate_code(
+                    "Create a requirements.txt file based on the dependencies in the code and test files provided.",
+                    role="requirements",
+                    files=files,
+                )
+                return self.extract_code(requirements)
+
+            if unresolved:
+                # Only the imports missing from the index cost a model call
+                requirements = await self.agenerate_code(
+                    "Create a requirements.txt file listing the pip packages that provide these imports: "
+                    + ", ".join(unresolved),
+                    role="requirements",
+                )
+                distributions += [line.strip() for line in self.extract_code(requirements)[0].splitlines()]
+            return ["\n".join(line for line in distributions if line and not line.startswith("#"))]
+
+        return task
 
     def run(self, user_prompt, max_clarifications=10, clarification_handler=None, verbose_handler=None):
+        """
+        Blocking variant of `arun`.
+        """
+        return run_sync(
+            self.arun(
+                user_prompt,
+                max_clarifications=max_clarifications,
+                clarification_handler=clarification_handler,
+                verbose_handler=verbose_handler,
+            )
+        )
+
+    async def arun(self, user_prompt, max_clarifications=10, clarification_handler=None, verbose_handler=None):
         """
         Executes the code generation process based on the user's prompt.
 
@@ -284,145 +843,463 @@ class CodeGenerator:
             user_prompt (str): The instructions provided by the user.
             clarification_handler (callable, optional): A callback function that receives a clarification question and returns the answer.
                                                         Should have the signature: func(question: str) -> str
+                                                        With `speculative_clarification`, it is called once with
+                                                        the list of every question instead, see `match_answers`.
                                                         If not provided, uses input() for interactions.
+
+        Returns:
+            dict: The outcome with 'success', 'iterations' used and the tracked 'files' paths.
         """
-        
-        if(verbose_handler == None):
-            verbose_handler = lambda str: print(str)
-            
-        clarification_interview = []
-        for _ in range(max_clarifications):
-            clarification = self.clarifier.clarify(user_prompt, clarification_interview)
-            if clarification == "Nothing to clarify":
-                break
-            else:
-                if clarification_handler and callable(clarification_handler):
-                    clarification_response = clarification_handler(clarification)
-                else:
-                    clarification_response = input(f"Please answer the clarification question: {clarification}\n")
-                clarification_interview.append({'question': clarification, 'answer': clarification_response})
+        if self.journal:
+            self.journal.start(user_prompt)
+        with get_tracer().span("generate", workspace=self.workspace_dir) as span:
+            try:
+                outcome = await self._arun(user_prompt, max_clarifications, clarification_handler, verbose_handler)
+            finally:
+                await self._close_test_workers()
+            span.set(success=outcome["success"], iterations=outcome["iterations"])
+        return outcome
 
-        if clarification_interview:
-            clarifications_text = "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in clarification_interview])
-            roadmap_prompt = f"Prompt: {user_prompt}\nClarifications:\n{clarifications_text}"
-        else:
-            roadmap_prompt = f"Prompt: {user_prompt}"
+    def resume(self, max_clarifications=10, clarification_handler=None, verbose_handler=None):
+        """
+        Blocking variant of `aresume`.
+        """
+        return run_sync(
+            self.aresume(
+                max_clarifications=max_clarifications,
+                clarification_handler=clarification_handler,
+                verbose_handler=verbose_handler,
+            )
+        )
 
-        roadmap = self.clarifier.generate_roadmap(roadmap_prompt)
+    async def aresume(self, max_clarifications=10, clarification_handler=None, verbose_handler=None):
+        """
+        Continues the run journaled in the workspace from its last completed step.
 
-        self.prompt = f"prompt: {user_prompt}\nroadmap:\n{roadmap}"
-        test_prompt = "Write unit tests for the generated code."
+        Clarification answers, the roadmap and finished iterations are taken from the
+        journal instead of querying the model again, and the tracked files are restored.
+
+        Args:
+            max_clarifications (int, optional): The maximum number of clarification questions in total.
+            clarification_handler (callable, optional): Receives the remaining clarification questions, see `arun`.
+            verbose_handler (callable, optional): Receives progress messages.
+
+        Returns:
+            dict: The outcome with 'success', 'iterations' used and the tracked 'files' paths.
+        """
+        state = self.journal.load() if self.journal else None
+        if state is None:
+            raise ValueError(f"No journaled run to resume in {self.workspace_dir}.")
+        if state["outcome"] is not None:
+            return state["outcome"]
+
+        for file in state["files"]:
+            full_path = os.path.join(self.workspace_dir, file["path"])
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(file["content"])
+            self._written.pop(full_path, None)
+        print(f"Resuming run after iteration {state['iteration']} in {self.workspace_dir}")
+
+        with get_tracer().span("generate", workspace=self.workspace_dir, resumed=True) as span:
+            try:
+                outcome = await self._arun(
+                    state["user_prompt"], max_clarifications, clarification_handler, verbose_handler, state=state
+                )
+            finally:
+                await self._close_test_workers()
+            span.set(success=outcome["success"], iterations=outcome["iterations"])
+        return outcome
+
+    async def _close_test_workers(self, workspace_dir=None):
+        if self.test_runner is not None:
+            await self.test_runner.close(workspace_dir if workspace_dir else self.workspace_dir)
 
-        files = []
-        error_feedback = None
+    def _checkpoint(self, step, **data):
+        if self.journal:
+            self.journal.append(step, **data)
 
-        for iteration in range(1, self.max_iterations + 1):
+    async def _arun(self, user_prompt, max_clarifications, clarification_handler, verbose_handler, state=None):
+        if(verbose_handler == None):
+            verbose_handler = lambda str: print(str)
+
+        if state and state["roadmap"] is not None:
+            self.prompt = state["prompt"]
+            test_prompt = state["test_prompt"]
+            files = state["files"]
+            error_feedback = state["error_feedback"]
+            first_iteration = state["iteration"] + 1
+        else:
+            self.prompt, test_prompt = await self._clarify_and_plan(
+                user_prompt, max_clarifications, clarification_handler, state
+            )
+            files = []
+            error_feedback = None
+            first_iteration = 1
+
+        for iteration in range(first_iteration, self.max_iterations + 1):
             verbose_handler(f"\nIteration {iteration}:")
             files = [f for f in files if f["type"] == "code" or f["type"] == "test"]
 
             if error_feedback:
                 self.prompt = "Resolve the errors and problems based on the feedback."
                 test_prompt = "Resolve the errors and problems based on the feedback."
-            code = self.generate_code(
-                self.prompt,
-                role="programmer",
-                files=files,
-                error_feedback=error_feedback,
-            )
-            code_contents = self.extract_code(code)
-            for code_content in code_contents:
-                path = self.extract_path(code_content)
-                self.write_to_file(path, code_content)
-
-                existing_file = next((f for f in files if f["path"] == path), None)
-                if existing_file:
-                    existing_file["content"] = code_content
+
+            with get_tracer().span("iteration", number=iteration) as span:
+                if self.candidates > 1:
+                    error_feedback, stage = await self.run_candidates(files, error_feedback, test_prompt, verbose_handler)
                 else:
-                    file = {"path": path, "type": "code", "content": code_content}
-                    files.append(file)
+                    error_feedback, stage = await self.run_iteration(files, error_feedback, test_prompt, verbose_handler)
+                span.set(stage=stage)
+            if self.journal:
+                self.journal.record_iteration(iteration, stage, files, error_feedback, self.prompt, test_prompt)
+
+            if not error_feedback:
+                verbose_handler(
+                    "\nTask completed successfully! The code and tests work correctly."
+                )
+                outcome = {"success": True, "iterations": iteration, "files": [f["path"] for f in files]}
+                self._checkpoint("finished", **outcome)
+                return outcome
 
-                if self.generate_tests:
-                    test_code = self.generate_code(
-                        test_prompt,
-                        role="tester",
-                        files=files,
-                    )
-                    test_contents = self.extract_code(test_code)
-                    if test_contents:
-                        test_content = test_contents[0]
-                        test_path = self.extract_path(test_content)
-                        self.write_to_file(test_path, test_content)
-
-                        existing_test_file = next((f for f in files if f["path"] == test_path), None)
-                        if existing_test_file:
-                            existing_test_file["content"] = test_content
-                        else:
-                            test_file = {"path": test_path, "type": "test", "content": test_content}
-                            files.append(test_file)
-
-            requirements = self.generate_code(
-                "Create a requirements.txt file based on the dependencies in the code and test files provided.",
-                role="requirements",
-                files=files,
+        verbose_handler(
+            "\nCould not complete the task after several attempts. Consider providing more details or revising your description."
+        )
+        outcome = {"success": False, "iterations": self.max_iterations, "files": [f["path"] for f in files]}
+        self._checkpoint("finished", **outcome)
+        return outcome
+
+    async def _clarify_and_plan(self, user_prompt, max_clarifications, clarification_handler, state=None):
+        """
+        Runs the clarification interview and generates the roadmap, journaling each answer.
+
+        Args:
+            user_prompt (str): The instructions provided by the user.
+            max_clarifications (int): The maximum number of clarification questions.
+            clarification_handler (callable or None): Receives each question and returns the answer.
+            state (dict, optional): The journaled state of a resumed run.
+
+        Returns:
+            tuple: The programmer prompt and the tester prompt of the first iteration.
+        """
+        clarification_interview = list(state["clarifications"]) if state else []
+        clarified = state["clarified"] if state else False
+
+        if self.speculative_clarification:
+            roadmap = await self._clarify_speculatively(
+                user_prompt, clarification_interview, clarified, max_clarifications, clarification_handler
             )
+        else:
+            while not clarified and len(clarification_interview) < max_clarifications:
+                clarification = await self.clarifier.aclarify(user_prompt, clarification_interview)
+                if clarification == "Nothing to clarify":
+                    self._checkpoint("clarified")
+                    break
+                await self._ask(clarification, clarification_interview, clarification_handler)
+            roadmap = await self.clarifier.agenerate_roadmap(roadmap_prompt(user_prompt, clarification_interview))
+
+        prompt = f"prompt: {user_prompt}\nroadmap:\n{roadmap}"
+        test_prompt = "Write unit tests for the generated code."
+        self._checkpoint("roadmap", roadmap=roadmap, prompt=prompt, test_prompt=test_prompt)
+        return prompt, test_prompt
+
+    async def _ask(self, question, clarification_interview, clarification_handler):
+        # Handlers may block on a human, keep the event loop free for other jobs
+        loop = asyncio.get_running_loop()
+        if clarification_handler and callable(clarification_handler):
+            answer = await loop.run_in_executor(None, clarification_handler, question)
+        else:
+            answer = await loop.run_in_executor(
+                None, input, f"Please answer the clarification question: {question}\n"
+            )
+        clarification_interview.append({'question': question, 'answer': answer})
+        self._checkpoint("clarification", question=question, answer=answer)
 
-            requirements_contents = self.extract_code(requirements)
-            if requirements_contents:
-                requirements_content = requirements_contents[0]
-
-                if len(requirements_content) > 3:
-                    requirements_content = self.filter_requirements(requirements_content)
-                    self.write_to_file("requirements.txt", requirements_content)
-
-                    existing_requirements_file = next((f for f in files if f["path"] == "requirements.txt"), None)
-                    if existing_requirements_file:
-                        existing_requirements_file["content"] = requirements_content
-                    else:
-                        files.append(
-                            {
-                                "path": "requirements.txt",
-                                "type": "requirements",
-                                "content": requirements_content,
-                            }
-                        )
-
-                    self.install_requirements()
-
-            error_feedback = ""
-            for file in files:
-                if file["type"] == "test":
-                    test_success, test_errors = self.execute_script(file["path"])
-                    if not test_success:
-                        error_feedback += (
-                            f"Test errors in {file['path']}:\n{test_errors}\n"
-                        )
-                        verbose_handler(
-                            "Tests failed. The model will try to adjust the code based on the feedback."
-                        )
-                        print(error_feedback)
-                        break  # Stop executing tests if one fails
-            else:
-                # If all tests pass, execute code files
-                for file in files:
-                    if file["type"] == "code":
-                        script_success, script_errors = self.execute_script(
-                            file["path"]
-                        )
-                        if not script_success:
-                            error_feedback += (
-                                f"Script errors in {file['path']}:\n{script_errors}\n"
-                            )
-                            verbose_handler(
-                                "Script execution failed. The model will try to adjust the code based on the feedback."
-                            )
-                            print(error_feedback)
-                            break
+    async def _clarify_speculatively(self, user_prompt, clarification_interview, clarified, max_clarifications,
+                                     clarification_handler):
+        """
+        Asks every open question at once while a draft roadmap is generated from the bare prompt.
+
+        Args:
+            user_prompt (str): The instructions provided by the user.
+            clarification_interview (list of dict): The answers given so far, extended in place.
+            clarified (bool): Whether the questions were already asked and answered.
+            max_clarifications (int): The maximum number of clarification questions.
+            clarification_handler (callable or None): Called once with the list of questions, returns the
+                answers, see `match_answers`. Without a handler the questions are asked on the terminal.
+
+        Returns:
+            str: The draft roadmap if the answers add nothing material, otherwise a roadmap built with them.
+        """
+        draft = asyncio.ensure_future(self.clarifier.agenerate_roadmap(roadmap_prompt(user_prompt, [])))
+        # The draft may be discarded unawaited, mark its outcome as retrieved
+        draft.add_done_callback(lambda future: future.cancelled() or future.exception())
+        try:
+            if not clarified:
+                asked = {qa["question"] for qa in clarification_interview}
+                questions = [q for q in await self.clarifier.aclarify_batch(user_prompt) if q not in asked]
+                questions = questions[:max(max_clarifications - len(clarification_interview), 0)]
+                if questions:
+                    # Handlers may block on a human, keep the event loop free for other jobs
+                    answers = await asyncio.get_running_loop().run_in_executor(
+                        None, clarification_handler if callable(clarification_handler) else ask_on_terminal, questions
+                    )
+                    for question, answer in zip(questions, match_answers(answers, questions)):
+                        clarification_interview.append({"question": question, "answer": answer})
+                        self._checkpoint("clarification", question=question, answer=answer)
+                self._checkpoint("clarified")
+
+            if clarifications_are_immaterial(clarification_interview):
+                return await draft
+            draft.cancel()
+            return await self.clarifier.agenerate_roadmap(roadmap_prompt(user_prompt, clarification_interview))
+        finally:
+            draft.cancel()
+
+    async def run_iteration(self, files, error_feedback, test_prompt, verbose_handler):
+        """
+        Runs one generate, check, install and execute round.
+
+        Args:
+            files (list of dict): The tracked files, updated in place.
+            error_feedback (str or None): The feedback from the previous round.
+            test_prompt (str): The prompt for the tester calls.
+            verbose_handler (callable): Receives progress messages.
+
+        Returns:
+            tuple: The new error feedback (empty on success) and the stage reached,
+                one of 'static', 'tests', 'scripts' or 'passed'.
+        """
+        code_paths = []
+        early_testers = {}
+        headerless_blocks = []
+
+        def on_code_block(code_content):
+            path = self.extract_path(code_content)
+            if path is None:
+                headerless_blocks.append(code_content)
+                return
+            self.write_to_file(path, code_content)
+            self._update_file(files, path, "code", code_content)
+            if path in code_paths:
+                return
+            code_paths.append(path)
+            if self.streaming and self.generate_tests:
+                # Start testing this file while the programmer is still writing the next one
+                tester = self._tester_task(test_prompt, path, [dict(f) for f in files])
+                early_testers[path] = asyncio.ensure_future(tester(None))
+
+        try:
+            patched = False
+            if self.edit_mode == "patch" and error_feedback and any(f["type"] == "code" for f in files):
+                patched = await self._apply_patch(files, error_feedback, on_code_block, verbose_handler)
+
+            if not patched:
+                if self.streaming:
+                    await self.astream_code(
+                        self.prompt,
+                        on_code_block,
+                        role="programmer",
+                        files=files,
+                        error_feedback=error_feedback,
+                    )
                 else:
-                    verbose_handler(
-                        "\nTask completed successfully! The code and tests work correctly."
+                    code = await self.agenerate_code(
+                        self.prompt,
+                        role="programmer",
+                        files=files,
+                        error_feedback=error_feedback,
                     )
-                    return
+                    for code_content in self.extract_code(code):
+                        on_code_block(code_content)
+        except BaseException:
+            # A failed or cancelled programmer call leaves nobody to collect the early testers
+            for tester in early_testers.values():
+                tester.cancel()
+            raise
+
+        if self.static_checks:
+            error_feedback = self._static_check_feedback(
+                [f for f in files if f["type"] == "code"], len(headerless_blocks), verbose_handler
+            )
+            if error_feedback:
+                for tester in early_testers.values():
+                    tester.cancel()
+                return error_feedback, "static"
+
+        # Tester calls only depend on the parsed programmer output, requirements also need the tests
+        context_files = [dict(f) for f in files]
+        graph = TaskGraph()
+        if self.generate_tests:
+            for path in code_paths:
+                if path in early_testers:
+                    graph.add(f"tester:{path}", lambda _, future=early_testers[path]: future)
+                else:
+                    graph.add(f"tester:{path}", self._tester_task(test_prompt, path, context_files))
+        tester_names = [f"tester:{path}" for path in code_paths] if self.generate_tests else []
+        graph.add("requirements", self._requirements_task(context_files), depends_on=tester_names)
+        results = await graph.run()
+
+        headerless_tests = 0
+        for path in code_paths:
+            test_contents = results.get(f"tester:{path}")
+            if test_contents:
+                test_content = test_contents[0]
+                test_path = self.extract_path(test_content)
+                if test_path is None:
+                    headerless_tests += 1
+                    continue
+                self.write_to_file(test_path, test_content)
+                self._update_file(files, test_path, "test", test_content)
+
+        if self.static_checks:
+            error_feedback = self._static_check_feedback(files, headerless_tests, verbose_handler)
+            if error_feedback:
+                return error_feedback, "static"
 
-        verbose_handler(
-            "\nCould not complete the task after several attempts. Consider providing more details or revising your description."
-        )
+        requirements_contents = results["requirements"]
+        if requirements_contents:
+            requirements_content = requirements_contents[0]
+
+            if len(requirements_content) > 3:
+                requirements_content = self.filter_requirements(requirements_content)
+                self.write_to_file("requirements.txt", requirements_content)
+                self._update_file(files, "requirements.txt", "requirements", requirements_content)
+
+                # pip runs in a subprocess, keep the event loop free for other jobs meanwhile
+                await asyncio.get_running_loop().run_in_executor(
+                    None, contextvars.copy_context().run, self.install_requirements
+                )
+
+        error_feedback = ""
+        test_paths = self._affected(files, [f["path"] for f in files if f["type"] == "test"], verbose_handler)
+        if self.test_runner is not None:
+            error_feedback = await self.arun_tests(test_paths, files)
+            if error_feedback:
+                verbose_handler(
+                    "Tests failed. The model will try to adjust the code based on the feedback."
+                )
+                print(error_feedback)
+                return error_feedback, "tests"
+            failed_tests = []
+        else:
+            test_results = await self.aexecute_scripts(test_paths)
+            self._record_executions(files, test_results)
+            failed_tests = [result for result in test_results if not result["success"]]
+        if failed_tests:
+            for result in failed_tests:
+                error_feedback += (
+                    f"Test errors in {result['path']}:\n{self.format_execution_errors(result)}\n"
+                )
+            verbose_handler(
+                "Tests failed. The model will try to adjust the code based on the feedback."
+            )
+            print(error_feedback)
+            return error_feedback, "tests"
+
+        # If all tests pass, execute code files
+        script_paths = self._affected(files, [f["path"] for f in files if f["type"] == "code"], verbose_handler)
+        script_results = await self.aexecute_scripts(script_paths)
+        self._record_executions(files, script_results)
+        failed_scripts = [result for result in script_results if not result["success"]]
+        if failed_scripts:
+            for result in failed_scripts:
+                error_feedback += (
+                    f"Script errors in {result['path']}:\n{self.format_execution_errors(result)}\n"
+                )
+            verbose_handler(
+                "Script execution failed. The model will try to adjust the code based on the feedback."
+            )
+            print(error_feedback)
+            return error_feedback, "scripts"
+
+        return "", "passed"
+
+    async def run_candidates(self, files, error_feedback, test_prompt, verbose_handler):
+        """
+        Runs one round with several candidates sampled concurrently at different temperatures.
+
+        Every candidate works in its own copy of the workspace. The first candidate that passes
+        is accepted and the others are cancelled; if none passes, the one that got furthest is kept.
+
+        Args:
+            files (list of dict): The tracked files, updated in place with the kept candidate's files.
+            error_feedback (str or None): The feedback from the previous round.
+            test_prompt (str): The prompt for the tester calls.
+            verbose_handler (callable): Receives progress messages.
+
+        Returns:
+            tuple: The error feedback of the kept candidate (empty on success) and the stage it reached.
+        """
+        temperatures = self.candidate_temperatures or [
+            0.1 + 0.8 * index / (self.candidates - 1) for index in range(self.candidates)
+        ]
+        env_dir = os.path.abspath(self.env_dir)
+
+        def ignore_env(directory, names):
+            # Candidates share the environment of this generator instead of copying it
+            return [name for name in names if os.path.abspath(os.path.join(directory, name)) == env_dir]
+
+        candidates = []
+        for index, temperature in enumerate(temperatures):
+            candidate_dir = os.path.join(tempfile.mkdtemp(prefix=f"candidate-{index}-"), "workspace")
+            shutil.copytree(self.workspace_dir, candidate_dir, ignore=ignore_env)
+            candidate = copy.copy(self)
+            candidate.workspace_dir = candidate_dir
+            candidate.temperature = temperature
+            candidate.candidates = 1
+            candidates.append((candidate, [dict(f) for f in files]))
+
+        def candidate_handler(index):
+            workspace_dir = candidates[index][0].workspace_dir
+            return lambda message: verbose_handler(
+                f"[candidate {index}] {relative_to_workspace(message, workspace_dir)}"
+            )
+
+        tasks = {
+            asyncio.ensure_future(
+                candidate.run_iteration(candidate_files, error_feedback, test_prompt, candidate_handler(index))
+            ): index
+            for index, (candidate, candidate_files) in enumerate(candidates)
+        }
+        outcomes = {}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        candidate_handler(tasks[task])(f"failed: {task.exception()}")
+                        continue
+                    outcomes[tasks[task]] = task.result()
+                if any(stage == "passed" for _, stage in outcomes.values()):
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.gather(*[self._close_test_workers(candidate.workspace_dir) for candidate, _ in candidates])
+
+        try:
+            if not outcomes:
+                raise RuntimeError("Every candidate failed to run.")
+            stages = ["static", "tests", "scripts", "passed"]
+            # Furthest stage wins, ties go to the lowest temperature
+            kept = max(outcomes, key=lambda index: (stages.index(outcomes[index][1]), -index))
+            kept_candidate, kept_files = candidates[kept]
+            verbose_handler(f"Keeping candidate {kept} (temperature {kept_candidate.temperature:.2f}).")
+
+            for file in kept_files:
+                source = os.path.join(kept_candidate.workspace_dir, file["path"])
+                if os.path.exists(source):
+                    destination = os.path.join(self.workspace_dir, file["path"])
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    shutil.copy2(source, destination)
+                    self._written.pop(destination, None)
+            files[:] = kept_files
+            # The feedback is reused in the next round, where the candidate workspace no longer exists
+            error_feedback, stage = outcomes[kept]
+            return relative_to_workspace(error_feedback, kept_candidate.workspace_dir), stage
+        finally:
+            for candidate, _ in candidates:
+                shutil.rmtree(os.path.dirname(candidate.workspace_dir), ignore_errors=True)
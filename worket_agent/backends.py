@@ -0,0 +1,789 @@
+import asyncio
+import collections
+import concurrent.futures
+import os
+import random
+import threading
+import time
+import weakref
+
+from worket_agent.cache import ResponseCache, cache_key
+
+DEFAULT_MODEL = "Qwen/Qwen2.5-Coder-32B-Instruct"
+DEFAULT_MAX_TOKENS = 20000
+DEFAULT_TIMEOUT = 60 * 5
+SMALL_MODEL = "Qwen/Qwen2.5-Coder-7B-Instruct"
+DEFAULT_FALLBACK_MODELS = [SMALL_MODEL]
+RETRYABLE_STATUS_CODES = frozenset([408, 425, 429, 500, 502, 503, 504])
+DEFAULT_LOCAL_MODEL_REPO = "Qwen/Qwen2.5-Coder-1.5B-Instruct-GGUF"
+DEFAULT_LOCAL_MODEL_FILE = "*q4_k_m.gguf"
+DEFAULT_LOCAL_CONTEXT = 16384
+DEFAULT_PREFIX_CACHE_BYTES = 2 << 30
+
+
+def run_sync(coroutine):
+    """
+    Runs a coroutine to completion from synchronous code.
+
+    If an event loop is already running in the current thread (e.g. inside a
+    notebook), the coroutine is executed on a helper thread with its own loop.
+
+    Args:
+        coroutine (coroutine): The coroutine to run.
+
+    Returns:
+        Any: The result of the coroutine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+async def _stream_from_thread(executor, produce_chunks):
+    # Runs a blocking chunk iterator on the executor and relays its chunks to the event loop,
+    # the iterator is closed at its next chunk once the consumer stops listening
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    stopped = threading.Event()
+
+    def put(item):
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def produce():
+        chunks = produce_chunks()
+        try:
+            for chunk in chunks:
+                if stopped.is_set():
+                    break
+                put(chunk)
+        except Exception as e:
+            put(e)
+        finally:
+            chunks.close()
+            put(done)
+
+    producer = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+    await producer
+
+
+class LLMBackend:
+    """
+    Base class for asynchronous chat-completion backends.
+
+    Subclasses implement `_complete`. Concurrency is bounded per backend, so a
+    single backend instance can be shared by several generators at once. When
+    a `ResponseCache` is given, identical requests are answered from it.
+    Backends whose prompt and completion share a bounded number of tokens
+    report it as `context_window`, None meaning no limit worth budgeting for.
+    """
+
+    context_window = None
+
+    def __init__(self, model=DEFAULT_MODEL, max_concurrency=4, max_tokens=DEFAULT_MAX_TOKENS, cache=None):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._semaphores_lock = threading.Lock()
+
+    def _get_semaphore(self):
+        # asyncio primitives are bound to one event loop, keep one per loop
+        loop = asyncio.get_running_loop()
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def chat(self, messages, temperature=0.2, max_tokens=None, model=None, use_cache=True, stop=None):
+        """
+        Sends a chat completion request.
+
+        Args:
+            messages (list of dict): The chat messages.
+            temperature (float): The sampling temperature.
+            max_tokens (int, optional): The completion token limit. Defaults to the backend limit.
+            model (str, optional): The model to use. Defaults to the backend model.
+            use_cache (bool, optional): Whether to consult the response cache for this call.
+            stop (list of str, optional): Sequences that end the completion, excluded from it.
+
+        Returns:
+            str: The content of the completion.
+        """
+        max_tokens = max_tokens or self.max_tokens
+        model = self._resolve_model(model)
+
+        key = None
+        if self.cache is not None and use_cache:
+            key = cache_key(model, messages, temperature, max_tokens, stop)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        async with self._get_semaphore():
+            start = time.monotonic()
+            response = await self._complete(
+                messages, temperature=temperature, max_tokens=max_tokens, model=model, stop=stop
+            )
+
+        if key is not None:
+            self.cache.set(key, response, latency=time.monotonic() - start)
+        return response
+
+    async def stream(self, messages, temperature=0.2, max_tokens=None, model=None, use_cache=True, stop=None):
+        """
+        Sends a chat completion request and yields the completion as it is generated.
+
+        Args:
+            messages (list of dict): The chat messages.
+            temperature (float): The sampling temperature.
+            max_tokens (int, optional): The completion token limit. Defaults to the backend limit.
+            model (str, optional): The model to use. Defaults to the backend model.
+            use_cache (bool, optional): Whether to consult the response cache for this call.
+            stop (list of str, optional): Sequences that end the completion, excluded from it.
+
+        Yields:
+            str: Chunks of the completion content.
+        """
+        max_tokens = max_tokens or self.max_tokens
+        model = self._resolve_model(model)
+
+        key = None
+        if self.cache is not None and use_cache:
+            key = cache_key(model, messages, temperature, max_tokens, stop)
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        async with self._get_semaphore():
+            start = time.monotonic()
+            async for chunk in self._stream(
+                messages, temperature=temperature, max_tokens=max_tokens, model=model, stop=stop
+            ):
+                chunks.append(chunk)
+                yield chunk
+
+        if key is not None:
+            self.cache.set(key, "".join(chunks), latency=time.monotonic() - start)
+
+    def _resolve_model(self, model):
+        return model or self.model
+
+    def chat_sync(self, messages, **kwargs):
+        """
+        Blocking variant of `chat`.
+        """
+        return run_sync(self.chat(messages, **kwargs))
+
+    async def _complete(self, messages, temperature, max_tokens, model, stop=None):
+        raise NotImplementedError
+
+    async def _stream(self, messages, temperature, max_tokens, model, stop=None):
+        # Backends without native streaming deliver the completion as one chunk
+        yield await self._complete(messages, temperature=temperature, max_tokens=max_tokens, model=model, stop=stop)
+
+    def warm(self):
+        """
+        Prepares the backend for its first request, e.g. by importing its client library.
+        """
+
+    def close(self):
+        """
+        Releases any resources held by the backend.
+        """
+
+
+class HuggingFaceBackend(LLMBackend):
+    """
+    Backend for the Hugging Face inference API.
+
+    Requests run on a bounded thread pool sized to `max_concurrency`. Each
+    worker thread keeps its own `InferenceClient`, so HTTP keep-alive
+    connections are reused across calls instead of being reopened.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, max_concurrency=4, max_tokens=DEFAULT_MAX_TOKENS,
+                 timeout=DEFAULT_TIMEOUT, token=None, cache=None):
+        super().__init__(model=model, max_concurrency=max_concurrency, max_tokens=max_tokens, cache=cache)
+        self.timeout = timeout
+        self.token = token
+        self._local = threading.local()
+        # Requests abandoned by a timeout or a hedge keep their thread until the HTTP timeout,
+        # leave room for them so they do not hold up new requests
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency * 2, thread_name_prefix="hf-backend"
+        )
+
+    def _get_client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            from huggingface_hub import InferenceClient
+
+            client = InferenceClient(timeout=self.timeout, token=self.token)
+            self._local.client = client
+        return client
+
+    def _complete_blocking(self, messages, temperature, max_tokens, model, stop):
+        response = self._get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop,
+            stream=False,
+        )
+        return response.choices[0].message.content
+
+    async def _complete(self, messages, temperature, max_tokens, model, stop=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._complete_blocking, messages, temperature, max_tokens, model, stop
+        )
+
+    async def _stream(self, messages, temperature, max_tokens, model, stop=None):
+        def produce_chunks():
+            response = self._get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=stop,
+                stream=True,
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        async for chunk in _stream_from_thread(self._executor, produce_chunks):
+            yield chunk
+
+    def warm(self):
+        # Import huggingface_hub and open a client ahead of the first request
+        self._executor.submit(self._get_client).result()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class LlamaCppBackend(LLMBackend):
+    """
+    In-process CPU backend running a GGUF model through llama-cpp-python, for offline use.
+
+    The model is loaded on first use from `model_path`, or downloaded once
+    from `repo_id` into the Hugging Face cache and loaded from there
+    afterwards. The KV state of recent calls is kept in a prefix cache of up
+    to `prefix_cache_bytes`: a call restores the state sharing the longest
+    token prefix with its prompt and only evaluates the tokens after it, so
+    calls with the same system prompt and file context skip most of their
+    prefill, across roles and iterations. Calls run one at a time, and the
+    requested model name is ignored in favour of the loaded model.
+    """
+
+    def __init__(self, model_path=None, repo_id=DEFAULT_LOCAL_MODEL_REPO, filename=DEFAULT_LOCAL_MODEL_FILE,
+                 n_ctx=DEFAULT_LOCAL_CONTEXT, n_threads=None, max_tokens=DEFAULT_MAX_TOKENS,
+                 prefix_cache_bytes=DEFAULT_PREFIX_CACHE_BYTES, cache=None):
+        model = os.path.basename(model_path) if model_path else f"{repo_id}/{filename}"
+        super().__init__(model=model, max_concurrency=1, max_tokens=max_tokens, cache=cache)
+        self.model_path = model_path
+        self.repo_id = repo_id
+        self.filename = filename
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+        self.prefix_cache_bytes = prefix_cache_bytes
+        self._llm = None
+        self._llm_lock = threading.Lock()
+        # The model and its KV state are not thread-safe, every call goes through one thread
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="llama-backend")
+
+    @property
+    def context_window(self):
+        return self.n_ctx
+
+    def _resolve_model(self, model):
+        return self.model
+
+    def _get_llm(self):
+        with self._llm_lock:
+            if self._llm is None:
+                from llama_cpp import Llama, LlamaRAMCache
+
+                options = {"n_ctx": self.n_ctx, "n_threads": self.n_threads, "verbose": False}
+                if self.model_path:
+                    llm = Llama(model_path=self.model_path, **options)
+                else:
+                    llm = Llama.from_pretrained(repo_id=self.repo_id, filename=self.filename, **options)
+                if self.prefix_cache_bytes:
+                    llm.set_cache(LlamaRAMCache(capacity_bytes=self.prefix_cache_bytes))
+                self._llm = llm
+            return self._llm
+
+    def _complete_blocking(self, messages, temperature, max_tokens, stop):
+        # Budgets beyond the context window are cut to what is left after the prompt
+        response = self._get_llm().create_chat_completion(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop or [],
+            stream=False,
+        )
+        return response["choices"][0]["message"]["content"]
+
+    async def _complete(self, messages, temperature, max_tokens, model, stop=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._complete_blocking, messages, temperature, max_tokens, stop
+        )
+
+    async def _stream(self, messages, temperature, max_tokens, model, stop=None):
+        def produce_chunks():
+            response = self._get_llm().create_chat_completion(
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stop=stop or [],
+                stream=True,
+            )
+            for chunk in response:
+                content = chunk["choices"][0]["delta"].get("content") if chunk["choices"] else None
+                if content:
+                    yield content
+
+        async for chunk in _stream_from_thread(self._executor, produce_chunks):
+            yield chunk
+
+    def warm(self):
+        # Load the model ahead of the first request
+        self._executor.submit(self._get_llm).result()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class LocalBackend(LLMBackend):
+    """
+    In-process stand-in backend for tests and offline runs.
+
+    Responses come from `responder`, which may be a callable receiving the
+    request, a list of canned completions served in order, or a single string.
+    Completions are cut at the first stop sequence, like a real endpoint
+    would. Every request is recorded in `calls`. When streaming, the completion is
+    split into `chunk_size` pieces and `delay` is spread across them.
+    """
+
+    def __init__(self, responder="Nothing to clarify", model="local", max_concurrency=4,
+                 max_tokens=DEFAULT_MAX_TOKENS, delay=0.0, chunk_size=16, cache=None):
+        super().__init__(model=model, max_concurrency=max_concurrency, max_tokens=max_tokens, cache=cache)
+        self.responder = responder
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _next_response(self, request, index):
+        if callable(self.responder):
+            response = self.responder(request)
+        elif isinstance(self.responder, str):
+            response = self.responder
+        else:
+            response = self.responder[min(index, len(self.responder) - 1)]
+        for sequence in request["stop"] or []:
+            response = response.split(sequence, 1)[0]
+        return response
+
+    def _record(self, messages, temperature, max_tokens, model, stop):
+        request = {
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "model": model,
+            "stop": stop,
+        }
+        with self._lock:
+            index = len(self.calls)
+            self.calls.append(request)
+        return request, index
+
+    async def _complete(self, messages, temperature, max_tokens, model, stop=None):
+        request, index = self._record(messages, temperature, max_tokens, model, stop)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._next_response(request, index)
+
+    async def _stream(self, messages, temperature, max_tokens, model, stop=None):
+        request, index = self._record(messages, temperature, max_tokens, model, stop)
+        response = self._next_response(request, index)
+        chunks = [response[i:i + self.chunk_size] for i in range(0, len(response), self.chunk_size)] or [""]
+        for chunk in chunks:
+            await asyncio.sleep(self.delay / len(chunks))
+            yield chunk
+
+
+def _status_code(error):
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    return status_code if status_code is not None else getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    """
+    Tells whether a failed request is worth sending again.
+
+    Timeouts, connection errors and the HTTP statuses in `RETRYABLE_STATUS_CODES` are retryable.
+
+    Args:
+        error (Exception): The error raised by the request.
+
+    Returns:
+        bool: True if the request may succeed when retried.
+    """
+    status_code = _status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    # requests and huggingface_hub network errors derive from OSError
+    return isinstance(error, (asyncio.TimeoutError, OSError)) or (
+        type(error).__name__ == "InferenceTimeoutError"
+    )
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilientBackend(LLMBackend):
+    """
+    Wraps a backend with retries, adaptive timeouts, hedged requests and model fallback.
+
+    Retryable errors are retried up to `max_retries` times per model with
+    jittered exponential backoff, honouring Retry-After. Once enough
+    latencies have been observed for a model and a `max_tokens` size class,
+    each attempt times out after `timeout_multiplier` times their p95 (within
+    `min_timeout` and `max_timeout`), and a duplicate request is sent when the
+    first has not answered after their p90, or after `hedge_after` seconds if
+    given; the first answer wins. Short calls thus never set the timeout of
+    long generations. Each retry after a timeout doubles the timeout (up to
+    `max_timeout`), and a timed-out attempt counts as a latency sample of its
+    timeout, a lower bound of the real one. When a model keeps failing, the
+    next model of `fallback_models` is tried, then the wrapped backend's
+    model, with a printed warning. Hedges are only sent while the wrapped
+    backend's concurrency limit has a free slot. Streams are retried and fall
+    back only until their first chunk.
+    """
+
+    def __init__(self, backend, fallback_models=None, max_retries=3, base_delay=0.5, max_delay=30.0,
+                 min_timeout=20.0, max_timeout=DEFAULT_TIMEOUT, timeout_multiplier=3.0, hedge=True,
+                 hedge_after=None, min_samples=5, cache=None):
+        super().__init__(
+            model=backend.model, max_concurrency=backend.max_concurrency, max_tokens=backend.max_tokens, cache=cache
+        )
+        self.backend = backend
+        self.fallback_models = list(fallback_models) if fallback_models else []
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.min_samples = min_samples
+        self.stats = {"requests": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0}
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    @property
+    def context_window(self):
+        return self.backend.context_window
+
+    def _models(self, model):
+        # Calls routed to another model fall back to the wrapped backend's model last
+        models = []
+        for candidate in [model] + self.fallback_models + [self.backend.model]:
+            if candidate not in models:
+                models.append(candidate)
+        return models
+
+    def _latency_key(self, model, max_tokens):
+        # Latency grows with the completion size, bucket limits by powers of two
+        max_tokens = max_tokens or self.max_tokens
+        return model, max(int(max_tokens) - 1, 0).bit_length()
+
+    def _observe(self, model, max_tokens, latency):
+        key = self._latency_key(model, max_tokens)
+        with self._lock:
+            self._latencies.setdefault(key, collections.deque(maxlen=200)).append(latency)
+
+    def _percentile(self, model, max_tokens, fraction):
+        key = self._latency_key(model, max_tokens)
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[int(fraction * (len(latencies) - 1))]
+
+    def timeout_for(self, model, max_tokens=None, timeouts=0):
+        """
+        Returns the current per-attempt timeout of a model.
+
+        Args:
+            model (str): The model.
+            max_tokens (int, optional): The completion token limit of the call. Defaults to the backend limit.
+            timeouts (int, optional): How many attempts of the call already timed out, each doubles the timeout.
+
+        Returns:
+            float: The timeout in seconds.
+        """
+        p95 = self._percentile(model, max_tokens, 0.95)
+        if p95 is None:
+            return self.max_timeout
+        timeout = max(p95 * self.timeout_multiplier, self.min_timeout) * 2 ** timeouts
+        return min(timeout, self.max_timeout)
+
+    def hedge_delay_for(self, model, max_tokens=None):
+        """
+        Returns how long a request to a model may run before it is hedged.
+
+        Args:
+            model (str): The model.
+            max_tokens (int, optional): The completion token limit of the call. Defaults to the backend limit.
+
+        Returns:
+            float or None: The delay in seconds, or None if requests are not hedged yet.
+        """
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        return self._percentile(model, max_tokens, 0.90)
+
+    def _backoff(self, attempt, error):
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Full jitter keeps concurrent retries from arriving together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    async def _attempt(self, messages, temperature, max_tokens, model, stop, timeouts=0):
+        timeout = self.timeout_for(model, max_tokens, timeouts)
+        hedge_delay = self.hedge_delay_for(model, max_tokens)
+        start = time.monotonic()
+
+        def send():
+            return asyncio.ensure_future(
+                self.backend.chat(messages, temperature=temperature, max_tokens=max_tokens, model=model,
+                                  use_cache=False, stop=stop)
+            )
+
+        requests = {send(): start}
+        pending = set(requests)
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done and not self.backend._get_semaphore().locked():
+                    self._count("hedges")
+                    hedge = send()
+                    requests[hedge] = time.monotonic()
+                    pending.add(hedge)
+                elif done:
+                    pending = set(requests)
+
+            error = None
+            while pending:
+                remaining = start + timeout - time.monotonic()
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self._count("timeouts")
+                    # The call takes at least this long, keep it from pulling the percentiles down
+                    self._observe(model, max_tokens, timeout)
+                    raise asyncio.TimeoutError(f"{model} did not answer within {timeout:.1f}s")
+                for request in done:
+                    if request.exception() is None:
+                        self._observe(model, max_tokens, time.monotonic() - requests[request])
+                        if len(requests) > 1 and request is not next(iter(requests)):
+                            self._count("hedge_wins")
+                        return request.result()
+                    error = request.exception()
+            raise error
+        finally:
+            for request in requests:
+                request.cancel()
+            # Collect the outcome of cancelled requests
+            await asyncio.gather(*requests, return_exceptions=True)
+
+    def _fall_back(self, model, candidate_model, error):
+        self._count("fallbacks")
+        print(f"Warning: {model} kept failing, answering with the fallback model {candidate_model} instead. "
+              f"Last error: {error!r}")
+
+    async def _complete(self, messages, temperature, max_tokens, model, stop=None):
+        self._count("requests")
+        error = None
+        models = self._models(model)
+        for index, candidate_model in enumerate(models):
+            if index:
+                self._fall_back(models[0], candidate_model, error)
+            timeouts = 0
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await self._attempt(messages, temperature, max_tokens, candidate_model, stop, timeouts)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+                    if isinstance(e, asyncio.TimeoutError):
+                        timeouts += 1
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        break
+                    delay = self._backoff(attempt, e)
+                    self._count("retries")
+                    print(f"Retrying {candidate_model} in {delay:.1f}s after error: {e!r}")
+                    await asyncio.sleep(delay)
+        raise error
+
+    async def _stream(self, messages, temperature, max_tokens, model, stop=None):
+        error = None
+        models = self._models(model)
+        for index, candidate_model in enumerate(models):
+            if index:
+                self._fall_back(models[0], candidate_model, error)
+            timeouts = 0
+            for attempt in range(self.max_retries + 1):
+                chunks = self.backend.stream(
+                    messages, temperature=temperature, max_tokens=max_tokens, model=candidate_model, use_cache=False,
+                    stop=stop,
+                )
+                timeout = self.timeout_for(candidate_model, max_tokens, timeouts)
+                try:
+                    first = await asyncio.wait_for(chunks.__anext__(), timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.CancelledError:
+                    await chunks.aclose()
+                    raise
+                except Exception as e:
+                    await chunks.aclose()
+                    error = e
+                    if isinstance(e, asyncio.TimeoutError):
+                        self._count("timeouts")
+                        self._observe(candidate_model, max_tokens, timeout)
+                        timeouts += 1
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        break
+                    delay = self._backoff(attempt, e)
+                    self._count("retries")
+                    print(f"Retrying {candidate_model} in {delay:.1f}s after error: {e!r}")
+                    await asyncio.sleep(delay)
+                    continue
+
+                # Once content was handed out, errors can no longer be hidden by a retry
+                try:
+                    yield first
+                    async for chunk in chunks:
+                        yield chunk
+                finally:
+                    await chunks.aclose()
+                return
+        raise error
+
+    def warm(self):
+        self.backend.warm()
+
+    def close(self):
+        self.backend.close()
+
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    Returns the on-disk response cache used by default backends.
+
+    Returns:
+        ResponseCache or None: The cache, or None if the `WORKER_AGENT_NO_CACHE` environment variable is set.
+    """
+    if os.environ.get("WORKER_AGENT_NO_CACHE"):
+        return None
+    return ResponseCache()
+
+
+def local_backend(model_path=None):
+    """
+    Builds the offline backend, caching responses like the default backend.
+
+    Args:
+        model_path (str, optional): A GGUF file, or None or 'default' for `DEFAULT_LOCAL_MODEL_REPO`.
+
+    Returns:
+        LlamaCppBackend: The backend.
+    """
+    if model_path == "default":
+        model_path = None
+    return LlamaCppBackend(model_path=model_path, cache=default_cache())
+
+
+def get_default_backend():
+    """
+    Returns the process-wide default backend, creating it on first use.
+
+    The default backend retries, hedges and falls back to `DEFAULT_FALLBACK_MODELS`,
+    and caches responses on disk unless the `WORKER_AGENT_NO_CACHE` environment variable is set.
+    If the `WORKER_AGENT_LOCAL_MODEL` environment variable is set, the default backend runs that
+    GGUF model (or the default one, for 'default') in-process instead, see `local_backend`.
+
+    Returns:
+        LLMBackend: The default backend.
+    """
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            local_model = os.environ.get("WORKER_AGENT_LOCAL_MODEL")
+            if local_model:
+                _default_backend = local_backend(local_model)
+            else:
+                _default_backend = ResilientBackend(
+                    HuggingFaceBackend(), fallback_models=DEFAULT_FALLBACK_MODELS, cache=default_cache()
+                )
+        return _default_backend
+
+
+def set_default_backend(backend):
+    """
+    Replaces the process-wide default backend.
+
+    Args:
+        backend (LLMBackend): The backend to use by default.
+    """
+    global _default_backend
+    with _default_backend_lock:
+        _default_backend = backend
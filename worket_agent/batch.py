@@ -0,0 +1,211 @@
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import time
+
+from worket_agent.agent import ClarifierAgent, CodeGenerator
+from worket_agent.backends import DEFAULT_FALLBACK_MODELS, HuggingFaceBackend, ResilientBackend, default_cache, run_sync
+from worket_agent.checkpoint import RunJournal, journal_path
+from worket_agent.environments import EnvironmentPool
+from worket_agent.execution import ExecutionEngine
+from worket_agent.installer import RequirementsInstaller
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+def load_jobs(input_path):
+    """
+    Reads generation jobs from a JSONL file.
+
+    Each line holds a 'prompt' and optionally an 'id', 'clarifications'
+    (a mapping of question to answer, or a list of answers given in order),
+    'max_iterations' and 'generate_tests'. Jobs without an id are numbered by line.
+
+    Args:
+        input_path (str): The path to the JSONL file.
+
+    Returns:
+        list of dict: The jobs.
+    """
+    jobs = []
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            job.setdefault("id", str(line_number))
+            job["id"] = str(job["id"])
+            jobs.append(job)
+    return jobs
+
+
+def finished_job_ids(output_path):
+    """
+    Collects the ids of jobs that already have a final result in an output JSONL file.
+
+    Args:
+        output_path (str): The path to the output JSONL file.
+
+    Returns:
+        set: The finished job ids.
+    """
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash
+                continue
+            if record.get("status") in FINISHED_STATUSES:
+                finished.add(str(record["id"]))
+    return finished
+
+
+def make_clarification_handler(clarifications):
+    """
+    Builds a non-interactive clarification handler from pre-supplied answers.
+
+    Args:
+        clarifications (dict or list, optional): Answers keyed by question, or answers in order.
+
+    Returns:
+        callable: A handler returning the matching answer, or an empty string; given a list of
+            questions, it returns the list of their answers.
+    """
+    answers = list(clarifications) if isinstance(clarifications, list) else []
+
+    def handler(question):
+        if isinstance(question, list):
+            return [handler(q) for q in question]
+        if isinstance(clarifications, dict):
+            return clarifications.get(question, "")
+        return answers.pop(0) if answers else ""
+
+    return handler
+
+
+class BatchRunner:
+    """
+    Runs many prompts through `CodeGenerator` concurrently.
+
+    Every job gets its own workspace under `workspace_root`. Jobs share one
+    backend, whose concurrency bounds the number of model calls in flight,
+    and one execution engine, which bounds the number of running scripts.
+    """
+
+    def __init__(self, workspace_root, backend=None, max_jobs=4, max_llm_calls=8, max_executions=4,
+                 max_iterations=5, generate_tests=True, env_pool=None):
+        self.workspace_root = workspace_root
+        self.backend = backend if backend else ResilientBackend(
+            HuggingFaceBackend(max_concurrency=max_llm_calls),
+            fallback_models=DEFAULT_FALLBACK_MODELS,
+            cache=default_cache(),
+        )
+        self.max_jobs = max_jobs
+        self.max_iterations = max_iterations
+        self.generate_tests = generate_tests
+        self.env_pool = env_pool if env_pool else EnvironmentPool()
+        self.executor = ExecutionEngine(max_workers=max_executions)
+        self.installer = RequirementsInstaller()
+
+    def _workspace_dir(self, job_id):
+        safe_id = re.sub(r"[^A-Za-z0-9._-]", "_", job_id)
+        if safe_id != job_id or safe_id in ("", ".", ".."):
+            # Keep ids such as 'a/b' and 'a_b' in different workspaces
+            safe_id = f"{safe_id}-{hashlib.sha256(job_id.encode('utf-8')).hexdigest()[:8]}"
+        return os.path.join(self.workspace_root, safe_id)
+
+    async def run_job(self, job):
+        """
+        Runs a single job.
+
+        Args:
+            job (dict): The job, as returned by `load_jobs`.
+
+        Returns:
+            dict: The result with 'id', 'status', 'iterations', 'files', 'workspace' and 'duration'.
+        """
+        start = time.monotonic()
+        workspace_dir = self._workspace_dir(job["id"])
+        record = {"id": job["id"], "workspace": workspace_dir}
+        try:
+            os.makedirs(workspace_dir, exist_ok=True)
+            # Cloning the environment is blocking file work, keep the other jobs running meanwhile
+            generator = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                CodeGenerator,
+                workspace_dir,
+                max_iterations=job.get("max_iterations", self.max_iterations),
+                clarifier_agent=ClarifierAgent(backend=self.backend),
+                generate_tests=job.get("generate_tests", self.generate_tests),
+                backend=self.backend,
+                env_pool=self.env_pool,
+                installer=self.installer,
+                executor=self.executor,
+            ))
+            run_options = {
+                "clarification_handler": make_clarification_handler(job.get("clarifications")),
+                "verbose_handler": lambda message: print(f"[{job['id']}] {message}"),
+            }
+            state = RunJournal(journal_path(workspace_dir)).load()
+            if state is not None and state["outcome"] is None and state["user_prompt"] == job["prompt"]:
+                # The job was interrupted in an earlier batch, continue where it stopped
+                outcome = await generator.aresume(**run_options)
+            else:
+                outcome = await generator.arun(job["prompt"], **run_options)
+            record["status"] = "succeeded" if outcome["success"] else "failed"
+            record["iterations"] = outcome["iterations"]
+            record["files"] = outcome["files"]
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["duration"] = time.monotonic() - start
+        return record
+
+    async def arun(self, input_path, output_path):
+        """
+        Runs every unfinished job from `input_path` and appends each result to `output_path` as it completes.
+
+        Jobs already recorded as succeeded or failed in `output_path` are skipped, so an interrupted
+        batch can be restarted with the same arguments. Jobs interrupted mid-run resume from their journal.
+
+        Args:
+            input_path (str): The JSONL file with the jobs.
+            output_path (str): The JSONL file receiving one result per job.
+
+        Returns:
+            list of dict: The results of the jobs run by this call.
+        """
+        finished = finished_job_ids(output_path)
+        jobs = [job for job in load_jobs(input_path) if job["id"] not in finished]
+        print(f"Running {len(jobs)} jobs, skipping {len(finished)} already finished.")
+
+        # Build the shared base environment once instead of in every job
+        await asyncio.get_running_loop().run_in_executor(None, self.env_pool.warm)
+
+        semaphore = asyncio.Semaphore(self.max_jobs)
+        write_lock = asyncio.Lock()
+        results = []
+
+        async def run_and_record(job):
+            async with semaphore:
+                record = await self.run_job(job)
+            async with write_lock:
+                with open(output_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+                results.append(record)
+            print(f"[{job['id']}] {record['status']} in {record['duration']:.1f}s")
+
+        await asyncio.gather(*[run_and_record(job) for job in jobs])
+        return results
+
+    def run(self, input_path, output_path):
+        """
+        Blocking variant of `arun`.
+        """
+        return run_sync(self.arun(input_path, output_path))
@@ -0,0 +1,449 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+
+from worket_agent.agent import ClarifierAgent, CodeGenerator
+from worket_agent.backends import LocalBackend
+from worket_agent.environments import EnvironmentPool
+from worket_agent.execution import ExecutionEngine
+from worket_agent.installer import RequirementsInstaller
+from worket_agent.prompt_rules import (
+    AGENT_PROMPT, BATCH_CLARIFY_PROMPT, PATCH_PROMPT, PROGRAMMER_PROMPT, REQUIREMENTS_PROMPT, ROADMAP_PROMPT,
+    TESTER_PROMPT,
+)
+from worket_agent.routing import ModelRouter
+from worket_agent.tracing import MetricsRegistry, Tracer, get_tracer, set_tracer
+
+SYSTEM_PROMPT_ROLES = {
+    AGENT_PROMPT: "clarify",
+    BATCH_CLARIFY_PROMPT: "clarify_batch",
+    ROADMAP_PROMPT: "roadmap",
+    PROGRAMMER_PROMPT: "programmer",
+    PATCH_PROMPT: "patch",
+    TESTER_PROMPT: "tester",
+    REQUIREMENTS_PROMPT: "requirements",
+}
+
+TESTS_FOR_PATTERN = "Write the tests for "
+
+
+class ReplayResponder:
+    """
+    Serves canned completions per role, for use as a `LocalBackend` responder.
+
+    `script` maps a role ('clarify', 'clarify_batch', 'roadmap', 'programmer',
+    'patch', 'tester' or 'requirements') to the completions returned for it, in order; the last
+    one is repeated once the list runs out. In completions for the tester,
+    '{module}' is replaced by the module name of the file under test. The
+    same script always produces the same run, so it can be saved with
+    `to_file` and replayed later.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def to_file(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.script, f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self.counts = {}
+
+    def __call__(self, request):
+        role = SYSTEM_PROMPT_ROLES.get(request["messages"][0]["content"], "programmer")
+        with self._lock:
+            index = self.counts.get(role, 0)
+            self.counts[role] = index + 1
+        completions = self.script.get(role) or [""]
+        completion = completions[min(index, len(completions) - 1)]
+
+        if role == "tester":
+            prompt = next(
+                (message["content"] for message in request["messages"][1:] if TESTS_FOR_PATTERN in message["content"]),
+                "",
+            )
+            if TESTS_FOR_PATTERN in prompt:
+                path = prompt.rsplit(TESTS_FOR_PATTERN, 1)[1].strip().rstrip(".")
+                module = os.path.splitext(path)[0].replace("/", ".")
+                completion = completion.replace("{module}", module)
+        return completion
+
+
+def _module_block(name, body):
+    return f"```python\n# {name}.py\n{body}\n```"
+
+
+def _scenario(programmer, clarifications=0, tests=True, max_iterations=3, patch=None):
+    script = {
+        "clarify": [f"Question {index}?" for index in range(clarifications)] + ["Nothing to clarify"],
+        "roadmap": ["1. Write the modules.\n2. Test them."],
+        "programmer": programmer,
+        "tester": ["```python\n# test_{module}.py\nimport {module}\n\nassert {module}.VALUE >= 0\nprint('ok')\n```"],
+    }
+    if patch:
+        script["patch"] = patch
+    return {
+        "script": script,
+        "generate_tests": tests,
+        "max_iterations": max_iterations,
+        "edit_mode": "patch" if patch else "full",
+    }
+
+
+def _constant_modules(count, lines=1, broken=False, extra_import=None):
+    blocks = []
+    for index in range(count):
+        body = []
+        if extra_import:
+            body.append(f"import {extra_import}")
+        body.append(f"VALUE = {-1 if broken and index == 0 else index}")
+        # Padding functions make the response large without changing its behaviour
+        for line in range(lines - 1):
+            body.append(f"\n\ndef helper_{line}(x):\n    return x + {line}")
+        blocks.append(_module_block(f"module_{index}", "\n".join(body)))
+    return "Here is the code:\n\n" + "\n\n".join(blocks)
+
+
+def default_scenarios():
+    """
+    Builds the built-in benchmark scenarios.
+
+    Returns:
+        dict: Each scenario by name, with its replay 'script', 'generate_tests', 'max_iterations' and 'edit_mode'.
+    """
+    return {
+        "single_file": _scenario([_constant_modules(1)]),
+        "multi_file": _scenario([_constant_modules(6)]),
+        "fail_then_pass": _scenario([_constant_modules(3, broken=True), _constant_modules(3)]),
+        "patch_fix": _scenario(
+            [_constant_modules(3, lines=40, broken=True)],
+            patch=["# module_0.py\n<<<<<<< SEARCH\nVALUE = -1\n=======\nVALUE = 0\n>>>>>>> REPLACE\n"],
+        ),
+        "large_response": _scenario([_constant_modules(20, lines=60)], tests=False),
+        "clarifications": _scenario([_constant_modules(1)], clarifications=4),
+        "requirements": _scenario([_constant_modules(2, extra_import="pip")]),
+    }
+
+
+class _CountingInstaller(RequirementsInstaller):
+    def __init__(self, wheelhouse):
+        super().__init__(wheelhouse=wheelhouse)
+        self.pip_invocations = 0
+
+    def _pip(self, python_executable, args):
+        self.pip_invocations += 1
+        return super()._pip(python_executable, args)
+
+
+class _CountingEngine(ExecutionEngine):
+    def __init__(self):
+        super().__init__()
+        self.subprocesses = 0
+
+    async def run_script(self, python_executable, filepath, cwd=None):
+        self.subprocesses += 1
+        return await super().run_script(python_executable, filepath, cwd=cwd)
+
+
+@contextlib.contextmanager
+def _quiet():
+    # The pipeline reports progress with print, keep terminal output out of the timings
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def run_scenario(scenario, env_pool, work_dir, repeat=3, delay=0.0):
+    """
+    Runs one scenario end to end through `ClarifierAgent` and `CodeGenerator.run`.
+
+    Args:
+        scenario (dict): The scenario, see `default_scenarios`.
+        env_pool (EnvironmentPool): The pool the virtual environments are cloned from.
+        work_dir (str): A scratch directory for the workspaces.
+        repeat (int, optional): Number of timed runs.
+        delay (float, optional): Simulated latency of every model call in seconds.
+
+    Returns:
+        dict: The 'wall_clock' median and 'wall_clock_min' in seconds, the mean seconds and
+            count per traced 'phases', and per run 'llm_calls', 'subprocesses',
+            'pip_invocations', 'peak_memory_bytes', 'success' and 'iterations'.
+    """
+    registry = MetricsRegistry()
+    previous_tracer = get_tracer()
+    wall_clocks = []
+    counters = {"llm_calls": 0, "subprocesses": 0, "pip_invocations": 0}
+    outcome = None
+    peak_memory = 0
+
+    # The last run is traced for memory only, tracemalloc slows everything down
+    for run_index in range(repeat + 1):
+        measure_memory = run_index == repeat
+        responder = ReplayResponder(scenario["script"])
+        backend = LocalBackend(responder, delay=delay, max_concurrency=8)
+        installer = _CountingInstaller(os.path.join(work_dir, "wheels"))
+        executor = _CountingEngine()
+        workspace = os.path.join(work_dir, f"workspace-{run_index}")
+        set_tracer(Tracer(registry=MetricsRegistry() if measure_memory else registry))
+        try:
+            with _quiet():
+                if measure_memory:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                generator = CodeGenerator(
+                    workspace,
+                    max_iterations=scenario["max_iterations"],
+                    clarifier_agent=ClarifierAgent(backend=backend),
+                    generate_tests=scenario["generate_tests"],
+                    edit_mode=scenario.get("edit_mode", "full"),
+                    backend=backend,
+                    env_pool=env_pool,
+                    installer=installer,
+                    executor=executor,
+                    # A fresh router keeps budgets learned in earlier runs from changing the call count
+                    router=ModelRouter(),
+                )
+                outcome = generator.run(
+                    "Benchmark prompt", clarification_handler=lambda question: "Yes.", verbose_handler=lambda message: None
+                )
+                elapsed = time.perf_counter() - start
+                if measure_memory:
+                    peak_memory = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+        finally:
+            set_tracer(previous_tracer)
+            shutil.rmtree(workspace, ignore_errors=True)
+
+        if not measure_memory:
+            wall_clocks.append(elapsed)
+            counters["llm_calls"] += len(backend.calls)
+            counters["subprocesses"] += executor.subprocesses + installer.pip_invocations
+            counters["pip_invocations"] += installer.pip_invocations
+
+    phases = {
+        name: {"count": summary["count"] / repeat, "seconds": summary["total"] / repeat}
+        for name, summary in registry.summary().items()
+    }
+    result = {
+        "wall_clock": _median(wall_clocks),
+        "wall_clock_min": min(wall_clocks),
+        "phases": phases,
+        "peak_memory_bytes": peak_memory,
+        "success": outcome["success"],
+        "iterations": outcome["iterations"],
+    }
+    result.update({name: count / repeat for name, count in counters.items()})
+    return result
+
+
+def _time_call(func, repeat=5):
+    timer = timeit.Timer(func)
+    # autorange picks a number of calls that takes at least 0.2 seconds
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {"seconds_per_call": best, "calls": number}
+
+
+def run_micro_benchmarks(env_pool, work_dir, repeat=5):
+    """
+    Times the hot helpers of `CodeGenerator` in isolation.
+
+    Args:
+        env_pool (EnvironmentPool): The pool the virtual environment is cloned from.
+        work_dir (str): A scratch directory for the workspace.
+        repeat (int, optional): Number of timing rounds, the best one is kept.
+
+    Returns:
+        dict: The best 'seconds_per_call' and the 'calls' per round of each benchmark.
+    """
+    workspace = os.path.join(work_dir, "micro")
+    with _quiet():
+        generator = CodeGenerator(workspace, backend=LocalBackend(), env_pool=env_pool)
+
+    response = _constant_modules(20, lines=60)
+    block = generator.extract_code(response)[0]
+    requirements = "\n".join(
+        ["os", "sys", "json", "requests==2.31.0", "numpy", "pandas==2.1.0", "re", "asyncio"] * 8
+    )
+    small_files = [
+        {"path": f"module_{index}.py", "type": "code", "content": f"# module_{index}.py\nVALUE = {index}\n"}
+        for index in range(5)
+    ]
+    large_files = [
+        {"path": f"module_{index}.py", "type": "code", "content": content}
+        for index, content in enumerate(generator.extract_code(_constant_modules(40, lines=200)))
+    ]
+
+    benchmarks = {
+        "extract_code": lambda: generator.extract_code(response),
+        "extract_path": lambda: generator.extract_path(block),
+        "filter_requirements": lambda: generator.filter_requirements(requirements),
+        "build_messages": lambda: generator.build_messages("Write the code.", files=small_files),
+        "build_messages_over_budget": lambda: generator.build_messages(
+            "Fix module_3.py.", files=large_files, error_feedback="Error in module_3.py"
+        ),
+    }
+    results = {}
+    try:
+        with _quiet():
+            for name, func in benchmarks.items():
+                results[name] = _time_call(func, repeat=repeat)
+                # build_messages records every call, do not let the history grow across benchmarks
+                generator.context_builder.history = []
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmarks(scenarios=None, repeat=3, delay=0.0, micro=True, env_pool=None):
+    """
+    Runs the scenarios and the micro-benchmarks.
+
+    Args:
+        scenarios (dict, optional): The scenarios to run, `default_scenarios()` by default.
+        repeat (int, optional): Number of timed runs per scenario.
+        delay (float, optional): Simulated latency of every model call in seconds.
+        micro (bool, optional): Whether to run the micro-benchmarks.
+        env_pool (EnvironmentPool, optional): The environment pool, the default pool if omitted.
+
+    Returns:
+        dict: The results with 'commit', 'python', 'platform', 'timestamp', 'settings',
+            'scenarios' and 'micro'.
+    """
+    scenarios = scenarios if scenarios is not None else default_scenarios()
+    env_pool = env_pool if env_pool else EnvironmentPool()
+    # Building the base environment is a one-off cost, keep it out of the measurements
+    env_pool.warm()
+
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "settings": {"repeat": repeat, "delay": delay},
+        "scenarios": {},
+        "micro": {},
+    }
+    work_dir = tempfile.mkdtemp(prefix="worker-agent-bench-")
+    try:
+        for name, scenario in scenarios.items():
+            print(f"Running scenario {name}...")
+            results["scenarios"][name] = run_scenario(scenario, env_pool, work_dir, repeat=repeat, delay=delay)
+        if micro:
+            print("Running micro-benchmarks...")
+            results["micro"] = run_micro_benchmarks(env_pool, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare_results(baseline, current):
+    """
+    Compares two benchmark results, e.g. from two commits.
+
+    Args:
+        baseline (dict): The earlier results.
+        current (dict): The later results.
+
+    Returns:
+        list of str: One line per measurement found in both, with the change relative to the baseline.
+    """
+    rows = []
+    for name, result in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old:
+            rows.append((f"scenario {name}", old["wall_clock"], result["wall_clock"]))
+    for name, result in current["micro"].items():
+        old = baseline.get("micro", {}).get(name)
+        if old:
+            rows.append((f"micro {name}", old["seconds_per_call"], result["seconds_per_call"]))
+
+    lines = []
+    for label, old, new in rows:
+        change = (new - old) / old * 100 if old else 0.0
+        lines.append(f"{label:40} {old:12.6f}s {new:12.6f}s {change:+7.1f}%")
+    return lines
+
+
+def _print_results(results):
+    for name, result in results["scenarios"].items():
+        status = "ok" if result["success"] else "FAILED"
+        print(
+            f"{name:20} {result['wall_clock']:8.3f}s  llm={result['llm_calls']:.0f} "
+            f"subprocesses={result['subprocesses']:.0f} pip={result['pip_invocations']:.0f} "
+            f"peak={result['peak_memory_bytes'] / 1e6:.1f}MB iterations={result['iterations']} {status}"
+        )
+    for name, result in results["micro"].items():
+        print(f"{name:28} {result['seconds_per_call'] * 1e6:10.2f}us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the code generation pipeline with a replayed model.")
+    parser.add_argument("--output", metavar="RESULTS_JSON", help="Where the results are saved as JSON.")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="Results of an earlier run to compare against.")
+    parser.add_argument("--scenario", action="append", help="Run only this scenario, may be repeated.")
+    parser.add_argument("--script", metavar="SCRIPT_JSON", help="Replay a saved responder script as a scenario.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per scenario.")
+    parser.add_argument("--delay", type=float, default=0.0, help="Simulated latency of every model call in seconds.")
+    parser.add_argument("--no-micro", action="store_true", help="Skip the micro-benchmarks.")
+    args = parser.parse_args(argv)
+
+    scenarios = default_scenarios()
+    if args.scenario:
+        unknown = set(args.scenario) - set(scenarios)
+        if unknown:
+            parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+        scenarios = {name: scenarios[name] for name in args.scenario}
+    if args.script:
+        name = os.path.splitext(os.path.basename(args.script))[0]
+        scenarios[name] = {
+            "script": ReplayResponder.from_file(args.script).script,
+            "generate_tests": True,
+            "max_iterations": 5,
+        }
+
+    results = run_benchmarks(scenarios, repeat=args.repeat, delay=args.delay, micro=not args.no_micro)
+    _print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved at: {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare_results(baseline, results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "worker_agent", "responses.sqlite3")
+
+
+def cache_key(model, messages, temperature, max_tokens, stop=None):
+    """
+    Computes the content address of a chat completion request.
+
+    Args:
+        model (str): The model name.
+        messages (list of dict): The chat messages.
+        temperature (float): The sampling temperature.
+        max_tokens (int): The completion token limit.
+        stop (list of str, optional): The stop sequences.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    request = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    if stop:
+        # Only added when set, so keys of requests without stop sequences stay valid
+        request["stop"] = stop
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of LLM responses backed by SQLite.
+
+    Entries are evicted least-recently-used first once `max_entries` or
+    `max_bytes` is exceeded, and expire after `ttl` seconds when set.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=10000, max_bytes=256 * 1024 * 1024, ttl=None,
+                 bypass=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.saved_completion_chars = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL, latency REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._connection.commit()
+
+    def get(self, key):
+        """
+        Looks up a cached response.
+
+        Args:
+            key (str): The request key from `cache_key`.
+
+        Returns:
+            str or None: The cached response, or None on a miss.
+        """
+        if self.bypass:
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created, latency FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            self.saved_seconds += row[2]
+            self.saved_completion_chars += len(row[0])
+            return row[0]
+
+    def set(self, key, response, latency=0.0):
+        """
+        Stores a response and evicts old entries if the cache is over its limits.
+
+        Args:
+            key (str): The request key from `cache_key`.
+            response (str): The response content.
+            latency (float, optional): Seconds the original request took.
+        """
+        if self.bypass:
+            return
+
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed, latency) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, size, now, now, latency),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        if self.ttl is not None:
+            self._connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+
+        count, total_bytes = self._connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        rows = self._connection.execute("SELECT key, size FROM responses ORDER BY accessed ASC").fetchall()
+        stale_keys = []
+        for key, size in rows:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            count -= 1
+            total_bytes -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+    def clear(self):
+        """
+        Removes every cached response.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the savings attributed to cache hits.
+
+        Returns:
+            dict: Cache statistics.
+        """
+        with self._lock:
+            entries, total_bytes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "saved_completion_chars": self.saved_completion_chars,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,169 @@
+import json
+import os
+
+JOURNAL_NAME = ".worker_agent_journal.jsonl"
+
+
+def journal_path(workspace_dir):
+    """
+    Returns the path of the run journal of a workspace.
+
+    Args:
+        workspace_dir (str): The workspace directory.
+
+    Returns:
+        str: The journal path.
+    """
+    return os.path.join(workspace_dir, JOURNAL_NAME)
+
+
+class RunJournal:
+    """
+    Append-only JSONL journal of the completed steps of a `CodeGenerator` run.
+
+    Every clarification answer, the roadmap and every finished iteration is
+    appended as one line, so a run interrupted at any point can be rebuilt
+    with `load` without querying the model again. Iteration entries only
+    carry the contents of files that changed since the previous entry.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._contents = {}
+
+    def _write(self, entry, mode="a"):
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+
+    def start(self, user_prompt):
+        """
+        Starts a new journal, discarding any previous run.
+
+        Args:
+            user_prompt (str): The instructions of the run.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._contents = {}
+        self._write({"step": "start", "user_prompt": user_prompt}, mode="w")
+
+    def append(self, step, **data):
+        """
+        Appends one completed step.
+
+        Args:
+            step (str): The step name, e.g. 'clarification', 'clarified', 'roadmap' or 'finished'.
+            **data: The state produced by the step.
+        """
+        entry = {"step": step}
+        entry.update(data)
+        self._write(entry)
+
+    def record_iteration(self, number, stage, files, error_feedback, prompt, test_prompt):
+        """
+        Appends a finished iteration.
+
+        Args:
+            number (int): The iteration number.
+            stage (str): The stage the iteration reached.
+            files (list of dict): The tracked files with 'path', 'type' and 'content'.
+            error_feedback (str): The feedback for the next iteration.
+            prompt (str): The programmer prompt for the next iteration.
+            test_prompt (str): The tester prompt for the next iteration.
+        """
+        changed = {f["path"]: f["content"] for f in files if self._contents.get(f["path"]) != f["content"]}
+        self._contents.update(changed)
+        self.append(
+            "iteration",
+            number=number,
+            stage=stage,
+            files=[{"path": f["path"], "type": f["type"]} for f in files],
+            contents=changed,
+            error_feedback=error_feedback,
+            prompt=prompt,
+            test_prompt=test_prompt,
+        )
+
+    def load(self):
+        """
+        Rebuilds the state of the journaled run.
+
+        Returns:
+            dict or None: The state with 'user_prompt', 'clarifications', 'clarified', 'roadmap',
+                'prompt', 'test_prompt', 'iteration', 'stage', 'files', 'error_feedback' and
+                'outcome', or None if there is no journal.
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        state = None
+        contents = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash, the step did not complete
+                    break
+                step = entry["step"]
+                if step == "start":
+                    contents = {}
+                    state = {
+                        "user_prompt": entry["user_prompt"],
+                        "clarifications": [],
+                        "clarified": False,
+                        "roadmap": None,
+                        "prompt": None,
+                        "test_prompt": None,
+                        "iteration": 0,
+                        "stage": None,
+                        "files": [],
+                        "error_feedback": None,
+                        "outcome": None,
+                    }
+                elif state is None:
+                    continue
+                elif step == "clarification":
+                    state["clarifications"].append({"question": entry["question"], "answer": entry["answer"]})
+                elif step == "clarified":
+                    state["clarified"] = True
+                elif step == "roadmap":
+                    state["clarified"] = True
+                    state["roadmap"] = entry["roadmap"]
+                    state["prompt"] = entry["prompt"]
+                    state["test_prompt"] = entry["test_prompt"]
+                elif step == "iteration":
+                    contents.update(entry["contents"])
+                    state["iteration"] = entry["number"]
+                    state["stage"] = entry["stage"]
+                    state["error_feedback"] = entry["error_feedback"]
+                    state["prompt"] = entry["prompt"]
+                    state["test_prompt"] = entry["test_prompt"]
+                    state["files"] = [
+                        {"path": file["path"], "type": file["type"], "content": contents.get(file["path"], "")}
+                        for file in entry["files"]
+                    ]
+                elif step == "finished":
+                    state["outcome"] = {
+                        "success": entry["success"],
+                        "iterations": entry["iterations"],
+                        "files": entry["files"],
+                    }
+
+        # Further iterations are appended to this journal
+        self._contents = contents
+        return state
+
+
+def has_unfinished_run(workspace_dir):
+    """
+    Tells whether a workspace holds a journaled run that did not finish.
+
+    Args:
+        workspace_dir (str): The workspace directory.
+
+    Returns:
+        bool: True if the run can be resumed.
+    """
+    state = RunJournal(journal_path(workspace_dir)).load()
+    return state is not None and state["outcome"] is None
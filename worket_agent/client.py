@@ -0,0 +1,182 @@
+"""
+Thin client of `AgentServer`.
+
+Only the standard library is imported here, so submitting a job from the
+CLI does not pay for the model client, asyncio or the generator.
+"""
+import json
+import os
+import socket
+
+DEFAULT_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".cache", "worker_agent", "server.sock")
+DEFAULT_TCP_ADDRESS = "127.0.0.1:8765"
+
+
+def default_address():
+    """
+    Returns the address of the local server.
+
+    Returns:
+        str: The WORKER_AGENT_SERVER environment variable if set, otherwise a Unix socket
+            path where supported and a localhost TCP address elsewhere.
+    """
+    address = os.environ.get("WORKER_AGENT_SERVER")
+    if address:
+        return address
+    return DEFAULT_SOCKET_PATH if hasattr(socket, "AF_UNIX") else DEFAULT_TCP_ADDRESS
+
+
+def parse_address(address):
+    """
+    Splits a server address into its socket family and target.
+
+    Args:
+        address (str): A Unix socket path, or 'host:port' for TCP.
+
+    Returns:
+        tuple: ('unix', path) or ('tcp', (host, port)).
+    """
+    if hasattr(socket, "AF_UNIX") and ("/" in address or os.sep in address):
+        return "unix", address
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def connect(address=None, timeout=None):
+    """
+    Opens a connection to the server.
+
+    Args:
+        address (str, optional): The server address. Defaults to `default_address()`.
+        timeout (float, optional): The socket timeout in seconds.
+
+    Returns:
+        socket.socket: The connected socket.
+
+    Raises:
+        OSError: If no server is listening at the address.
+    """
+    kind, target = parse_address(address or default_address())
+    sock = socket.socket(socket.AF_UNIX if kind == "unix" else socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(target)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class AgentClient:
+    """
+    Submits jobs to a running `AgentServer` and relays its events.
+
+    Requests and events are JSON objects, one per line. Progress events go to
+    the `verbose_handler`, clarification questions to the
+    `clarification_handler`, whose answer is sent back to the server. A batch
+    of questions is handed over at once, as a list.
+    """
+
+    def __init__(self, address=None, timeout=None):
+        self.address = address or default_address()
+        self.timeout = timeout
+
+    def _request(self, payload, verbose_handler=None, clarification_handler=None):
+        with connect(self.address, self.timeout) as sock, sock.makefile("rw", encoding="utf-8") as stream:
+            stream.write(json.dumps(payload) + "\n")
+            stream.flush()
+            for line in stream:
+                event = json.loads(line)
+                kind = event["event"]
+                if kind == "progress":
+                    (verbose_handler or print)(event["message"])
+                elif kind == "question":
+                    if clarification_handler:
+                        answer = clarification_handler(event["question"])
+                    else:
+                        answer = input(f"Please answer the clarification question: {event['question']}\n")
+                    stream.write(json.dumps({"answer": answer}) + "\n")
+                    stream.flush()
+                elif kind == "questions":
+                    questions = event["questions"]
+                    if clarification_handler:
+                        answer = clarification_handler(questions)
+                    else:
+                        print("Please answer the clarification questions:")
+                        for number, question in enumerate(questions, start=1):
+                            print(f"{number}. {question}")
+                        answer = [input(f"{number}. ") for number in range(1, len(questions) + 1)]
+                    stream.write(json.dumps({"answer": answer}) + "\n")
+                    stream.flush()
+                elif kind == "error":
+                    raise RuntimeError(event["error"])
+                else:
+                    return event
+        raise ConnectionError("The server closed the connection before answering.")
+
+    def ping(self):
+        """
+        Checks that the server is up.
+
+        Returns:
+            dict: The server's 'pid' and number of running 'jobs'.
+        """
+        return self._request({"op": "ping"})
+
+    def run(self, user_prompt, workspace_dir, resume=False, clarification_handler=None, verbose_handler=None,
+            **options):
+        """
+        Runs a generation job on the server, streaming its progress.
+
+        Args:
+            user_prompt (str or None): The instructions, may be None when resuming.
+            workspace_dir (str): The workspace directory, on the server's machine.
+            resume (bool, optional): Continue the interrupted run in the workspace instead of starting over.
+            clarification_handler (callable, optional): Receives each question and returns the answer.
+                Defaults to asking on the terminal.
+            verbose_handler (callable, optional): Receives progress messages. Defaults to print.
+            **options: `CodeGenerator` options, e.g. 'max_iterations', 'generate_tests' or
+                'speculative_clarification'.
+
+        Returns:
+            dict: The outcome with 'success', 'iterations' used and the tracked 'files' paths.
+
+        Raises:
+            RuntimeError: If the job failed on the server.
+        """
+        event = self._request(
+            {
+                "op": "run",
+                "prompt": user_prompt,
+                "workspace": os.path.abspath(workspace_dir),
+                "resume": resume,
+                "options": options,
+            },
+            verbose_handler=verbose_handler,
+            clarification_handler=clarification_handler,
+        )
+        return {"success": event["success"], "iterations": event["iterations"], "files": event["files"]}
+
+    def shutdown(self):
+        """
+        Stops the server once its running jobs have finished.
+        """
+        self._request({"op": "shutdown"})
+
+
+def server_available(address=None, timeout=0.5):
+    """
+    Tells whether a server answers at the address.
+
+    Args:
+        address (str, optional): The server address. Defaults to `default_address()`.
+        timeout (float, optional): How long to wait for the answer, in seconds.
+
+    Returns:
+        bool: True if the server answered a ping.
+    """
+    try:
+        AgentClient(address, timeout=timeout).ping()
+    except (OSError, ValueError, RuntimeError):
+        return False
+    return True
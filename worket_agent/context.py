@@ -0,0 +1,246 @@
+import difflib
+import os
+import re
+
+from worket_agent.dependencies import collect_imports
+from worket_agent.impact import content_hash
+
+DEFAULT_TOKEN_BUDGET = 16000
+# Share of a context window budgeted, the token estimate is only approximate
+CONTEXT_WINDOW_MARGIN = 0.85
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a text.
+
+    Uses the common approximation of four characters per token, which is
+    close enough for budgeting without loading a tokenizer.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return (len(text) + 3) // 4
+
+
+def prompt_budget(context_window, max_tokens):
+    """
+    Returns how many prompt tokens fit in a context window next to the completion.
+
+    The completion is given at most half of the window, so that a large
+    `max_tokens` does not leave no room for the prompt.
+
+    Args:
+        context_window (int): The tokens shared by prompt and completion.
+        max_tokens (int): The completion token limit of the call.
+
+    Returns:
+        int: The prompt token budget.
+    """
+    reserved = min(max_tokens, context_window // 2)
+    return max(int((context_window - reserved) * CONTEXT_WINDOW_MARGIN), 0)
+
+
+def truncate_tokens(text, tokens):
+    """
+    Keeps the end of a text within a token budget, where tracebacks name the error.
+
+    Args:
+        text (str): The text.
+        tokens (int): The token budget.
+
+    Returns:
+        str: The text, or its last characters marked as truncated.
+    """
+    if estimate_tokens(text) <= tokens:
+        return text
+    marker = "[...truncated...]\n"
+    keep = max(tokens * 4 - len(marker), 0)
+    return marker + (text[-keep:] if keep else "")
+
+
+def format_file(file):
+    return f"```python\n{file['content']}\n```"
+
+
+def format_diff(path, old_content, new_content):
+    diff = difflib.unified_diff(
+        old_content.splitlines(keepends=True),
+        new_content.splitlines(keepends=True),
+        fromfile=f"a/{path}",
+        tofile=f"b/{path}",
+    )
+    return "```diff\n" + "".join(diff) + "\n```"
+
+
+class ContextBuilder:
+    """
+    Assembles the workspace files sent with a generation call within a token budget.
+
+    When every file fits in the budget, all files are sent in full. Otherwise
+    files mentioned by the prompt or the error feedback, and the local modules
+    they import or are imported by, are sent in full first. Other files that
+    changed since the prior prompt of the same role showed them in full, e.g.
+    the programmer prompt of the previous iteration, are sent as unified diffs
+    against that version, then remaining files in full while the budget
+    allows; anything left is only listed by path. Prompt sizes of every call
+    are recorded in `history` through `record`.
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        # For each role, the file contents its last prompt contained in full
+        self.sent = {}
+        self.history = []
+        self._last_build = None
+        self._imports = {}
+
+    def _imports_of(self, file):
+        key = content_hash(file["content"])
+        if key not in self._imports:
+            try:
+                self._imports[key] = collect_imports(file["content"])
+            except SyntaxError:
+                self._imports[key] = set()
+        return self._imports[key]
+
+    def _module_paths(self, files):
+        modules = {}
+        for file in files:
+            path = file["path"]
+            if not path or not path.endswith(".py"):
+                continue
+            module = path[: -len(".py")].replace("/", ".").replace(os.sep, ".")
+            modules[module] = path
+            modules[module.split(".")[-1]] = path
+        return modules
+
+    def implicated_paths(self, files, texts):
+        """
+        Finds the files mentioned in the given texts, plus their direct local imports and importers.
+
+        Args:
+            files (list of dict): The tracked files.
+            texts (list of str): Prompt and error feedback texts to search for file names.
+
+        Returns:
+            set: The implicated file paths.
+        """
+        text = "\n".join(t for t in texts if t)
+        mentioned = set()
+        for file in files:
+            if not file["path"]:
+                continue
+            # Whole names only, 'a.py' is not mentioned by 'data.py'; a full path ends with the basename
+            name = re.escape(os.path.basename(file["path"]))
+            if re.search(rf"(?<![\w.-]){name}(?![\w/-])", text):
+                mentioned.add(file["path"])
+
+        modules = self._module_paths(files)
+        imports = {}
+        for file in files:
+            if file["type"] not in ("code", "test"):
+                continue
+            imports[file["path"]] = {modules[m] for m in self._imports_of(file) if m in modules}
+
+        implicated = set(mentioned)
+        for path in mentioned:
+            implicated |= imports.get(path, set())
+            implicated |= {importer for importer, imported in imports.items() if path in imported}
+        return implicated
+
+    def build(self, files, prompt=None, error_feedback=None, token_budget=None, role=None):
+        """
+        Formats the files for one generation call.
+
+        Args:
+            files (list of dict): The tracked files with 'path', 'type' and 'content'.
+            prompt (str, optional): The prompt of the call.
+            error_feedback (str, optional): The error feedback of the call.
+            token_budget (int, optional): A lower budget for this call, e.g. what a context window leaves.
+            role (str, optional): The role of the call, diffs are only sent against its own prior prompt.
+
+        Returns:
+            str: The formatted files.
+        """
+        budget = self.token_budget if token_budget is None else min(token_budget, self.token_budget)
+        previous_prompt = self.sent.get(role, {})
+        sent = self.sent[role] = {}
+        full_sections = [format_file(f) for f in files]
+        full_text = "\n\n".join(full_sections)
+        full_tokens = estimate_tokens(full_text)
+        if full_tokens <= budget:
+            sent.update((f["path"], f["content"]) for f in files)
+            self._last_build = (full_tokens, full_tokens)
+            return full_text
+
+        implicated = self.implicated_paths(files, [prompt, error_feedback])
+        sections = []
+        omitted = []
+        used = 0
+
+        def add(section, file=None):
+            nonlocal used
+            tokens = estimate_tokens(section)
+            if used + tokens > budget:
+                return False
+            sections.append(section)
+            used += tokens
+            if file is not None:
+                sent[file["path"]] = file["content"]
+            return True
+
+        remaining = []
+        for file, section in zip(files, full_sections):
+            if file["path"] in implicated:
+                if not add(section, file):
+                    omitted.append(file["path"])
+            else:
+                remaining.append((file, section))
+
+        unchanged = []
+        for file, section in remaining:
+            # A diff is only readable against a version the model was shown in full
+            previous = previous_prompt.get(file["path"])
+            if previous is not None and previous != file["content"]:
+                if not add(format_diff(file["path"], previous, file["content"])):
+                    omitted.append(file["path"])
+            else:
+                unchanged.append((file, section))
+
+        for file, section in unchanged:
+            if not add(section, file):
+                omitted.append(file["path"])
+
+        if omitted:
+            sections.append("Other workspace files (not shown): " + ", ".join(str(path) for path in omitted))
+        text = "\n\n".join(sections)
+        self._last_build = (estimate_tokens(text), full_tokens)
+        return text
+
+    def record(self, role, messages):
+        """
+        Records the prompt size of a call whose files were formatted by the last `build`, if any.
+
+        Args:
+            role (str): The role of the call.
+            messages (list of dict): The chat messages sent.
+
+        Returns:
+            dict: The recorded entry with 'role', 'prompt_tokens' and 'full_prompt_tokens'.
+        """
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        file_tokens, full_file_tokens = self._last_build if self._last_build else (0, 0)
+        self._last_build = None
+        entry = {
+            "role": role,
+            "prompt_tokens": prompt_tokens,
+            "full_prompt_tokens": prompt_tokens - file_tokens + full_file_tokens,
+        }
+        self.history.append(entry)
+        if entry["prompt_tokens"] < entry["full_prompt_tokens"]:
+            print(f"Prompt for {role}: ~{entry['prompt_tokens']} tokens instead of ~{entry['full_prompt_tokens']}")
+        return entry
@@ -0,0 +1,200 @@
+import ast
+import os
+import sys
+import threading
+
+# Import names whose distribution on PyPI is named differently, or is a common
+# dependency of generated scripts. Imports not listed here and not installed
+# locally are left to the requirements model.
+IMPORT_TO_DISTRIBUTION = {
+    "aiohttp": "aiohttp",
+    "attr": "attrs",
+    "boto3": "boto3",
+    "bs4": "beautifulsoup4",
+    "click": "click",
+    "Crypto": "pycryptodome",
+    "cv2": "opencv-python",
+    "dateutil": "python-dateutil",
+    "discord": "discord.py",
+    "django": "Django",
+    "docx": "python-docx",
+    "dotenv": "python-dotenv",
+    "fastapi": "fastapi",
+    "fitz": "PyMuPDF",
+    "flask": "Flask",
+    "gi": "PyGObject",
+    "httpx": "httpx",
+    "jinja2": "Jinja2",
+    "jose": "python-jose",
+    "jwt": "PyJWT",
+    "lxml": "lxml",
+    "magic": "python-magic",
+    "matplotlib": "matplotlib",
+    "numpy": "numpy",
+    "openpyxl": "openpyxl",
+    "OpenSSL": "pyOpenSSL",
+    "pandas": "pandas",
+    "PIL": "Pillow",
+    "playwright": "playwright",
+    "pptx": "python-pptx",
+    "psutil": "psutil",
+    "pyautogui": "pyautogui",
+    "pydantic": "pydantic",
+    "pygame": "pygame",
+    "pynput": "pynput",
+    "pytest": "pytest",
+    "pythoncom": "pywin32",
+    "pywintypes": "pywin32",
+    "requests": "requests",
+    "scipy": "scipy",
+    "selenium": "selenium",
+    "serial": "pyserial",
+    "skimage": "scikit-image",
+    "sklearn": "scikit-learn",
+    "slugify": "python-slugify",
+    "speech_recognition": "SpeechRecognition",
+    "sqlalchemy": "SQLAlchemy",
+    "telegram": "python-telegram-bot",
+    "torch": "torch",
+    "tqdm": "tqdm",
+    "usb": "pyusb",
+    "webdriver_manager": "webdriver-manager",
+    "websocket": "websocket-client",
+    "win32api": "pywin32",
+    "win32con": "pywin32",
+    "win32gui": "pywin32",
+    "Xlib": "python-xlib",
+    "yaml": "PyYAML",
+}
+
+
+def _stdlib_modules():
+    if hasattr(sys, "stdlib_module_names"):
+        modules = set(sys.stdlib_module_names)
+    else:
+        from stdlib_list import stdlib_list
+
+        python_version = f"{sys.version_info.major}.{sys.version_info.minor}"
+        modules = {name.split(".")[0] for name in stdlib_list(python_version)}
+    modules.update({"unittest", "mock", "__future__"})
+    return frozenset(modules)
+
+
+_stdlib_cache = None
+_stdlib_lock = threading.Lock()
+
+
+def stdlib_modules():
+    """
+    Returns the top-level module names of the standard library.
+
+    The index is built on first use, before Python 3.10 it comes from
+    `stdlib_list`, which is slow to import.
+
+    Returns:
+        frozenset: The standard library module names.
+    """
+    global _stdlib_cache
+    with _stdlib_lock:
+        if _stdlib_cache is None:
+            _stdlib_cache = _stdlib_modules()
+        return _stdlib_cache
+
+
+def _installed_distributions():
+    try:
+        from importlib.metadata import packages_distributions
+    except ImportError:
+        return {}
+    return packages_distributions()
+
+
+def collect_imports(source):
+    """
+    Collects the top-level names of absolute imports in Python source code.
+
+    Args:
+        source (str): The Python source code.
+
+    Returns:
+        set: The imported top-level module names.
+
+    Raises:
+        SyntaxError: If the source cannot be parsed.
+    """
+    imports = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imports.add(node.module.split(".")[0])
+    return imports
+
+
+def local_modules(paths):
+    """
+    Derives the top-level module names provided by workspace files.
+
+    Both the first path component and the module basename of each Python
+    file count as local, as files in a folder may import each other directly.
+
+    Args:
+        paths (iterable of str): Workspace-relative file paths.
+
+    Returns:
+        set: The local top-level module names.
+    """
+    modules = set()
+    for path in paths:
+        if not path:
+            continue
+        parts = os.path.normpath(path).split(os.sep)
+        top_level = parts[0]
+        if len(parts) == 1 and top_level.endswith(".py"):
+            top_level = top_level[: -len(".py")]
+        modules.add(top_level)
+        if parts[-1].endswith(".py"):
+            # Scripts in a folder import their siblings by basename, e.g. 'src/core.py' as 'core'
+            module = parts[-1][: -len(".py")]
+            if module == "__init__" and len(parts) > 1:
+                module = parts[-2]
+            modules.add(module)
+    return modules
+
+
+def resolve_requirements(files):
+    """
+    Resolves the third-party distributions required by code and test files.
+
+    Args:
+        files (list of dict): Files with 'path', 'type' and 'content'; only 'code' and 'test' files are analysed.
+
+    Returns:
+        tuple: The sorted list of resolved distribution names and the sorted list of unresolved import names.
+
+    Raises:
+        SyntaxError: If one of the files cannot be parsed.
+    """
+    python_files = [f for f in files if f["type"] in ("code", "test")]
+    imports = set()
+    for file in python_files:
+        imports |= collect_imports(file["content"])
+
+    imports -= stdlib_modules()
+    imports -= local_modules(f["path"] for f in python_files)
+
+    installed = None
+    distributions = set()
+    unresolved = set()
+    for name in imports:
+        distribution = IMPORT_TO_DISTRIBUTION.get(name)
+        if distribution is None:
+            if installed is None:
+                installed = _installed_distributions()
+            candidates = installed.get(name)
+            distribution = candidates[0] if candidates else None
+        if distribution is None:
+            unresolved.add(name)
+        else:
+            distributions.add(distribution)
+    return sorted(distributions), sorted(unresolved)
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+DEFAULT_POOL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "worker_agent", "envs")
+MARKER_FILE = ".worker_agent_env"
+
+
+def requirements_fingerprint(requirements=None):
+    """
+    Computes a fingerprint of the interpreter and a requirement set.
+
+    Args:
+        requirements (str or list of str, optional): Requirement specifiers, one per line or item.
+
+    Returns:
+        str: A short hex digest.
+    """
+    if isinstance(requirements, str):
+        requirements = requirements.splitlines()
+    normalized = sorted({line.strip().lower() for line in requirements or [] if line.strip()})
+    payload = "\n".join([sys.executable, sys.version] + normalized)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class EnvironmentPool:
+    """
+    Pool of pre-built virtual environments shared between generation jobs.
+
+    A base environment is built once per Python interpreter and requirement
+    set. Jobs receive a clone whose files are hard links into the base (or
+    copies where linking is not possible), which takes milliseconds instead
+    of bootstrapping pip. Base environments not used recently are evicted
+    once more than `max_envs` exist.
+    """
+
+    def __init__(self, root=DEFAULT_POOL_DIR, max_envs=8):
+        self.root = root
+        self.max_envs = max_envs
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _scripts_dir(self, env_dir):
+        return os.path.join(env_dir, "Scripts" if os.name == "nt" else "bin")
+
+    def _base_dir(self, key):
+        return os.path.join(self.root, f"py{sys.version_info.major}{sys.version_info.minor}-{key}")
+
+    def _build_base(self, base_dir, requirements):
+        import venv
+
+        # Build next to the final location and rename, so concurrent builders never see a partial env
+        build_dir = tempfile.mkdtemp(prefix=".build-", dir=self.root)
+        try:
+            venv.EnvBuilder(with_pip=True, clear=True).create(build_dir)
+            if requirements:
+                python_executable = os.path.join(
+                    self._scripts_dir(build_dir), "python.exe" if os.name == "nt" else "python"
+                )
+                subprocess.run(
+                    [python_executable, "-m", "pip", "install"] + list(requirements),
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+            self._rewrite_paths(build_dir, build_dir, base_dir)
+            os.rename(build_dir, base_dir)
+            print(f"Base virtual environment created at {base_dir}")
+        except OSError:
+            # Another process finished the same base first
+            if not os.path.isdir(base_dir):
+                raise
+        finally:
+            if os.path.isdir(build_dir):
+                shutil.rmtree(build_dir, ignore_errors=True)
+
+    def _rewrite_paths(self, env_dir, old_dir, new_dir):
+        """
+        Replaces `old_dir` with `new_dir` in the activation scripts, entry points and pyvenv.cfg of `env_dir`.
+        """
+        old = os.path.abspath(old_dir).encode("utf-8")
+        new = os.path.abspath(new_dir).encode("utf-8")
+        scripts_dir = self._scripts_dir(env_dir)
+        candidates = [os.path.join(env_dir, "pyvenv.cfg")]
+        candidates += [os.path.join(scripts_dir, name) for name in os.listdir(scripts_dir)]
+        for path in candidates:
+            if os.path.islink(path) or not os.path.isfile(path):
+                continue
+            with open(path, "rb") as f:
+                content = f.read()
+            if old not in content or b"\0" in content:
+                continue
+            # Replace instead of writing in place, the file may be a hard link into the base
+            mode = os.stat(path).st_mode
+            os.remove(path)
+            with open(path, "wb") as f:
+                f.write(content.replace(old, new))
+            os.chmod(path, mode)
+
+    def acquire(self, env_dir, requirements=None):
+        """
+        Provides a virtual environment at `env_dir`, cloned from a pooled base.
+
+        An existing environment at `env_dir` from the same base is reused as is,
+        one cloned from another base is replaced. A virtual environment that
+        was not cloned by a pool is never deleted: it is reused with a warning.
+
+        Args:
+            env_dir (str): Where the environment should live.
+            requirements (str or list of str, optional): Requirements pre-installed in the base.
+
+        Returns:
+            str: The environment directory.
+
+        Raises:
+            FileExistsError: If `env_dir` exists and is neither a pooled clone nor a virtual environment.
+        """
+        if isinstance(requirements, str):
+            requirements = [line.strip() for line in requirements.splitlines() if line.strip()]
+        key = requirements_fingerprint(requirements)
+        marker_path = os.path.join(env_dir, MARKER_FILE)
+        if os.path.exists(marker_path):
+            with open(marker_path, encoding="utf-8") as f:
+                if f.read().strip() == key:
+                    return env_dir
+            shutil.rmtree(env_dir)
+        elif os.path.exists(env_dir):
+            if not os.path.isfile(os.path.join(env_dir, "pyvenv.cfg")):
+                raise FileExistsError(f"{env_dir} exists and is not a virtual environment.")
+            print(f"Warning: reusing the virtual environment at {env_dir}, it was not created by the pool.")
+            return env_dir
+
+        base_dir = self.warm(requirements)
+        shutil.copytree(base_dir, env_dir, symlinks=True, copy_function=_link_or_copy)
+        self._rewrite_paths(env_dir, base_dir, env_dir)
+        with open(marker_path, "w", encoding="utf-8") as f:
+            f.write(key)
+        print(f"Virtual environment cloned at {env_dir}")
+
+        self.evict()
+        return env_dir
+
+    def evict(self):
+        """
+        Removes the least recently used base environments beyond `max_envs`.
+        """
+        with self._lock:
+            bases = [
+                os.path.join(self.root, name)
+                for name in os.listdir(self.root)
+                if name.startswith("py") and os.path.isdir(os.path.join(self.root, name))
+            ]
+            bases.sort(key=os.path.getmtime, reverse=True)
+            for base_dir in bases[self.max_envs:]:
+                shutil.rmtree(base_dir, ignore_errors=True)
+
+    def warm(self, requirements=None):
+        """
+        Builds the base environment for a requirement set ahead of time.
+
+        Args:
+            requirements (str or list of str, optional): Requirements pre-installed in the base.
+
+        Returns:
+            str: The base environment directory.
+        """
+        if isinstance(requirements, str):
+            requirements = [line.strip() for line in requirements.splitlines() if line.strip()]
+        base_dir = self._base_dir(requirements_fingerprint(requirements))
+        with self._lock:
+            if not os.path.isdir(base_dir):
+                self._build_base(base_dir, requirements)
+            os.utime(base_dir)
+        return base_dir
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+import weakref
+
+DEFAULT_TIMEOUT = 60
+# Multithreaded scripts may use more CPU time than wall-clock time
+DEFAULT_CPU_SECONDS = 2 * DEFAULT_TIMEOUT
+DEFAULT_MAX_OUTPUT_BYTES = 64 * 1024
+
+
+def resource_limiter(cpu_seconds=None, memory_bytes=None):
+    """
+    Builds a `preexec_fn` applying CPU and address-space rlimits to a child process.
+
+    The address-space limit counts reservations rather than memory in use, so
+    browsers, JVMs and CUDA fail under a cap that looks generous; it is opt-in.
+    Limits stay within the inherited hard limits, and a limit the platform
+    rejects (e.g. RLIMIT_AS on macOS) is skipped.
+
+    Args:
+        cpu_seconds (int, optional): The CPU time limit.
+        memory_bytes (int, optional): The address-space limit.
+
+    Returns:
+        callable or None: The function to run in the child, or None off POSIX or without limits.
+    """
+    if os.name != "posix" or (cpu_seconds is None and memory_bytes is None):
+        return None
+
+    def apply_limits():
+        import resource
+
+        for limit, value in ((resource.RLIMIT_CPU, cpu_seconds), (resource.RLIMIT_AS, memory_bytes)):
+            if value is None:
+                continue
+            _, hard = resource.getrlimit(limit)
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            try:
+                resource.setrlimit(limit, (value, value))
+            except (ValueError, OSError):
+                pass
+
+    return apply_limits
+
+
+class _OutputCollector:
+    """
+    Keeps at most `limit` bytes of a stream while still draining the rest.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.data = bytearray()
+        self.truncated = False
+
+    async def drain(self, stream):
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return
+            room = self.limit - len(self.data)
+            if len(chunk) > room:
+                self.truncated = True
+            if room > 0:
+                self.data += chunk[:room]
+
+    def text(self):
+        return self.data.decode("utf-8", errors="replace")
+
+
+class ExecutionEngine:
+    """
+    Runs Python scripts concurrently in isolated child processes.
+
+    Each script runs in its own process group with a wall-clock timeout, after
+    which the whole group is killed and reaped. On POSIX, `cpu_seconds` and
+    the opt-in `memory_bytes` (address space) are applied as rlimits, see
+    `resource_limiter`. Output is captured up to `max_output_bytes` per stream.
+    """
+
+    def __init__(self, max_workers=4, timeout=DEFAULT_TIMEOUT, cpu_seconds=DEFAULT_CPU_SECONDS, memory_bytes=None,
+                 max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.max_output_bytes = max_output_bytes
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._semaphores_lock = threading.Lock()
+
+    def _get_semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_workers)
+                self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _kill(self, process):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    async def run_script(self, python_executable, filepath, cwd=None):
+        """
+        Runs one script.
+
+        Args:
+            python_executable (str): The Python executable to run the script with.
+            filepath (str): The path to the script.
+            cwd (str, optional): The working directory of the process.
+
+        Returns:
+            dict: The result with 'path', 'exit_code', 'success', 'stdout', 'stderr', 'duration',
+                'timed_out', 'stdout_truncated' and 'stderr_truncated'.
+        """
+        kwargs = {}
+        if os.name == "posix":
+            kwargs["start_new_session"] = True
+            limiter = resource_limiter(self.cpu_seconds, self.memory_bytes)
+            if limiter is not None:
+                kwargs["preexec_fn"] = limiter
+
+        async with self._get_semaphore():
+            start = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                python_executable,
+                filepath,
+                cwd=cwd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **kwargs,
+            )
+            stdout = _OutputCollector(self.max_output_bytes)
+            stderr = _OutputCollector(self.max_output_bytes)
+            readers = asyncio.gather(stdout.drain(process.stdout), stderr.drain(process.stderr))
+            # Readers may be cancelled below, mark their outcome as retrieved
+            readers.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+            timed_out = False
+            try:
+                await asyncio.wait_for(process.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                self._kill(process)
+                await process.wait()
+            except asyncio.CancelledError:
+                self._kill(process)
+                readers.cancel()
+                # Reap the killed process, it would otherwise linger as a zombie
+                await process.wait()
+                raise
+
+            # Detached grandchildren may keep the pipes open after the script itself exits,
+            # the readers are cancelled with the wait then
+            remaining = max(self.timeout - (time.monotonic() - start), 1)
+            try:
+                await asyncio.wait_for(readers, remaining)
+            except asyncio.TimeoutError:
+                self._kill(process)
+            except asyncio.CancelledError:
+                self._kill(process)
+                raise
+            duration = time.monotonic() - start
+
+        exit_code = process.returncode
+        return {
+            "path": filepath,
+            "exit_code": exit_code,
+            "success": exit_code == 0 and not timed_out,
+            "stdout": stdout.text(),
+            "stderr": stderr.text(),
+            "duration": duration,
+            "timed_out": timed_out,
+            "stdout_truncated": stdout.truncated,
+            "stderr_truncated": stderr.truncated,
+        }
+
+    async def run_scripts(self, python_executable, filepaths, cwd=None):
+        """
+        Runs several scripts concurrently, at most `max_workers` at a time.
+
+        Args:
+            python_executable (str): The Python executable to run the scripts with.
+            filepaths (list of str): The paths to the scripts.
+            cwd (str, optional): The working directory of the processes.
+
+        Returns:
+            list of dict: One result per script, in the order of `filepaths`.
+        """
+        return await asyncio.gather(
+            *[self.run_script(python_executable, filepath, cwd=cwd) for filepath in filepaths]
+        )
@@ -0,0 +1,223 @@
+"""
+Test worker run inside the generated project's virtual environment by `TestRunner`.
+
+Arguments are the workspace directory and, optionally, the CPU seconds each
+request may use.
+
+Reads one JSON request per line on stdin and answers with one JSON line:
+  {"op": "reset"}                forgets the workspace modules imported so far
+  {"op": "collect", "path": p}   imports a test file and lists its test ids
+  {"op": "run", "id": test_id}   runs one test
+This file only uses the standard library, it must not import worket_agent.
+"""
+import importlib.util
+import inspect
+import io
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+MAX_FRAMES = 5
+MAX_OUTPUT = 2000
+
+WORKSPACE = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else os.getcwd())
+CPU_SECONDS = int(sys.argv[2]) if len(sys.argv) > 2 else None
+_modules = {}
+
+
+def _in_workspace(filename):
+    if not os.path.isabs(filename):
+        # Frozen and generated code, e.g. "<frozen importlib._bootstrap>"
+        return False
+    return filename.startswith(WORKSPACE + os.sep) and os.sep + "env" + os.sep not in filename[len(WORKSPACE):]
+
+
+def _reset():
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if filename and _in_workspace(filename):
+            del sys.modules[name]
+    _modules.clear()
+    importlib.invalidate_caches()
+
+
+def _limit_cpu():
+    # RLIMIT_CPU counts the whole life of the worker, move the soft limit past the time used so far
+    if CPU_SECONDS is None:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + 1 + CPU_SECONDS
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _failure(exc_type, exc, tb):
+    frames = [frame for frame in traceback.extract_tb(tb) if _in_workspace(frame.filename)]
+    frames = frames[-MAX_FRAMES:]
+    lines = []
+    for frame in frames:
+        lines.append(f'  File "{os.path.relpath(frame.filename, WORKSPACE)}", line {frame.lineno}, in {frame.name}')
+        if frame.line:
+            lines.append(f"    {frame.line}")
+    message = str(exc).strip()
+    if not message and frames and frames[-1].line:
+        # A bare assert has no message, its source line says what failed
+        message = frames[-1].line
+    return {
+        "message": f"{exc_type.__name__}: {message}" if message else exc_type.__name__,
+        "traceback": "\n".join(lines),
+    }
+
+
+def _load(path):
+    module = _modules.get(path)
+    if module is None:
+        name = os.path.splitext(path)[0].replace("/", ".").replace(os.sep, ".")
+        spec = importlib.util.spec_from_file_location(name, os.path.join(WORKSPACE, path))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+        _modules[path] = module
+    return module
+
+
+def _function_tests(module):
+    tests = []
+    for name, value in vars(module).items():
+        if name.startswith("test") and inspect.isfunction(value) and value.__module__ == module.__name__:
+            tests.append(name)
+    return tests
+
+
+def _case_tests(module):
+    tests = []
+    suite = unittest.defaultTestLoader.loadTestsFromModule(module)
+    stack = [suite]
+    while stack:
+        item = stack.pop(0)
+        if isinstance(item, unittest.TestSuite):
+            stack[:0] = list(item)
+        elif type(item).__name__ not in ("_FailedTest", "ModuleImportFailure"):
+            tests.append(f"{type(item).__name__}::{item._testMethodName}")
+    return tests
+
+
+def collect(path):
+    try:
+        module = _load(path)
+    except SystemExit as e:
+        if e.code in (None, 0):
+            return {"tests": [path]}
+        return {"tests": [], "failure": {"message": f"SystemExit: {e.code}", "traceback": ""}}
+    except BaseException:
+        return {"tests": [], "failure": _failure(*sys.exc_info())}
+    tests = [f"{path}::{test}" for test in _case_tests(module) + _function_tests(module)]
+    # Script-style test files check everything at import time, which just passed
+    return {"tests": tests or [path]}
+
+
+class _Result(unittest.TestResult):
+    def __init__(self):
+        super().__init__()
+        self.outcome = "passed"
+        self.failure = None
+
+    def _record(self, outcome, err):
+        if self.failure is None:
+            self.outcome = outcome
+            self.failure = _failure(*err)
+
+    def addFailure(self, test, err):
+        self._record("failed", err)
+
+    def addError(self, test, err):
+        self._record("error", err)
+
+    def addSubTest(self, test, subtest, err):
+        if err is not None:
+            self._record("failed" if issubclass(err[0], test.failureException) else "error", err)
+
+    def addSkip(self, test, reason):
+        self.outcome = "skipped"
+        self.failure = {"message": reason, "traceback": ""}
+
+
+def run(test_id):
+    parts = test_id.split("::")
+    path = parts[0]
+    module = _load(path)
+    if len(parts) == 1:
+        # Script-style file, importing it is the test
+        return {"outcome": "passed"}
+
+    if len(parts) == 3:
+        case = getattr(module, parts[1])(parts[2])
+        result = _Result()
+        case.run(result)
+        return {"outcome": result.outcome, "failure": result.failure}
+
+    func = getattr(module, parts[1])
+    if inspect.signature(func).parameters:
+        return {"outcome": "error", "failure": {"message": "Test functions with fixtures are not supported", "traceback": ""}}
+    func()
+    return {"outcome": "passed"}
+
+
+def main():
+    # Tests may print or write to fd 1, keep the protocol on a private copy of stdout
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+    sys.path.insert(0, WORKSPACE)
+    os.chdir(WORKSPACE)
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        _limit_cpu()
+        captured = io.StringIO()
+        stdout, sys.stdout = sys.stdout, captured
+        start = time.monotonic()
+        try:
+            if request["op"] == "reset":
+                _reset()
+                response = {}
+            elif request["op"] == "collect":
+                response = collect(request["path"])
+            else:
+                try:
+                    response = run(request["id"])
+                except SystemExit as e:
+                    if e.code in (None, 0):
+                        response = {"outcome": "passed"}
+                    else:
+                        response = {"outcome": "failed", "failure": {"message": f"SystemExit: {e.code}", "traceback": ""}}
+                except AssertionError:
+                    response = {"outcome": "failed", "failure": _failure(*sys.exc_info())}
+                except BaseException:
+                    response = {"outcome": "error", "failure": _failure(*sys.exc_info())}
+                response["id"] = request["id"]
+        finally:
+            sys.stdout = stdout
+        response["duration"] = time.monotonic() - start
+        response["output"] = captured.getvalue()[-MAX_OUTPUT:]
+        protocol.write(json.dumps(response) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
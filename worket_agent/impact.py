@@ -0,0 +1,193 @@
+import ast
+import hashlib
+import os
+
+
+def content_hash(content):
+    """
+    Hashes the content of a workspace file.
+
+    Args:
+        content (str): The file content.
+
+    Returns:
+        str: The hex SHA-256 digest of the content.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def module_name(path):
+    """
+    Derives the dotted module name of a workspace file.
+
+    Args:
+        path (str): The workspace-relative path of a Python file.
+
+    Returns:
+        str: The module name, e.g. 'pkg.mod' for 'pkg/mod.py' and 'pkg' for 'pkg/__init__.py'.
+    """
+    module = os.path.splitext(os.path.normpath(path))[0].replace(os.sep, ".").replace("/", ".")
+    if module == "__init__" or module.endswith(".__init__"):
+        module = module[: -len("__init__")].rstrip(".")
+    return module
+
+
+def imported_modules(source, path=""):
+    """
+    Collects the dotted names a Python file may import, relative imports resolved.
+
+    `from a import b` yields both 'a' and 'a.b', since 'b' may be a submodule.
+
+    Args:
+        source (str): The Python source code.
+        path (str, optional): The workspace-relative path of the file, to resolve relative imports.
+
+    Returns:
+        set: The imported module names.
+
+    Raises:
+        SyntaxError: If the source cannot be parsed.
+    """
+    package = module_name(path).split(".") if path else []
+    if path and os.path.basename(path) != "__init__.py":
+        package = package[:-1]
+
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[: max(len(package) - node.level + 1, 0)]
+                prefix = ".".join(base + ([node.module] if node.module else []))
+            else:
+                prefix = node.module or ""
+            if prefix:
+                names.add(prefix)
+            names.update(
+                f"{prefix}.{alias.name}" if prefix else alias.name for alias in node.names if alias.name != "*"
+            )
+    return names
+
+
+class ImpactAnalyzer:
+    """
+    Decides which test files and scripts must run again after files changed.
+
+    Every runnable file gets a digest over its own content, the content of
+    each workspace module it imports directly or transitively, and the
+    requirements. A file whose digest matches the one of its last passing
+    run is not run again, its result is reused. Files that failed last time
+    run first. Results are keyed by content, so copies of the workspace
+    (e.g. the candidates of one round) can share an analyzer.
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._imports = {}
+
+    def _imports_of(self, file):
+        key = (file["path"], content_hash(file["content"]))
+        if key not in self._imports:
+            try:
+                self._imports[key] = imported_modules(file["content"], file["path"])
+            except SyntaxError:
+                self._imports[key] = set()
+        return self._imports[key]
+
+    def import_graph(self, files):
+        """
+        Indexes the local imports of the workspace files.
+
+        Modules resolve by dotted name first, then by their last component, like
+        scripts run from their own directory would import them.
+
+        Args:
+            files (list of dict): The tracked files with 'path', 'type' and 'content'.
+
+        Returns:
+            dict: For each code and test file, the set of paths of the workspace files it imports.
+        """
+        python_files = [f for f in files if f["type"] in ("code", "test") and f["path"].endswith(".py")]
+        modules = {}
+        for file in python_files:
+            modules.setdefault(module_name(file["path"]).split(".")[-1], file["path"])
+        for file in python_files:
+            modules[module_name(file["path"])] = file["path"]
+
+        graph = {}
+        for file in python_files:
+            imported = set()
+            for name in self._imports_of(file):
+                parts = name.split(".")
+                # Importing a.b.c also runs a/__init__.py and a/b/__init__.py
+                for end in range(len(parts), 0, -1):
+                    path = modules.get(".".join(parts[:end]))
+                    if path is not None:
+                        imported.add(path)
+            imported.discard(file["path"])
+            graph[file["path"]] = imported
+        return graph
+
+    def digests(self, files):
+        """
+        Computes the dependency digest of every code and test file.
+
+        Args:
+            files (list of dict): The tracked files with 'path', 'type' and 'content'.
+
+        Returns:
+            dict: The digest of each code and test file path.
+        """
+        hashes = {f["path"]: content_hash(f["content"]) for f in files}
+        shared = sorted(f"{f['path']}:{hashes[f['path']]}" for f in files if f["type"] == "requirements")
+        graph = self.import_graph(files)
+
+        digests = {}
+        for path in graph:
+            closure = {path}
+            stack = [path]
+            while stack:
+                for imported in graph.get(stack.pop(), ()):
+                    if imported not in closure:
+                        closure.add(imported)
+                        stack.append(imported)
+            entries = sorted(f"{dependency}:{hashes[dependency]}" for dependency in closure) + shared
+            digests[path] = content_hash("\n".join(entries))
+        return digests
+
+    def plan(self, files, paths):
+        """
+        Splits files to run into the ones affected by changes and the ones whose results still hold.
+
+        Args:
+            files (list of dict): The tracked files.
+            paths (list of str): The test files or scripts to run.
+
+        Returns:
+            tuple: The paths to run, previously failing ones first, and the paths whose passing
+                result is reused.
+        """
+        digests = self.digests(files)
+        to_run = []
+        reused = []
+        for path in paths:
+            last = self._results.get(path)
+            if last and last["passed"] and last["digest"] == digests.get(path):
+                reused.append(path)
+            else:
+                to_run.append(path)
+        to_run.sort(key=lambda path: 0 if path in self._results and not self._results[path]["passed"] else 1)
+        return to_run, reused
+
+    def record(self, files, outcomes):
+        """
+        Records the outcome of the files that ran.
+
+        Args:
+            files (list of dict): The tracked files, as they were when the files ran.
+            outcomes (dict): Whether each run path passed.
+        """
+        digests = self.digests(files)
+        for path, passed in outcomes.items():
+            self._results[path] = {"digest": digests.get(path), "passed": passed}
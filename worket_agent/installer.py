@@ -0,0 +1,151 @@
+import glob
+import os
+import re
+import subprocess
+import threading
+import time
+
+DEFAULT_WHEELHOUSE = os.path.join(os.path.expanduser("~"), ".cache", "worker_agent", "wheels")
+
+REQUIREMENT_NAME_PATTERN = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def normalize_name(name):
+    """
+    Normalizes a distribution name as described in PEP 503.
+
+    Args:
+        name (str): The distribution name.
+
+    Returns:
+        str: The normalized name.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def parse_requirements(requirements_content):
+    """
+    Parses requirement lines into a mapping of normalized names to specifiers.
+
+    Args:
+        requirements_content (str): The content of a requirements.txt file.
+
+    Returns:
+        dict: The requirement specifier for each normalized distribution name.
+    """
+    requirements = {}
+    for line in requirements_content.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line or line.startswith("-"):
+            continue
+        match = REQUIREMENT_NAME_PATTERN.match(line)
+        if match:
+            requirements[normalize_name(match.group(1))] = line
+    return requirements
+
+
+def installed_distributions(env_dir):
+    """
+    Lists the distributions installed in a virtual environment without starting its interpreter.
+
+    Args:
+        env_dir (str): The virtual environment directory.
+
+    Returns:
+        dict: The installed version for each normalized distribution name.
+    """
+    if os.name == "nt":
+        site_packages = [os.path.join(env_dir, "Lib", "site-packages")]
+    else:
+        site_packages = glob.glob(os.path.join(env_dir, "lib", "python*", "site-packages"))
+
+    installed = {}
+    for directory in site_packages:
+        for metadata_dir in glob.glob(os.path.join(directory, "*.dist-info")):
+            # Directory names are "<name>-<version>.dist-info"
+            name, _, version = os.path.basename(metadata_dir)[: -len(".dist-info")].partition("-")
+            installed[normalize_name(name)] = version
+    return installed
+
+
+def _is_satisfied(specifier, installed_version):
+    if installed_version is None:
+        return False
+    pinned = re.search(r"==\s*([^\s;,]+)", specifier)
+    return pinned is None or pinned.group(1) == installed_version
+
+
+class RequirementsInstaller:
+    """
+    Installs requirements into a virtual environment incrementally.
+
+    Only requirements missing from the environment are passed to pip, and
+    wheels are kept in a local wheelhouse so repeated installs work offline.
+    Every call is recorded in `history` with its timing. Installs into the
+    same environment are serialized, different environments proceed in parallel.
+    """
+
+    def __init__(self, wheelhouse=DEFAULT_WHEELHOUSE):
+        self.wheelhouse = wheelhouse
+        self.history = []
+        self._env_locks = {}
+        self._env_locks_lock = threading.Lock()
+        os.makedirs(self.wheelhouse, exist_ok=True)
+
+    def _env_lock(self, env_dir):
+        with self._env_locks_lock:
+            return self._env_locks.setdefault(os.path.abspath(env_dir), threading.Lock())
+
+    def _pip(self, python_executable, args):
+        return subprocess.run(
+            [python_executable, "-m", "pip"] + args,
+            capture_output=True,
+            text=True,
+        )
+
+    def install(self, python_executable, env_dir, requirements_content):
+        """
+        Installs the requirements that the environment does not satisfy yet.
+
+        Args:
+            python_executable (str): The Python executable of the environment.
+            env_dir (str): The virtual environment directory.
+            requirements_content (str): The content of the requirements.txt file.
+
+        Returns:
+            dict: The install record with 'requested', 'missing', 'source', 'success', 'duration' and 'output'.
+        """
+        with self._env_lock(env_dir):
+            return self._install(python_executable, env_dir, requirements_content)
+
+    def _install(self, python_executable, env_dir, requirements_content):
+        start = time.monotonic()
+        requested = parse_requirements(requirements_content)
+        installed = installed_distributions(env_dir)
+        missing = [spec for name, spec in requested.items() if not _is_satisfied(spec, installed.get(name))]
+
+        record = {
+            "requested": sorted(requested.values()),
+            "missing": missing,
+            "source": None,
+            "success": True,
+            "output": "",
+        }
+        if missing:
+            offline_args = ["install", "--no-index", "--find-links", self.wheelhouse] + missing
+            result = self._pip(python_executable, offline_args)
+            record["source"] = "wheelhouse"
+            if result.returncode != 0:
+                # Fill the wheelhouse with the missing wheels and their dependencies, then retry offline
+                download = self._pip(python_executable, ["wheel", "--wheel-dir", self.wheelhouse] + missing)
+                if download.returncode == 0:
+                    result = self._pip(python_executable, offline_args)
+                else:
+                    result = download
+                record["source"] = "index"
+            record["success"] = result.returncode == 0
+            record["output"] = result.stdout + result.stderr
+
+        record["duration"] = time.monotonic() - start
+        self.history.append(record)
+        return record
@@ -1,13 +1,86 @@
+import argparse
 import os
-from worket_agent.agent import CodeGenerator
-from worket_agent.agent import ClarifierAgent
+
+# Heavy modules are imported where they are needed, submitting to a running server only needs the client
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate Python code from a prompt.")
+    parser.add_argument("--batch", metavar="JOBS_JSONL", help="Run the prompts of a JSONL file instead of asking for one.")
+    parser.add_argument("--output", metavar="RESULTS_JSONL", default="results.jsonl", help="Where batch results are appended.")
+    parser.add_argument("--jobs", type=int, default=4, help="Number of batch jobs run at once.")
+    parser.add_argument("--llm-calls", type=int, default=8, help="Maximum concurrent model calls in batch mode.")
+    parser.add_argument("--executions", type=int, default=4, help="Maximum concurrent script executions in batch mode.")
+    parser.add_argument("--resume", action="store_true", help="Continue the interrupted run in the workspace.")
+    parser.add_argument("--ask-all", action="store_true",
+                        help="Ask all clarification questions at once while the roadmap is drafted.")
+    parser.add_argument("--patch", action="store_true",
+                        help="Fix errors with search/replace edits instead of regenerating whole files.")
+    parser.add_argument("--local-model", nargs="?", const="default", metavar="GGUF_PATH",
+                        help="Run a GGUF model on the CPU in-process instead of the inference API, offline once downloaded.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run the local server that keeps the model client and environments warm.")
+    parser.add_argument("--local", action="store_true", help="Run in this process even if a server is running.")
+    args = parser.parse_args()
+
+    backend = None
+    if args.local_model:
+        from worket_agent.backends import local_backend, set_default_backend
+
+        backend = local_backend(args.local_model)
+        set_default_backend(backend)
+
+    if args.serve:
+        from worket_agent.server import AgentServer
+
+        AgentServer(max_jobs=args.jobs, max_executions=args.executions).serve()
+        return
+
     workspace = os.path.join(os.getcwd(), "workspace")
+
+    if not args.local and not args.batch and not args.local_model:
+        from worket_agent.client import AgentClient, server_available
+
+        if server_available():
+            user_prompt = None if args.resume else input("Enter your prompt for code generation: ")
+            AgentClient().run(
+                user_prompt,
+                workspace,
+                resume=args.resume,
+                speculative_clarification=args.ask_all,
+                edit_mode="patch" if args.patch else "full",
+            )
+            return
+
     os.makedirs(workspace, exist_ok=True)
 
+    if args.batch:
+        from worket_agent.batch import BatchRunner
+
+        runner = BatchRunner(
+            workspace,
+            backend=backend,
+            max_jobs=args.jobs,
+            max_llm_calls=args.llm_calls,
+            max_executions=args.executions,
+        )
+        runner.run(args.batch, args.output)
+        return
+
+    from worket_agent.agent import ClarifierAgent, CodeGenerator
+    from worket_agent.environments import EnvironmentPool
+
     clarifier = ClarifierAgent()
-    generator = CodeGenerator(workspace_dir=workspace, clarifier_agent=clarifier)
+    generator = CodeGenerator(
+        workspace_dir=workspace,
+        clarifier_agent=clarifier,
+        env_pool=EnvironmentPool(),
+        speculative_clarification=args.ask_all,
+        edit_mode="patch" if args.patch else "full",
+    )
+
+    if args.resume:
+        generator.resume()
+        return
 
     user_prompt = input("Enter your prompt for code generation: ")
     generator.run(user_prompt)
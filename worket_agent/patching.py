@@ -0,0 +1,222 @@
+import os
+import re
+
+SEARCH_MARKER = re.compile(r"^<{5,9} ?SEARCH\s*$")
+DIVIDER_MARKER = re.compile(r"^={5,9}\s*$")
+REPLACE_MARKER = re.compile(r"^>{5,9} ?REPLACE\s*$")
+PATH_LINE = re.compile(r"^\s*(?:#\s*)?\.?/?([\w./\\-]+\.[A-Za-z0-9]+)\s*$")
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+class PatchError(ValueError):
+    """
+    Raised when edits cannot be applied to the current files.
+    """
+
+
+def normalize_path(path):
+    """
+    Normalizes a file path as written by the model.
+
+    Args:
+        path (str): The path, possibly with a leading './', 'a/' or 'b/'.
+
+    Returns:
+        str: The normalized workspace-relative path with forward slashes.
+    """
+    path = path.strip().replace("\\", "/")
+    while path.startswith("./"):
+        path = path[2:]
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def file_type(path):
+    """
+    Infers the tracked file type of a path that is not tracked yet.
+
+    Args:
+        path (str): The workspace-relative path.
+
+    Returns:
+        str: 'test' or 'code' for Python files, 'requirements' for requirements files, 'other' otherwise.
+    """
+    name = os.path.basename(path)
+    if name.endswith(".py"):
+        return "test" if name.startswith("test_") or name.endswith("_test.py") else "code"
+    if name.startswith("requirements") and name.endswith(".txt"):
+        return "requirements"
+    return "other"
+
+
+def _parse_search_replace(lines):
+    edits = []
+    path = None
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if SEARCH_MARKER.match(line):
+            search, replace = [], []
+            index += 1
+            while index < len(lines) and not DIVIDER_MARKER.match(lines[index]):
+                search.append(lines[index])
+                index += 1
+            index += 1
+            while index < len(lines) and not REPLACE_MARKER.match(lines[index]):
+                replace.append(lines[index])
+                index += 1
+            if index >= len(lines):
+                raise PatchError(f"Unterminated SEARCH/REPLACE block for {path}.")
+            if path is None:
+                raise PatchError("SEARCH/REPLACE block without a file path.")
+            edits.append({"path": path, "search": search, "replace": replace})
+        else:
+            match = PATH_LINE.match(line)
+            if match:
+                path = normalize_path(match.group(1))
+        index += 1
+    return edits
+
+
+def _parse_unified_diff(lines):
+    edits = []
+    path = None
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if line.startswith("+++ "):
+            target = line[4:].split("\t")[0].strip()
+            if target.startswith("b/"):
+                target = target[2:]
+            path = None if target == "/dev/null" else normalize_path(target)
+        elif HUNK_HEADER.match(line) and path is not None:
+            search, replace = [], []
+            blank_run = 0
+            index += 1
+            while index < len(lines):
+                hunk_line = lines[index]
+                if hunk_line.startswith("--- ") and index + 1 < len(lines) and lines[index + 1].startswith("+++ "):
+                    break
+                if not hunk_line:
+                    # Context line, some models drop the leading space of blank lines
+                    search.append("")
+                    replace.append("")
+                    blank_run += 1
+                elif hunk_line[0] in " -+\\":
+                    if hunk_line[0] == "-":
+                        search.append(hunk_line[1:])
+                    elif hunk_line[0] == "+":
+                        replace.append(hunk_line[1:])
+                    elif hunk_line[0] == " ":
+                        search.append(hunk_line[1:])
+                        replace.append(hunk_line[1:])
+                    blank_run = 0
+                else:
+                    # '@@', 'diff --git', 'index', a fence or prose: the hunk is over
+                    break
+                index += 1
+            if blank_run:
+                # Bare blank lines before the next file or the prose are separators, not context
+                del search[-blank_run:]
+                del replace[-blank_run:]
+            edits.append({"path": path, "search": search, "replace": replace})
+            continue
+        index += 1
+    return edits
+
+
+def parse_edits(text):
+    """
+    Parses the edits of a model response.
+
+    SEARCH/REPLACE blocks follow the path of their file on a line of its own,
+    e.g. '# app.py'. Unified diffs name their file in the '+++' line; each
+    hunk becomes one edit whose search is its context and removed lines.
+
+    Args:
+        text (str): The model response.
+
+    Returns:
+        list of dict: The edits with 'path', 'search' and 'replace' lists of lines, in order.
+
+    Raises:
+        PatchError: If a block is malformed.
+    """
+    lines = text.splitlines()
+    if any(SEARCH_MARKER.match(line) for line in lines):
+        return _parse_search_replace(lines)
+    return _parse_unified_diff(lines)
+
+
+def _find(lines, search):
+    size = len(search)
+    matches = [start for start in range(len(lines) - size + 1) if lines[start:start + size] == search]
+    if not matches:
+        # Trailing whitespace is often lost by the model
+        stripped = [line.rstrip() for line in search]
+        matches = [
+            start for start in range(len(lines) - size + 1)
+            if [line.rstrip() for line in lines[start:start + size]] == stripped
+        ]
+    return matches
+
+
+def apply_edit(content, edit):
+    """
+    Applies one edit to a file content.
+
+    Args:
+        content (str or None): The current content, None for a file that does not exist.
+        edit (dict): The edit, see `parse_edits`.
+
+    Returns:
+        str: The edited content.
+
+    Raises:
+        PatchError: If the search lines are not found exactly once.
+    """
+    if not edit["search"]:
+        if content:
+            raise PatchError(f"Empty SEARCH for existing file {edit['path']}.")
+        return "\n".join(edit["replace"]) + "\n"
+    if content is None:
+        raise PatchError(f"{edit['path']} does not exist.")
+
+    lines = content.splitlines()
+    matches = _find(lines, edit["search"])
+    if not matches:
+        raise PatchError(f"SEARCH lines not found in {edit['path']}: {edit['search'][0].strip()!r}...")
+    if len(matches) > 1:
+        raise PatchError(f"SEARCH lines match {len(matches)} places in {edit['path']}, add context.")
+    start = matches[0]
+    lines[start:start + len(edit["search"])] = edit["replace"]
+    return "\n".join(lines) + ("\n" if content.endswith("\n") else "")
+
+
+def apply_edits(files, edits):
+    """
+    Applies edits to the tracked files, all or nothing.
+
+    Args:
+        files (list of dict): The tracked files with 'path' and 'content'.
+        edits (list of dict): The edits, see `parse_edits`.
+
+    Returns:
+        dict: The new content of each changed file path, tracked paths as given in `files`.
+
+    Raises:
+        PatchError: If any edit fails to apply, listing every failure; nothing is applied then.
+    """
+    paths = {normalize_path(f["path"]): f["path"] for f in files if f["path"]}
+    contents = {f["path"]: f["content"] for f in files if f["path"]}
+    changed = {}
+    errors = []
+    for edit in edits:
+        path = paths.get(edit["path"], edit["path"])
+        current = changed.get(path, contents.get(path))
+        try:
+            changed[path] = apply_edit(current, edit)
+        except PatchError as e:
+            errors.append(str(e))
+    if errors:
+        raise PatchError("\n".join(errors))
+    return {path: content for path, content in changed.items() if content != contents.get(path)}
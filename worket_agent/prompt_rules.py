@@ -25,6 +25,22 @@ TESTER_PROMPT = (
     "If you don't find any problems in the script that gave an error in the feedback, try another approach to solve it. "
 )
 
+PATCH_PROMPT = (
+    "The scripts should be designed to work on macOS, Windows, and Linux. "
+    "You are a Python programmer that fixes existing code to solve specific tasks. "
+    "Return only edits to the given files, never whole files, without any explanations or additional comments. "
+    "For each file, write a comment with its path on its own line, e.g., '# YOUR_SCRIPT_NAME.py', followed by one or more edit blocks:\n"
+    "<<<<<<< SEARCH\n"
+    "lines copied exactly from the current file\n"
+    "=======\n"
+    "the lines that replace them\n"
+    ">>>>>>> REPLACE\n"
+    "The SEARCH lines must match the current file exactly, including indentation, and appear only once in it; include surrounding lines if needed. "
+    "To create a new file, leave the SEARCH section empty. "
+    "Keep the edits as small as possible. "
+    "The errors from the generated scripts should not be entirely suppressed, allowing them to be captured in stderr for further analysis. "
+)
+
 REQUIREMENTS_PROMPT = (
     "The scripts should be designed to work on macOS, Windows, and Linux. "
     "You are a requirements.txt creator that lists the required packages for a Python project. "
@@ -42,6 +58,13 @@ AGENT_PROMPT = (
     "ask short questions. "
     'Otherwise state: "Nothing to clarify"'
 )
+BATCH_CLARIFY_PROMPT = (
+    "Given some instructions for building a Python script, list everything that needs to be clarified, do not carry them out. "
+    "You can make reasonable assumptions, only ask about what you cannot reasonably assume. "
+    "respond in the same language as the prompt was made. "
+    "ask short questions. "
+    "Return only a JSON array of question strings, or [] if nothing needs to be clarified."
+)
 ROADMAP_PROMPT = (
     "Given a problem description, create a step-by-step roadmap to build a Python script and fulfill the initial prompt. "
     "Include potential technologies, tools, and considerations for each step. "
@@ -0,0 +1,143 @@
+import collections
+import threading
+
+from worket_agent.backends import DEFAULT_MAX_TOKENS, SMALL_MODEL
+from worket_agent.context import estimate_tokens
+
+# A model of None means the backend's own model. Programmer output sizes vary too much
+# between tasks for a learned budget, a cut completion would cost a second full call.
+# Only deterministic roles are cached, a cached failing generation would be replayed on every run.
+DEFAULT_ROUTES = {
+    "clarify": {"model": SMALL_MODEL, "max_tokens": 256, "min_tokens": 64, "stop": ["\n\n"], "cache": True},
+    "clarify_batch": {"model": SMALL_MODEL, "max_tokens": 512, "min_tokens": 128, "stop": None, "cache": True},
+    "roadmap": {"model": None, "max_tokens": 2048, "min_tokens": 512, "stop": None, "cache": True},
+    "programmer": {"model": None, "max_tokens": DEFAULT_MAX_TOKENS, "min_tokens": 2048, "stop": None,
+                   "adaptive": False, "cache": False},
+    "patch": {"model": None, "max_tokens": 4096, "min_tokens": 1024, "stop": None, "cache": False},
+    "tester": {"model": None, "max_tokens": 8192, "min_tokens": 1024, "stop": None, "cache": False},
+    "requirements": {"model": SMALL_MODEL, "max_tokens": 512, "min_tokens": 128, "stop": None, "cache": True},
+}
+
+
+class ModelRouter:
+    """
+    Chooses the model, token budget, stop sequences and response caching of each call by role.
+
+    `routes` overrides entries of `DEFAULT_ROUTES` per role, unknown roles use
+    the programmer route. Once `min_samples` completions of a role have been
+    observed, the budget of an 'adaptive' route (the default) shrinks to
+    `headroom` times the largest recent completion, never below the route's
+    'min_tokens' nor above its 'max_tokens'. A completion using more than half of a shrunk budget is
+    reported as possibly truncated by `observe`, so it can be retried with
+    the full budget. Responses are looked up in the backend's cache only for
+    routes with a true 'cache'.
+    """
+
+    def __init__(self, routes=None, adaptive=True, headroom=3.0, min_samples=5):
+        self.routes = {role: dict(route) for role, route in DEFAULT_ROUTES.items()}
+        for role, route in (routes or {}).items():
+            self.routes.setdefault(role, dict(DEFAULT_ROUTES["programmer"])).update(route)
+        self.adaptive = adaptive
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def _route(self, role):
+        return self.routes.get(role, self.routes["programmer"])
+
+    def budget(self, role):
+        """
+        Returns the current completion token budget of a role.
+
+        Args:
+            role (str): The role of the call.
+
+        Returns:
+            int: The max_tokens to request.
+        """
+        route = self._route(role)
+        with self._lock:
+            sizes = list(self._sizes.get(role, ()))
+        if not self.adaptive or not route.get("adaptive", True) or len(sizes) < self.min_samples:
+            return route["max_tokens"]
+        adapted = int(max(sizes) * self.headroom)
+        return min(max(adapted, route.get("min_tokens", 0)), route["max_tokens"])
+
+    def route(self, role):
+        """
+        Returns the call parameters of a role.
+
+        Args:
+            role (str): The role of the call ('clarify', 'clarify_batch', 'roadmap', 'programmer', 'patch',
+                'tester' or 'requirements').
+
+        Returns:
+            dict: The 'model' (None for the backend's model), 'max_tokens', 'stop' sequences and 'use_cache'.
+        """
+        route = self._route(role)
+        return {
+            "model": route.get("model"),
+            "max_tokens": self.budget(role),
+            "stop": route.get("stop"),
+            "use_cache": route.get("cache", False),
+        }
+
+    def observe(self, role, completion, max_tokens):
+        """
+        Records the size of a completion.
+
+        Args:
+            role (str): The role of the call.
+            completion (str): The completion content.
+            max_tokens (int): The budget the call was made with.
+
+        Returns:
+            bool: True if the completion may have been cut by a budget below the route's maximum.
+        """
+        tokens = estimate_tokens(completion)
+        with self._lock:
+            self._sizes.setdefault(role, collections.deque(maxlen=50)).append(tokens)
+        return max_tokens < self._route(role)["max_tokens"] and tokens * 2 > max_tokens
+
+    def full_budget(self, role):
+        """
+        Returns the configured maximum budget of a role, for retrying a truncated call.
+
+        Args:
+            role (str): The role of the call.
+
+        Returns:
+            int: The route's max_tokens.
+        """
+        return self._route(role)["max_tokens"]
+
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+
+def get_default_router():
+    """
+    Returns the process-wide router, so budgets adapt across generators and batch jobs.
+
+    Returns:
+        ModelRouter: The default router.
+    """
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter()
+        return _default_router
+
+
+def set_default_router(router):
+    """
+    Replaces the process-wide router.
+
+    Args:
+        router (ModelRouter): The router to use by default.
+    """
+    global _default_router
+    with _default_router_lock:
+        _default_router = router
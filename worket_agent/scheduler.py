@@ -0,0 +1,62 @@
+import asyncio
+
+
+class TaskGraph:
+    """
+    Dependency-aware scheduler for the asynchronous steps of one iteration.
+
+    Each task starts as soon as all of its dependencies have finished, so
+    independent tasks run concurrently. Task functions are coroutines that
+    receive a dict with the results of their dependencies.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    def add(self, name, func, depends_on=()):
+        """
+        Registers a task.
+
+        Args:
+            name (str): Unique name of the task.
+            func (callable): Coroutine function taking a dict of dependency results.
+            depends_on (iterable of str, optional): Names of the tasks that must finish first.
+        """
+        if name in self._tasks:
+            raise ValueError(f"Task already registered: {name}")
+        depends_on = tuple(depends_on)
+        for dependency in depends_on:
+            if dependency not in self._tasks:
+                raise ValueError(f"Unknown dependency '{dependency}' for task '{name}'")
+        self._tasks[name] = (func, depends_on)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    async def run(self):
+        """
+        Runs every registered task, respecting dependencies.
+
+        Returns:
+            dict: Results keyed by task name, in registration order.
+        """
+        futures = {}
+
+        async def run_task(name, func, depends_on):
+            dependency_results = {}
+            for dependency in depends_on:
+                dependency_results[dependency] = await futures[dependency]
+            return await func(dependency_results)
+
+        # Dependencies are always registered first, so they already have a future
+        for name, (func, depends_on) in self._tasks.items():
+            futures[name] = asyncio.ensure_future(run_task(name, func, depends_on))
+
+        try:
+            await asyncio.gather(*futures.values())
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            raise
+
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import socket
+
+from worket_agent.agent import ClarifierAgent, CodeGenerator
+from worket_agent.backends import get_default_backend, run_sync
+from worket_agent.batch import make_clarification_handler
+from worket_agent.client import default_address, parse_address, server_available
+from worket_agent.dependencies import stdlib_modules
+from worket_agent.environments import EnvironmentPool
+from worket_agent.execution import ExecutionEngine
+from worket_agent.installer import RequirementsInstaller
+from worket_agent.testing import TestRunner
+
+# Job options a client may set, everything else is owned by the server
+JOB_OPTIONS = ("max_iterations", "generate_tests", "streaming", "static_checks", "candidates",
+               "speculative_clarification", "incremental", "edit_mode")
+
+
+class AgentServer:
+    """
+    Long-running local server that runs generation jobs for thin clients.
+
+    One backend (with its HTTP clients and response cache), the standard
+    library index, the base environments of the pool, the execution engine,
+    the installer and the test workers are shared by every job and stay warm
+    between them. A connection carries one JSON request per line, see
+    `AgentClient`; messages of the `verbose_handler` hook are streamed back as
+    'progress' events and clarification questions are forwarded to the
+    client, unless the request carries its answers in 'clarifications'.
+    """
+
+    def __init__(self, address=None, backend=None, max_jobs=4, max_executions=4, env_pool=None, test_runner=None):
+        self.address = address or default_address()
+        self.backend = backend if backend else get_default_backend()
+        self.max_jobs = max_jobs
+        self.env_pool = env_pool if env_pool else EnvironmentPool()
+        self.executor = ExecutionEngine(max_workers=max_executions)
+        self.installer = RequirementsInstaller()
+        self.test_runner = test_runner if test_runner else TestRunner()
+        self.jobs = set()
+        self._semaphore = None
+        self._stopping = None
+
+    async def warm(self):
+        """
+        Loads the standard library index, builds the base environment and opens the model client.
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            loop.run_in_executor(None, stdlib_modules),
+            loop.run_in_executor(None, self.env_pool.warm),
+            loop.run_in_executor(None, self.backend.warm),
+        )
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+
+        def send(event):
+            # Hooks may be called from executor threads
+            loop.call_soon_threadsafe(writer.write, (json.dumps(event) + "\n").encode("utf-8"))
+
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            op = request.get("op")
+            if op == "ping":
+                send({"event": "pong", "pid": os.getpid(), "jobs": len(self.jobs)})
+            elif op == "shutdown":
+                self._stopping.set()
+                send({"event": "stopping", "jobs": len(self.jobs)})
+            elif op == "run":
+                outcome = await self._run_job(request, reader, send)
+                send(dict(outcome, event="result"))
+            else:
+                send({"event": "error", "error": f"Unknown op: {op}"})
+        except Exception as e:
+            send({"event": "error", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            await asyncio.sleep(0)
+            try:
+                await writer.drain()
+                writer.close()
+            except ConnectionError:
+                pass
+
+    async def _run_job(self, request, reader, send):
+        workspace_dir = request["workspace"]
+        if workspace_dir in self.jobs:
+            raise RuntimeError(f"A job is already running in {workspace_dir}.")
+        loop = asyncio.get_running_loop()
+
+        async def ask(question):
+            # A list holds every question of a batch clarification, answered at once
+            if isinstance(question, list):
+                send({"event": "questions", "questions": question})
+            else:
+                send({"event": "question", "question": question})
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("The client disconnected before answering.")
+            return json.loads(line)["answer"]
+
+        if "clarifications" in request:
+            clarification_handler = make_clarification_handler(request["clarifications"])
+        else:
+            # Called from an executor thread, the answer arrives on the event loop
+            def clarification_handler(question):
+                return asyncio.run_coroutine_threadsafe(ask(question), loop).result()
+
+        def verbose_handler(message):
+            send({"event": "progress", "message": message})
+
+        options = {key: value for key, value in (request.get("options") or {}).items() if key in JOB_OPTIONS}
+        self.jobs.add(workspace_dir)
+        try:
+            async with self._semaphore:
+                os.makedirs(workspace_dir, exist_ok=True)
+                # Cloning the environment is blocking file work
+                generator = await loop.run_in_executor(None, functools.partial(
+                    CodeGenerator,
+                    workspace_dir,
+                    clarifier_agent=ClarifierAgent(backend=self.backend),
+                    backend=self.backend,
+                    env_pool=self.env_pool,
+                    installer=self.installer,
+                    executor=self.executor,
+                    test_runner=self.test_runner,
+                    **options
+                ))
+                run_options = {"clarification_handler": clarification_handler, "verbose_handler": verbose_handler}
+                if request.get("resume"):
+                    return await generator.aresume(**run_options)
+                return await generator.arun(request["prompt"], **run_options)
+        finally:
+            self.jobs.discard(workspace_dir)
+
+    async def aserve(self):
+        """
+        Serves requests until a client asks for a shutdown, then waits for the running jobs.
+        """
+        self._semaphore = asyncio.Semaphore(self.max_jobs)
+        self._stopping = asyncio.Event()
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            if os.path.exists(target):
+                if server_available(self.address):
+                    raise RuntimeError(f"A server is already listening on {target}.")
+                # Left behind by a server that did not shut down cleanly
+                os.remove(target)
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            server = await asyncio.start_unix_server(self._handle, path=target)
+        else:
+            server = await asyncio.start_server(self._handle, host=target[0], port=target[1], family=socket.AF_INET)
+
+        try:
+            await self.warm()
+            print(f"Server listening on {self.address}")
+            await self._stopping.wait()
+            server.close()
+            await server.wait_closed()
+            while self.jobs:
+                await asyncio.sleep(0.1)
+        finally:
+            server.close()
+            await self.test_runner.close()
+            if kind == "unix" and os.path.exists(target):
+                os.remove(target)
+        print("Server stopped")
+
+    def serve(self):
+        """
+        Blocking variant of `aserve`.
+        """
+        run_sync(self.aserve())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local code generation server.")
+    parser.add_argument("--address", default=None, help="Unix socket path or host:port to listen on.")
+    parser.add_argument("--jobs", type=int, default=4, help="Number of jobs run at once.")
+    parser.add_argument("--executions", type=int, default=4, help="Maximum concurrent script executions.")
+    args = parser.parse_args()
+    AgentServer(address=args.address, max_jobs=args.jobs, max_executions=args.executions).serve()
+
+
+if __name__ == "__main__":
+    main()
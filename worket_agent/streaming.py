@@ -0,0 +1,84 @@
+import re
+
+# Same pattern as CodeGenerator.extract_code, applied to a growing buffer
+CODE_BLOCK_PATTERN = re.compile(r"```(?:python)?\n(.*?)```", re.DOTALL)
+OPENING_FENCE = re.compile(r"```(?:python)?\n")
+CLOSING_FENCE = "```"
+# The longest opening fence, '```python\n'
+MAX_OPENING_LENGTH = 10
+
+
+class CodeBlockParser:
+    """
+    Incremental parser for fenced code blocks in a streamed completion.
+
+    Feeding chunks returns each block as soon as its closing fence arrives.
+    Blocks come out exactly as `CodeGenerator.extract_code` would return them
+    for the full text, including the fallback to the whole text when the
+    completion holds no code block at all. Each chunk is only scanned from
+    where the previous one could still have started a fence, so feeding a
+    block takes time linear in its size.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._block_start = None
+        self._scan = 0
+        self.blocks = []
+
+    @property
+    def text(self):
+        """
+        str: Everything received so far.
+        """
+        return self._buffer
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of the completion.
+
+        Args:
+            chunk (str): The new text.
+
+        Returns:
+            list: The code blocks completed by this chunk.
+        """
+        self._buffer += chunk
+        completed = []
+        while True:
+            if self._block_start is None:
+                match = OPENING_FENCE.search(self._buffer, max(self._scan, self._position))
+                if not match:
+                    # An opening fence cut by the end of the chunk can only start in its last characters
+                    self._scan = max(self._position, len(self._buffer) - MAX_OPENING_LENGTH + 1)
+                    break
+                self._block_start = match.end()
+                self._scan = self._block_start
+                continue
+
+            start = max(self._scan, self._block_start)
+            end = self._buffer.find(CLOSING_FENCE, start)
+            if end == -1:
+                self._scan = max(len(self._buffer) - len(CLOSING_FENCE) + 1, self._block_start)
+                break
+            block = self._buffer[self._block_start:end]
+            self._position = end + len(CLOSING_FENCE)
+            self._block_start = None
+            self._scan = self._position
+            if block.strip():
+                completed.append(block)
+        self.blocks.extend(completed)
+        return completed
+
+    def finish(self):
+        """
+        Signals the end of the completion.
+
+        Returns:
+            list: The whole text as a single block if no code block was found, otherwise an empty list.
+        """
+        if self.blocks:
+            return []
+        self.blocks.append(self._buffer)
+        return [self._buffer]
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import signal
+import threading
+import time
+import weakref
+
+from worket_agent.execution import DEFAULT_CPU_SECONDS, resource_limiter
+from worket_agent.tracing import get_tracer
+
+HARNESS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "harness.py")
+DEFAULT_TEST_TIMEOUT = 30
+FAILED_OUTCOMES = ("failed", "error", "timeout")
+
+
+class _Worker:
+    """
+    One persistent harness process serving collect and run requests.
+    """
+
+    def __init__(self, python_executable, cwd, cpu_seconds=None, memory_bytes=None):
+        self.python_executable = python_executable
+        self.cwd = cwd
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.process = None
+
+    async def start(self):
+        kwargs = {"start_new_session": True} if os.name == "posix" else {}
+        # CPU time adds up over the life of the worker, the harness limits each request itself
+        limiter = resource_limiter(memory_bytes=self.memory_bytes)
+        if limiter:
+            kwargs["preexec_fn"] = limiter
+        args = [self.cwd] if self.cpu_seconds is None else [self.cwd, str(self.cpu_seconds)]
+        self.process = await asyncio.create_subprocess_exec(
+            self.python_executable,
+            "-u",
+            HARNESS_PATH,
+            *args,
+            cwd=self.cwd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            **kwargs,
+        )
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def request(self, payload, timeout=None):
+        self.process.stdin.write((json.dumps(payload) + "\n").encode("utf-8"))
+        await self.process.stdin.drain()
+        line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+        if not line:
+            await self.process.wait()
+            if self.process.returncode == -getattr(signal, "SIGXCPU", 0):
+                raise EOFError(f"Test worker exceeded its CPU time limit of {self.cpu_seconds}s and was killed")
+            raise EOFError(f"Test worker exited with code {self.process.returncode}")
+        return json.loads(line)
+
+    async def kill(self):
+        if not self.alive:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        await self.process.wait()
+
+    async def close(self):
+        if self.alive:
+            # The harness exits at the end of its input
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                await self.kill()
+
+
+class TestRunner:
+    """
+    Runs the test cases of generated test files in persistent worker interpreters.
+
+    Up to `workers` harness processes are started in the project's virtual
+    environment and kept between runs; workspace modules are forgotten
+    before each run while third-party imports stay loaded. unittest test
+    cases, module-level `test*` functions and script-style files (checked
+    at import) are collected, then handed out one at a time to the idle
+    workers. A test running longer than `timeout` seconds has its worker
+    killed and replaced. With `fail_fast`, no new test starts after the
+    first failure. Workers get the CPU and opt-in address-space limits of
+    `ExecutionEngine`; the CPU limit applies to each request on its own.
+    """
+
+    def __init__(self, workers=4, timeout=DEFAULT_TEST_TIMEOUT, fail_fast=True, cpu_seconds=DEFAULT_CPU_SECONDS,
+                 memory_bytes=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.fail_fast = fail_fast
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self._pools = weakref.WeakKeyDictionary()
+        self._pools_lock = threading.Lock()
+
+    def _pool(self, python_executable, cwd):
+        # Worker pipes are bound to one event loop, keep one pool per loop
+        loop = asyncio.get_running_loop()
+        with self._pools_lock:
+            pools = self._pools.setdefault(loop, {})
+            return pools.setdefault((python_executable, os.path.abspath(cwd)), [])
+
+    async def _acquire_workers(self, python_executable, cwd, count):
+        pool = self._pool(python_executable, cwd)
+        pool[:] = [worker for worker in pool if worker.alive]
+        while len(pool) < count:
+            worker = _Worker(python_executable, os.path.abspath(cwd), self.cpu_seconds, self.memory_bytes)
+            await worker.start()
+            pool.append(worker)
+        await asyncio.gather(*[worker.request({"op": "reset"}, self.timeout) for worker in pool[:count]])
+        return pool[:count]
+
+    async def _replace(self, worker):
+        await worker.kill()
+        await worker.start()
+
+    async def run(self, python_executable, test_paths, cwd):
+        """
+        Collects and runs the tests of the given files.
+
+        Args:
+            python_executable (str): The Python executable of the project's virtual environment.
+            test_paths (list of str): The test files, relative to `cwd`.
+            cwd (str): The workspace directory.
+
+        Returns:
+            list of dict: One result per test with 'id', 'outcome' (one of 'passed', 'failed',
+                'error', 'timeout', 'skipped' or 'not_run'), 'message', 'traceback', 'output'
+                and 'duration'. Files that fail to import get one result with the file as id.
+        """
+        if not test_paths:
+            return []
+        workers = await self._acquire_workers(python_executable, cwd, min(self.workers, len(test_paths)))
+        results = []
+        failed = asyncio.Event()
+
+        def add_result(test_id, response):
+            failure = response.get("failure") or {}
+            result = {
+                "id": test_id,
+                "outcome": response["outcome"],
+                "message": failure.get("message", ""),
+                "traceback": failure.get("traceback", ""),
+                "output": response.get("output", ""),
+                "duration": response.get("duration", 0.0),
+            }
+            results.append(result)
+            get_tracer().record("test", result["duration"], id=test_id, outcome=result["outcome"])
+            if result["outcome"] in FAILED_OUTCOMES:
+                failed.set()
+
+        async def serve(worker, queue, handle):
+            while not queue.empty():
+                if self.fail_fast and failed.is_set():
+                    return
+                item = queue.get_nowait()
+                try:
+                    await handle(worker, item)
+                except asyncio.TimeoutError:
+                    add_result(item, {"outcome": "timeout", "failure": {
+                        "message": f"Timed out after {self.timeout}s and was killed.", "traceback": ""}})
+                    await self._replace(worker)
+                except (EOFError, ConnectionError) as e:
+                    add_result(item, {"outcome": "error", "failure": {"message": str(e), "traceback": ""}})
+                    await self._replace(worker)
+
+        async def drain(items, handle):
+            queue = asyncio.Queue()
+            for item in items:
+                queue.put_nowait(item)
+            await asyncio.gather(*[serve(worker, queue, handle) for worker in workers])
+            remaining = []
+            while not queue.empty():
+                remaining.append(queue.get_nowait())
+            return remaining
+
+        test_ids = []
+
+        async def collect(worker, path):
+            response = await worker.request({"op": "collect", "path": path}, self.timeout)
+            if "failure" in response:
+                add_result(path, dict(response, outcome="error"))
+            test_ids.extend(response["tests"])
+
+        async def run_test(worker, test_id):
+            add_result(test_id, await worker.request({"op": "run", "id": test_id}, self.timeout))
+
+        start = time.monotonic()
+        not_collected = await drain(test_paths, collect)
+        not_run = not_collected + await drain(test_ids, run_test)
+        for test_id in not_run:
+            results.append({"id": test_id, "outcome": "not_run", "message": "", "traceback": "", "output": "",
+                            "duration": 0.0})
+        print(f"Ran {len(results) - len(not_run)} test(s) in {time.monotonic() - start:.2f}s")
+        return results
+
+    async def close(self, cwd=None):
+        """
+        Stops the worker processes of the current event loop.
+
+        Args:
+            cwd (str, optional): Only stop the workers of this workspace.
+        """
+        loop = asyncio.get_running_loop()
+        with self._pools_lock:
+            pools = self._pools.get(loop, {})
+            keys = [key for key in pools if cwd is None or key[1] == os.path.abspath(cwd)]
+            workers = [worker for key in keys for worker in pools.pop(key)]
+        await asyncio.gather(*[worker.close() for worker in workers])
+
+
+def format_test_failures(results):
+    """
+    Formats failed tests as compact feedback.
+
+    Args:
+        results (list of dict): The results from `TestRunner.run`.
+
+    Returns:
+        str: One 'OUTCOME id: message' line per failed test, followed by its trimmed traceback.
+    """
+    lines = []
+    for result in results:
+        if result["outcome"] not in FAILED_OUTCOMES:
+            continue
+        lines.append(f"{result['outcome'].upper()} {result['id']}: {result['message']}")
+        if result["traceback"]:
+            lines.append(result["traceback"])
+    return "\n".join(lines)
@@ -0,0 +1,227 @@
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+_current_span = contextvars.ContextVar("worker_agent_current_span", default=None)
+
+
+class MetricsRegistry:
+    """
+    In-process registry of span durations with percentile summaries.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value):
+        with self._lock:
+            self._values.setdefault(name, []).append(value)
+
+    def summary(self):
+        """
+        Summarizes the observed durations per span name.
+
+        Returns:
+            dict: For each name, 'count', 'total', 'p50', 'p95' and 'max' in seconds.
+        """
+        with self._lock:
+            values = {name: sorted(observed) for name, observed in self._values.items()}
+        summary = {}
+        for name, observed in values.items():
+            summary[name] = {
+                "count": len(observed),
+                "total": sum(observed),
+                "p50": observed[int(0.50 * (len(observed) - 1))],
+                "p95": observed[int(0.95 * (len(observed) - 1))],
+                "max": observed[-1],
+            }
+        return summary
+
+
+class Span:
+    """
+    A timed operation with attributes, used as a context manager.
+    """
+
+    __slots__ = ("tracer", "name", "attributes", "span_id", "parent_id", "start", "_start", "_token")
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = None
+        self.parent_id = None
+
+    def set(self, **attributes):
+        """
+        Adds attributes to the span.
+        """
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = self.tracer.next_id()
+        self.start = time.time()
+        self._start = time.monotonic()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer.finish(self, time.monotonic() - self._start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class NoopTracer:
+    """
+    Tracer used when tracing is disabled; every operation is a no-op.
+    """
+
+    enabled = False
+
+    def span(self, name, **attributes):
+        return _NOOP_SPAN
+
+    def record(self, name, duration, **attributes):
+        pass
+
+    def close(self):
+        pass
+
+
+class Tracer:
+    """
+    Records spans to a JSONL file and to an in-process metrics registry.
+
+    Spans nest through context variables, so spans opened inside asyncio
+    tasks get the span that was current when the task started as parent.
+    """
+
+    enabled = True
+
+    def __init__(self, path=None, registry=None):
+        self.path = path
+        self.registry = registry if registry else MetricsRegistry()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def next_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def span(self, name, **attributes):
+        """
+        Opens a span.
+
+        Args:
+            name (str): The span name, e.g. 'llm.programmer' or 'execute'.
+            **attributes: Initial attributes of the span.
+
+        Returns:
+            Span: The span, to be used as a context manager.
+        """
+        return Span(self, name, attributes)
+
+    def record(self, name, duration, **attributes):
+        """
+        Records an already finished operation as a child of the current span.
+
+        Args:
+            name (str): The span name.
+            duration (float): The duration in seconds.
+            **attributes: Attributes of the span.
+        """
+        span = Span(self, name, attributes)
+        parent = _current_span.get()
+        span.parent_id = parent.span_id if parent is not None else None
+        span.span_id = self.next_id()
+        span.start = time.time() - duration
+        self.finish(span, duration)
+
+    def finish(self, span, duration):
+        self.registry.observe(span.name, duration)
+        if self._file is None:
+            return
+        line = json.dumps(
+            {
+                "name": span.name,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "start": span.start,
+                "duration": duration,
+                "attributes": span.attributes,
+            },
+            default=str,
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """
+    Returns the process-wide tracer.
+
+    Tracing is disabled unless `set_tracer` was called or the `WORKER_AGENT_TRACE`
+    environment variable names a JSONL file to write spans to.
+
+    Returns:
+        Tracer or NoopTracer: The tracer.
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                path = os.environ.get("WORKER_AGENT_TRACE")
+                _tracer = Tracer(path) if path else NoopTracer()
+    return _tracer
+
+
+def set_tracer(tracer):
+    """
+    Replaces the process-wide tracer.
+
+    Args:
+        tracer (Tracer or NoopTracer): The tracer to use.
+    """
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
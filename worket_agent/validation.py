@@ -0,0 +1,247 @@
+import ast
+import builtins
+import os
+
+MODULE_NAMES = {
+    "__annotations__", "__builtins__", "__class__", "__doc__", "__file__", "__loader__", "__name__",
+    "__package__", "__path__", "__spec__",
+}
+BUILTIN_NAMES = frozenset(dir(builtins)) | MODULE_NAMES
+# Defined while a class body runs, but not in its methods
+CLASS_NAMES = frozenset(["__module__", "__qualname__"])
+
+
+def _issue(path, message, line=None, column=None):
+    return {"path": path, "line": line, "column": column, "message": message}
+
+
+def bound_names(tree):
+    """
+    Collects every name bound anywhere in a module, regardless of scope.
+
+    Args:
+        tree (ast.AST): The parsed module.
+
+    Returns:
+        set: The bound names.
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif type(node).__name__ in ("MatchAs", "MatchStar") and getattr(node, "name", None):
+            names.add(node.name)
+        elif type(node).__name__ == "MatchMapping" and getattr(node, "rest", None):
+            names.add(node.rest)
+    return names
+
+
+def _class_scope_names(tree):
+    # Name nodes evaluated directly in a class body, not in the functions or lambdas it defines
+    nodes = set()
+
+    def visit(node):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            # Decorators, defaults and bases still run in the class body
+            expressions = getattr(node, "decorator_list", []) + getattr(node, "bases", [])
+            if not isinstance(node, ast.ClassDef):
+                expressions += node.args.defaults + [d for d in node.args.kw_defaults if d is not None]
+            for expression in expressions:
+                visit(expression)
+            return
+        if isinstance(node, ast.Name):
+            nodes.add(node)
+        for child in ast.iter_child_nodes(node):
+            visit(child)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            for statement in node.body:
+                visit(statement)
+    return nodes
+
+
+def _stored_names(node):
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+
+
+def top_level_names(tree):
+    """
+    Collects the names a module defines at import time, outside functions and classes.
+
+    Args:
+        tree (ast.Module): The parsed module.
+
+    Returns:
+        set: The top-level names.
+    """
+    names = set()
+
+    def visit(statements):
+        for node in statements:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                names.update(alias.asname or alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith)) or hasattr(
+                node, "handlers"
+            ):
+                # Compound statements: look into their blocks, but keep what their headers bind
+                for field in ("body", "orelse", "finalbody"):
+                    visit(getattr(node, field, []))
+                for handler in getattr(node, "handlers", []):
+                    if handler.name:
+                        names.add(handler.name)
+                    visit(handler.body)
+                if isinstance(node, (ast.For, ast.AsyncFor)):
+                    names.update(_stored_names(node.target))
+                for item in getattr(node, "items", []):
+                    if item.optional_vars is not None:
+                        names.update(_stored_names(item.optional_vars))
+            else:
+                names.update(_stored_names(node))
+
+    visit(tree.body)
+    return names
+
+
+def _module_map(files):
+    modules = {}
+    for file in files:
+        path = file["path"]
+        if not path or not path.endswith(".py"):
+            continue
+        module = os.path.normpath(path)[: -len(".py")].replace(os.sep, ".")
+        if module.endswith(".__init__"):
+            module = module[: -len(".__init__")]
+        modules[module] = file
+        modules.setdefault(module.split(".")[-1], file)
+    return modules
+
+
+def check_file(path, content, modules, trees):
+    """
+    Runs the static checks on one Python file.
+
+    Args:
+        path (str): The workspace-relative path of the file.
+        content (str): The file content.
+        modules (dict): Workspace files keyed by module name.
+        trees (dict): Parsed workspace modules keyed by path, None for files that do not parse.
+
+    Returns:
+        list of dict: The issues found, with 'path', 'line', 'column' and 'message'.
+    """
+    try:
+        compile(content, path, "exec")
+    except SyntaxError as e:
+        return [_issue(path, f"SyntaxError: {e.msg}", e.lineno, e.offset)]
+    except ValueError as e:
+        return [_issue(path, f"Invalid source: {e}")]
+
+    tree = trees[path]
+    issues = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ImportFrom):
+            continue
+        if node.level:
+            issues.append(
+                _issue(path, "Relative import fails because files are executed directly as scripts; "
+                       "use an absolute import.", node.lineno, node.col_offset + 1)
+            )
+            continue
+        target = modules.get(node.module)
+        if target is None or target["path"] == path or trees.get(target["path"]) is None:
+            continue
+        target_tree = trees[target["path"]]
+        provided = top_level_names(target_tree)
+        if "__getattr__" in provided or any(
+            isinstance(n, ast.ImportFrom) and any(a.name == "*" for a in n.names) for n in target_tree.body
+        ):
+            continue
+        for alias in node.names:
+            submodule = f"{node.module}.{alias.name}"
+            if alias.name != "*" and alias.name not in provided and submodule not in modules:
+                issues.append(
+                    _issue(path, f"cannot import name '{alias.name}' from workspace module '{node.module}' "
+                           f"({target['path']})", node.lineno, node.col_offset + 1)
+                )
+
+    has_star_import = any(
+        isinstance(n, ast.ImportFrom) and any(a.name == "*" for a in n.names) for n in ast.walk(tree)
+    )
+    if not has_star_import:
+        defined = bound_names(tree) | BUILTIN_NAMES
+        class_scope = _class_scope_names(tree)
+        reported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in defined:
+                if node.id in CLASS_NAMES and node in class_scope:
+                    continue
+                if node.id not in reported:
+                    reported.add(node.id)
+                    issues.append(_issue(path, f"undefined name '{node.id}'", node.lineno, node.col_offset + 1))
+    return issues
+
+
+def validate_files(files, headerless_blocks=0):
+    """
+    Statically validates code and test files before anything is installed or executed.
+
+    Args:
+        files (list of dict): The tracked files with 'path', 'type' and 'content'.
+        headerless_blocks (int, optional): Number of generated code blocks that had no '# path' header.
+
+    Returns:
+        list of dict: Every issue found, with 'path', 'line', 'column' and 'message'.
+    """
+    issues = []
+    for _ in range(headerless_blocks):
+        issues.append(
+            _issue("<unnamed block>", "Code block does not start with a '# path' comment, so it could not be saved.", 1)
+        )
+
+    python_files = [f for f in files if f["type"] in ("code", "test") and (f["path"] or "").endswith(".py")]
+    trees = {}
+    for file in python_files:
+        try:
+            trees[file["path"]] = ast.parse(file["content"])
+        except (SyntaxError, ValueError):
+            trees[file["path"]] = None
+
+    modules = _module_map(python_files)
+    for file in python_files:
+        issues.extend(check_file(file["path"], file["content"], modules, trees))
+    return issues
+
+
+def format_issues(issues):
+    """
+    Formats static check issues as a single feedback message.
+
+    Args:
+        issues (list of dict): The issues from `validate_files`.
+
+    Returns:
+        str: One 'path:line:column: message' line per issue.
+    """
+    lines = []
+    for issue in issues:
+        location = issue["path"]
+        if issue["line"] is not None:
+            location += f":{issue['line']}"
+            if issue["column"] is not None:
+                location += f":{issue['column']}"
+        lines.append(f"{location}: {issue['message']}")
+    return "\n".join(lines)